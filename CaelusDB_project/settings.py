@@ -50,10 +50,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Latence, SQL a šablony po pohledech pro /metrics (za WhiteNoise - statické soubory neměříme)
+    'main.metriky.MetrikyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # ?_profil=1 / ?_profil=sql pro zaměstnance (viz main/profilovani.py) - potřebuje request.user
+    'main.profilovani.ProfilovaniMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,7 +66,8 @@ ROOT_URLCONF = 'CaelusDB_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django šablony s měřením doby vykreslení (viz main/metriky.py)
+        'BACKEND': 'main.metriky.MereneSablony',
         'DIRS': [BASE_DIR / 'templates'],  # Pro HTML šablony na úrovni projektu
         'APP_DIRS': True,
         'OPTIONS': {
@@ -148,6 +153,95 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 
+# --- VYHLEDÁVÁNÍ LETŮ ---
+
+# Kolik přestupů smí mít nalezená trasa (1 = jen jeden přestup jako dřív)
+VYHLEDAVANI_MAX_PRESTUPU = 2
+
+# Kolik nejrychlejších tras se 2+ přestupy si necháme pro každý první let
+# (None = bez omezení, ale u více přestupů může výsledků být hodně).
+# Přímé lety a trasy s jedním přestupem se vracejí vždy všechny.
+VYHLEDAVANI_TRAS_NA_ODLET = 10
+
+# Kolik výsledků navíc za koncem stránky se vyhodnotí (dostupnost), aby
+# vyprodané přestupy nezpůsobily kratší stránku
+VYHLEDAVANI_PREDSTIH = 10
+
+
+# Jak dlouho (v sekundách) si pamatujeme výsledky vyhledávání (viz main/cache_vyhledavani.py)
+VYHLEDAVANI_CACHE_TTL = 300
+
+# Cenový kalendář (main/kalendar_cen.py): platnost v cache a max. rozsah ±dní
+KALENDAR_CEN_CACHE_TTL = 600
+KALENDAR_CEN_MAX_DNI = 15
+
+
+# --- REZERVACE ---
+
+# Kolik minut drží nezaplacená rezervace místa (viz Rezervace.expirace)
+REZERVACE_DOBA_DRZENI = 30
+
+# Kolikrát se rezervace zkusí znovu, když ji databáze odmítne kvůli souběhu
+# (deadlock, zamčená SQLite, souběžně obsazené sedadlo) - viz main/rezervovani.py
+REZERVACE_OPAKOVANI = 3
+
+
+# --- ROZVRH LETŮ ---
+
+# Minimální obrátka letadla (minuty mezi přistáním a dalším odletem) - viz main/kolize.py
+KOLIZE_MIN_OBRATKA = 30
+
+
+# --- METRIKY ---
+
+# /metrics (Prometheus, viz main/metriky.py) vidí přihlášení zaměstnanci (is_staff)
+# a scraper s hlavičkou "Authorization: Bearer <METRIKY_TOKEN>"
+METRIKY_TOKEN = os.environ.get('METRIKY_TOKEN')
+# Každý proces (gunicorn worker) sem zapisuje své metriky, /metrics je sčítá
+METRIKY_ADRESAR = os.environ.get('METRIKY_ADRESAR', BASE_DIR / 'metriky')
+# Jak často (s) proces zapisuje své metriky do adresáře
+METRIKY_ZAPIS_S = 10
+
+
+# --- PROFILOVÁNÍ ---
+
+# Profil jednoho požadavku pro zaměstnance (?_profil=1, viz main/profilovani.py).
+# Profily se drží na disku jako kruhový buffer o PROFILOVANI_MAX_PROFILU položkách.
+PROFILOVANI_ZAPNUTO = True
+PROFILOVANI_ADRESAR = os.environ.get('PROFILOVANI_ADRESAR', BASE_DIR / 'profily')
+PROFILOVANI_MAX_PROFILU = 50
+
+
+# --- POMALÉ DOTAZY ---
+
+# SQL dotazy delší než tento práh (ms) se zaznamenají i s plánem (EXPLAIN) - viz
+# main/pomale_dotazy.py a manage.py slow_queries. None = nesledovat
+# (v proměnné prostředí prázdná hodnota nebo "off").
+_prah = os.environ.get('POMALE_DOTAZY_PRAH_MS', '200').strip()
+POMALE_DOTAZY_PRAH_MS = None if _prah.lower() in ('', 'off') else float(_prah)
+# Kolik nejhorších dotazů (podle celkového času) se drží a vypisuje
+POMALE_DOTAZY_TOP = 50
+POMALE_DOTAZY_ADRESAR = os.environ.get('POMALE_DOTAZY_ADRESAR', BASE_DIR / 'pomale_dotazy')
+# Jak často (s) proces zapisuje své statistiky do adresáře
+POMALE_DOTAZY_ZAPIS_S = 30
+
+
+# --- CACHE ---
+
+# Výchozí je paměť procesu (každý gunicorn worker má vlastní).
+# V produkci jde nastavit sdílenou cache (Redis, Memcached), pak se i
+# zneplatnění výsledků vyhledávání projeví ve všech workerech najednou.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'caelusdb',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+
 # --- VÝCHOZÍ PRIMÁRNÍ KLÍČ ---
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -24,6 +24,11 @@ from django.contrib.auth import views as auth_views
 from main import views
 
 urlpatterns = [
+    # Profily požadavků (viz main/profilovani.py) - v adminu, jen pro zaměstnance
+    path('admin/profily/', admin.site.admin_view(views.admin_profily), name='admin_profily'),
+    path('admin/profily/<str:profil_id>/', admin.site.admin_view(views.admin_profil), name='admin_profil'),
+    path('admin/profily/<str:profil_id>/stahnout/', admin.site.admin_view(views.admin_profil_stahnout),
+         name='admin_profil_stahnout'),
     path('admin/', admin.site.urls),
     path('', views.verejny_seznam_letu, name='home'),
 
@@ -68,8 +73,16 @@ urlpatterns = [
     path('management/lety/novy/', views.management_novy_let, name='management_novy_let'),
 
     # --- API ENDPOINTY ---
-    path('api/load-airline-data/', views.api_load_airline_data, name='api_load_airline_data'),
+    path('api/airline-data/aircraft/', views.api_airline_data, {'zdroj': 'letadla'}, name='api_airline_aircraft'),
+    path('api/airline-data/crew/', views.api_airline_data, {'zdroj': 'posadka'}, name='api_airline_crew'),
+    path('api/airline-data/classes/', views.api_airline_data, {'zdroj': 'tridy'}, name='api_airline_classes'),
+    path('api/flights/search/', views.api_flight_search, name='api_flight_search'),
     path('api/load-flight-detail/', views.api_load_flight_detail, name='api_load_flight_detail'),
     path('api/check-collisions/', views.api_check_collisions, name='api_check_collisions'),
     path('api/delete-flight/', views.api_delete_flight, name='api_delete_flight'),  # NOVÉ
+    path('api/fare-calendar/', views.api_fare_calendar, name='api_fare_calendar'),
+    path('api/airports/', views.api_airports, name='api_airports'),
+
+    # --- METRIKY (Prometheus očekává přesně /metrics) ---
+    path('metrics', views.metriky_prometheus, name='metriky'),
 ]
@@ -0,0 +1,12 @@
+"""
+Benchmarky hlavních cest aplikace (vyhledávání, rezervace, moje rezervace,
+kontrola kolizí) nad reprodukovatelnými daty v několika velikostech.
+
+    python -m benchmarks.run --scale small --scale medium --output report.json
+    python -m benchmarks.run --scale medium --baseline benchmarks/baseline.json --threshold 0.25
+
+Běží v testovací databázi (jako manage.py test), vývojová data se nemění.
+Každý scénář se projde Django test clientem a změří se čas, počet SQL dotazů
+a čas strávený v SQL. Report je JSON; porovnání s uloženým reportem (--baseline)
+vrátí nenulový exit kód, pokud se některý scénář zhoršil.
+"""
@@ -0,0 +1,86 @@
+"""
+Data pro benchmarky: manage.py generate_dataset s pevným seedem a výběr
+konkrétních objektů (zákazník, trasa, let...), na které scénáře míří.
+
+Lety začínají zítra, aby byly v indexu nadcházejících letů - mezi dny se
+tak data liší jen posunem v čase, struktura je pro daný seed stejná.
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.utils import timezone
+
+from main.models import Aerolinky, Lety, Rezervace, Role, RoleUzivatel, Uzivatele
+from main.vyhledavani import MIN_CAS_PRESTUPU, MAX_CAS_PRESTUPU
+from main import mapa_sedadel
+
+VELIKOSTI = {
+    'small': {'airports': 30, 'airlines': 3, 'flights': 2000, 'bookings': 1000},
+    'medium': {'airports': 100, 'airlines': 8, 'flights': 20000, 'bookings': 20000},
+    'large': {'airports': 300, 'airlines': 20, 'flights': 200000, 'bookings': 200000},
+}
+SEED = 20240601
+
+
+def priprav(velikost, stdout=None):
+    """Naplní (prázdnou) databázi daty dané velikosti a vrátí cíle scénářů."""
+    start = timezone.localdate() + timedelta(days=1)
+    call_command('generate_dataset', seed=SEED, start=start.isoformat(), stdout=stdout, **VELIKOSTI[velikost])
+    return _vyber_cile(start)
+
+
+def _vyber_cile(start):
+    cile = SimpleNamespace(datum=start.isoformat())
+
+    # Zákazník s nejvíce rezervacemi
+    cile.zakaznik = Uzivatele.objects.get(pk=(
+        Rezervace.objects.values('id_uzivatele').annotate(pocet=Count('id'))
+        .order_by('-pocet', 'id_uzivatele').values_list('id_uzivatele', flat=True).first()))
+
+    # Správce letů první aerolinky
+    aerolinka = Aerolinky.objects.order_by('id').first()
+    cile.aerolinka = aerolinka
+    cile.spravce = Uzivatele.objects.create_user(email='spravce@benchmark.test', id_aerolinky=aerolinka)
+    role, _ = Role.objects.get_or_create(nazev_role="Správce letů")
+    RoleUzivatel.objects.create(id_uzivatele=cile.spravce, id_role=role)
+
+    # Nejfrekventovanější trasa (přímé lety)
+    trasa = (Lety.objects.values('id_letiste_odletu', 'id_letiste_priletu').annotate(pocet=Count('id'))
+             .order_by('-pocet', 'id_letiste_odletu', 'id_letiste_priletu').first())
+    cile.prima = (trasa['id_letiste_odletu'], trasa['id_letiste_priletu'])
+
+    # Přestup: první let z konce nejfrekventovanější trasy, který na ni navazuje
+    prvni = (Lety.objects.filter(id_letiste_odletu=cile.prima[0], id_letiste_priletu=cile.prima[1])
+             .order_by('cas_odletu', 'id').first())
+    druhy = (Lety.objects
+             .filter(id_letiste_odletu=prvni.id_letiste_priletu_id,
+                     cas_odletu__gte=prvni.cas_priletu + MIN_CAS_PRESTUPU,
+                     cas_odletu__lte=prvni.cas_priletu + MAX_CAS_PRESTUPU)
+             .exclude(id_letiste_priletu=prvni.id_letiste_odletu_id)
+             .order_by('cas_odletu', 'id').first())
+    cile.prestup = (prvni.id_letiste_odletu_id, druhy.id_letiste_priletu_id)
+    cile.cesta = [prvni.id, druhy.id]
+
+    # Volné sedadlo v nejlevnější třídě každého letu cesty (pro POST rezervace)
+    mapy = mapa_sedadel.mapy_letu(cile.cesta)
+    cile.polozky = []
+    for let_id in cile.cesta:
+        mapa = mapy[let_id]
+        kabina = mapa.kabiny[0]
+        kod = next(mapa.kod(i) for i in range(kabina['od'], kabina['od'] + kabina['pocet'])
+                   if mapa.je_volne(mapa.kod(i)))
+        cile.polozky.append((let_id, kabina['inventar'], kod))
+
+    # Let s posádkou pro kontrolu kolizí
+    let = Lety.objects.filter(id_aerolinky=aerolinka).order_by('cas_odletu', 'id').first()
+    cile.kolize = {
+        'flight_id': let.id,
+        'cas_odletu': timezone.localtime(let.cas_odletu).strftime('%Y-%m-%dT%H:%M'),
+        'cas_priletu': timezone.localtime(let.cas_priletu).strftime('%Y-%m-%dT%H:%M'),
+        'id_letadla': let.id_letadla_id,
+        'posadka_ids': list(let.posadka.values_list('id', flat=True)),
+    }
+    cile.cislo_letu = let.cislo_letu
+    return cile
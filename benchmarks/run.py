@@ -0,0 +1,193 @@
+"""
+Spuštění benchmarků: python -m benchmarks.run --help
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+
+KOREN = Path(__file__).resolve().parent.parent
+VYCHOZI_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+# Metriky, které se porovnávají s baseline: časové s tolerancí (--threshold),
+# počet dotazů přesně (je deterministický - nárůst znamená N+1)
+CASOVE_METRIKY = ('cas_ms', 'sql_ms')
+
+
+class MericSQL:
+    """execute_wrapper: počet dotazů a čas strávený v databázi."""
+
+    def __init__(self):
+        self.dotazu = 0
+        self.cas = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        zacatek = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.cas += time.perf_counter() - zacatek
+            self.dotazu += 1
+
+
+@contextmanager
+def _vratit_zmeny(zapisuje):
+    """Zapisující scénář běží v transakci, která se po měření vrátí."""
+    if not zapisuje:
+        yield
+        return
+    from django.db import transaction
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def zmer(scenar, client, cile, opakovani):
+    from django.db import connection
+
+    vysledky = []
+    for pokus in range(opakovani + 1):  # první průchod zahřívá cache a indexy, nepočítá se
+        meric = MericSQL()
+        with _vratit_zmeny(scenar.zapisuje), connection.execute_wrapper(meric):
+            zacatek = time.perf_counter()
+            odpoved = scenar.pozadavek(client, cile)
+            cas = time.perf_counter() - zacatek
+        if odpoved.status_code >= 400:
+            raise RuntimeError(f"{scenar.nazev}: HTTP {odpoved.status_code}")
+        if pokus:
+            vysledky.append((cas, meric.dotazu, meric.cas))
+
+    casy = sorted(v[0] for v in vysledky)
+    return {
+        'cas_ms': round(statistics.median(casy) * 1000, 2),
+        'cas_p95_ms': round(casy[min(len(casy) - 1, int(len(casy) * 0.95))] * 1000, 2),
+        'dotazu': max(v[1] for v in vysledky),
+        'sql_ms': round(statistics.median(v[2] for v in vysledky) * 1000, 2),
+        'status': odpoved.status_code,
+    }
+
+
+def spust_velikost(velikost, scenare, opakovani, vypis):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from benchmarks import datasety
+
+    vypis(f"== {velikost}: generuji data")
+    stara_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        cache.clear()
+        zacatek = time.perf_counter()
+        cile = datasety.priprav(velikost, stdout=StringIO())
+        vypis(f"   data za {time.perf_counter() - zacatek:.1f} s")
+
+        vysledky = {}
+        for scenar in scenare:
+            client = Client()
+            if scenar.uzivatel:
+                client.force_login(getattr(cile, scenar.uzivatel))
+            vysledky[scenar.nazev] = zmer(scenar, client, cile, opakovani)
+            v = vysledky[scenar.nazev]
+            vypis(f"   {scenar.nazev:32} {v['cas_ms']:9.2f} ms  {v['dotazu']:4} dotazů  {v['sql_ms']:9.2f} ms SQL")
+        return vysledky
+    finally:
+        connection.creation.destroy_test_db(stara_db, verbosity=0)
+
+
+def porovnej(report, baseline, tolerance, min_rozdil_ms):
+    """
+    Zhoršení proti baseline: [(velikost, scénář, metrika, baseline, teď)].
+    Čas se počítá jako zhoršení, jen když je horší o víc než tolerance
+    i o víc než min_rozdil_ms - u rychlých scénářů je jinak šum větší než signál.
+    """
+    zhorseni = []
+    for velikost, scenare in report['vysledky'].items():
+        for nazev, ted in scenare.items():
+            puvodni = baseline.get('vysledky', {}).get(velikost, {}).get(nazev)
+            if puvodni is None:
+                continue
+            if ted['dotazu'] > puvodni['dotazu']:
+                zhorseni.append((velikost, nazev, 'dotazu', puvodni['dotazu'], ted['dotazu']))
+            for metrika in CASOVE_METRIKY:
+                if ted[metrika] > max(puvodni[metrika] * (1 + tolerance), puvodni[metrika] + min_rozdil_ms):
+                    zhorseni.append((velikost, nazev, metrika, puvodni[metrika], ted[metrika]))
+    return zhorseni
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=KOREN, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__)
+    parser.add_argument('--scale', action='append', choices=['small', 'medium', 'large'],
+                        help='Velikost dat (lze opakovat), výchozí small')
+    parser.add_argument('--scenario', action='append', help='Jen vybrané scénáře (lze opakovat)')
+    parser.add_argument('--iterations', type=int, default=5, help='Opakování každého scénáře (bez zahřátí)')
+    parser.add_argument('--output', help='Kam zapsat JSON report (výchozí stdout)')
+    parser.add_argument('--baseline', help=f'Report k porovnání (výchozí {VYCHOZI_BASELINE.name}, pokud existuje)')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Povolené zhoršení času proti baseline (0.2 = o 20 %%)')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='Menší zhoršení času (v ms) se nepočítá ani nad --threshold')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(KOREN))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CaelusDB_project.settings')
+    import django
+    django.setup()
+    from django.test.utils import setup_test_environment
+    from benchmarks.scenare import SCENARE
+
+    scenare = [s for s in SCENARE if not args.scenario or s.nazev in args.scenario]
+    if not scenare:
+        parser.error(f"Neznámý scénář, dostupné: {', '.join(s.nazev for s in SCENARE)}")
+
+    setup_test_environment()
+    vypis = lambda text: print(text, file=sys.stderr)
+    from django.db import connection
+    report = {
+        'meta': {
+            'cas': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _commit(),
+            'databaze': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'opakovani': args.iterations,
+        },
+        'vysledky': {velikost: spust_velikost(velikost, scenare, args.iterations, vypis)
+                     for velikost in args.scale or ['small']},
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+    baseline = Path(args.baseline) if args.baseline else VYCHOZI_BASELINE
+    if not baseline.exists():
+        if args.baseline:
+            parser.error(f"Baseline {baseline} neexistuje")
+        return 0
+    zhorseni = porovnej(report, json.loads(baseline.read_text(encoding='utf-8')), args.threshold, args.min_delta_ms)
+    for velikost, nazev, metrika, puvodni, ted in zhorseni:
+        vypis(f"ZHORŠENÍ {velikost}/{nazev} {metrika}: {puvodni} -> {ted}")
+    if not zhorseni:
+        vypis(f"Bez zhoršení proti {baseline} (tolerance {args.threshold:.0%})")
+    return 1 if zhorseni else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Scénáře benchmarků. Každý dostane přihlášeného klienta a cíle z datasety.py
+a pošle jeden požadavek. Scénáře, které zapisují (rezervace), běží
+v transakci, která se po měření vrátí - každé opakování vidí stejná data.
+"""
+import json
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+@dataclass
+class Scenar:
+    nazev: str
+    pozadavek: Callable  # (client, cile) -> response
+    uzivatel: Optional[str] = None  # atribut cílů, za koho se přihlásit (None = anonym)
+    zapisuje: bool = False
+
+
+def _hledani(client, odkud, kam, datum, **dalsi):
+    return client.get('/', {'odkud': odkud, 'kam': kam, 'datum': datum, **dalsi})
+
+
+def _rezervace_post(client, cile):
+    data = {}
+    for let_id, inventar_id, sedadlo in cile.polozky:
+        data[f'inventar_{let_id}'] = inventar_id
+        data[f'sedadlo_{let_id}'] = sedadlo
+    return client.post(f"/rezervace/{'-'.join(map(str, cile.cesta))}/", data)
+
+
+SCENARE = [
+    Scenar('home', lambda c, cile: c.get('/')),
+    Scenar('hledani_prime', lambda c, cile: _hledani(c, *cile.prima, cile.datum)),
+    Scenar('hledani_prestupy', lambda c, cile: _hledani(c, *cile.prestup, cile.datum)),
+    Scenar('hledani_prestupy_cena', lambda c, cile: _hledani(c, *cile.prestup, cile.datum, razeni='cena')),
+    Scenar('rezervace_detail_1_let', lambda c, cile: c.get(f'/rezervace/{cile.cesta[0]}/'), 'zakaznik'),
+    Scenar('rezervace_detail_prestup', lambda c, cile: c.get(f"/rezervace/{'-'.join(map(str, cile.cesta))}/"),
+           'zakaznik'),
+    Scenar('rezervace_vytvoreni', _rezervace_post, 'zakaznik', zapisuje=True),
+    Scenar('moje_rezervace', lambda c, cile: c.get('/moje-rezervace/', {'zobrazit_vse': 'on'}), 'zakaznik'),
+    Scenar('moje_rezervace_filtr',
+           lambda c, cile: c.get('/moje-rezervace/', {'datum_od': cile.datum, 'datum_do': cile.datum}), 'zakaznik'),
+    Scenar('api_check_collisions',
+           lambda c, cile: c.post('/api/check-collisions/', json.dumps(cile.kolize), content_type='application/json'),
+           'spravce'),
+    Scenar('api_flight_search',
+           lambda c, cile: c.get('/api/flights/search/', {'airline_id': cile.aerolinka.id, 'q': cile.cislo_letu[:3]}),
+           'spravce'),
+]
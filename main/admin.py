@@ -1,25 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.db.models import Q
-from django.utils import timezone
 from . import models
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-
-
-# --- POMOCNÁ FUNKCE ---
-def ma_platnou_roli(user, role_nazvy):
-    if user.is_superuser: return True
-    if isinstance(role_nazvy, str): role_nazvy = [role_nazvy]
-
-    return (models.RoleUzivatel.objects.filter(
-        id_uzivatele=user,
-        id_role__nazev_role__in=role_nazvy,
-        plati_do__gte=timezone.now()
-    ).exists() | models.RoleUzivatel.objects.filter(
-        id_uzivatele=user,
-        id_role__nazev_role__in=role_nazvy,
-        plati_do__isnull=True
-    ).exists())
+# Platné role se načítají jednou za požadavek a cachují (viz opravneni.py)
+from .opravneni import ma_platnou_roli, id_roli
 
 
 # --- 1. UŽIVATELÉ A ROLE (INLINE) ---
@@ -262,9 +247,9 @@ class LetyAdmin(admin.ModelAdmin):
         user = request.user
         if not user.is_superuser and user.id_aerolinky and ma_platnou_roli(user, ["Správce letů", "Admin aerolinky"]):
             if db_field.name == "posadka":
-                role_names = ['Pilot', 'Palubní průvodčí']
+                role_ids = id_roli(['Pilot', 'Palubní průvodčí'])
                 kwargs["queryset"] = models.Uzivatele.objects.filter(id_aerolinky=user.id_aerolinky,
-                                                                     role__nazev_role__in=role_names)
+                                                                     role__in=role_ids)
         return super().formfield_for_manytomany(db_field, request, **kwargs)
 
     def get_form(self, request, obj=None, **kwargs):
@@ -502,6 +487,9 @@ class LetenkyAdmin(admin.ModelAdmin):
 
 
 # --- REGISTRACE ---
+# Úvodní stránka adminu s odkazem na profily požadavků (viz main/profilovani.py)
+admin.site.index_template = 'admin/index_caelus.html'
+
 admin.site.register(models.Uzivatele, CustomUserAdmin)
 admin.site.register(models.Role)
 admin.site.register(models.Letiste, LetisteAdmin)
@@ -0,0 +1,108 @@
+"""
+Cache výsledků vyhledávání letů (přes Django cache framework).
+
+Pro každé vyhledávání (odkud, kam, datum) si uložíme kandidáty cest
+(n-tice ID letů + časy), takže listování stránkami a opakovaná populární
+hledání nemusí znovu hledat trasy. Dostupnost a ceny se neukládají - ty se
+počítají při každém zobrazení, ale jen pro jednu stránku (viz serad_kandidaty).
+Stejně se ukládá i cenový kalendář trasy (po měsících) - ten ceny obsahuje,
+proto má krátkou platnost (KALENDAR_CEN_CACHE_TTL).
+
+Zneplatnění je po letištích: každé letiště má razítko (náhodnou hodnotu),
+které se změní, když se změní let z/do tohoto letiště. Výsledek si pamatuje razítka letišť, na kterých závisí,
+a při čtení je porovná s aktuálními. Razítko '*' se mění při každé změně
+a používají ho hledání bez zadaného letiště.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'vyhledavani'
+VSE = '*'
+
+
+def _klic_razitka(letiste_id):
+    return f'{PREFIX}:razitko:{letiste_id}'
+
+
+def _klic_vysledku(odkud, kam, datum):
+    return f'{PREFIX}:vysledek:{odkud or ""}:{kam or ""}:{datum or ""}'
+
+
+def _nove_razitko():
+    return uuid.uuid4().hex
+
+
+def aktualni_razitka(letiste_ids):
+    """
+    Vrátí {letiste_id: razitko}. Chybějící razítka (nová nebo vyhozená z cache)
+    rovnou vytvoří - výsledek uložený se starým razítkem tím přestane platit.
+    """
+    klice = {_klic_razitka(l): str(l) for l in letiste_ids}
+    nalezeno = cache.get_many(klice.keys())
+    chybi = {k: _nove_razitko() for k in klice if k not in nalezeno}
+    if chybi:
+        cache.set_many(chybi, timeout=None)
+        nalezeno.update(chybi)
+    return {klice[k]: hodnota for k, hodnota in nalezeno.items()}
+
+
+def zneplatni_letiste(letiste_ids):
+    """
+    Změní razítka zadaných letišť (a globální razítko '*').
+    """
+    razitka = {_klic_razitka(l): _nove_razitko() for l in letiste_ids if l is not None}
+    razitka[_klic_razitka(VSE)] = _nove_razitko()
+    cache.set_many(razitka, timeout=None)
+
+
+def _nacti(klic):
+    zaznam = cache.get(klic)
+    if zaznam is None:
+        return None
+    if aktualni_razitka(zaznam['razitka'].keys()) != zaznam['razitka']:
+        return None
+    return zaznam['hodnota']
+
+
+def _uloz(klic, hodnota, zavislosti, razitko_pred, timeout):
+    if aktualni_razitka([VSE])[VSE] != razitko_pred:
+        return
+    # Hledání bez letiště závisí na všech letech
+    zavislosti = set(str(l) for l in zavislosti) or {VSE}
+    cache.set(klic, {'razitka': aktualni_razitka(zavislosti), 'hodnota': hodnota}, timeout=timeout)
+
+
+def nacti_vysledek(odkud, kam, datum):
+    """
+    Vrátí uložené kandidáty cest, nebo None, pokud nejsou v cache nebo už neplatí.
+    """
+    return _nacti(_klic_vysledku(odkud, kam, datum))
+
+
+def uloz_vysledek(odkud, kam, datum, kandidati, zavislosti, razitko_pred):
+    """
+    Uloží kandidáty cest. 'razitko_pred' je globální razítko přečtené před
+    výpočtem - pokud se mezitím něco změnilo, výsledek raději neukládáme.
+    """
+    _uloz(_klic_vysledku(odkud, kam, datum), kandidati, zavislosti, razitko_pred,
+          settings.VYHLEDAVANI_CACHE_TTL)
+
+
+def nacti_kalendar(odkud, kam, mesic):
+    """
+    Vrátí uložený cenový kalendář trasy pro měsíc (viz kalendar_cen.py), nebo None.
+    """
+    return _nacti(f'{PREFIX}:kalendar:{odkud}:{kam}:{mesic}')
+
+
+def uloz_kalendar(odkud, kam, mesic, dny, razitko_pred):
+    # Přímé lety i oba úseky přestupu začínají v 'odkud' nebo končí v 'kam',
+    # takže změnu kteréhokoliv z nich zachytí razítka těchto dvou letišť
+    _uloz(f'{PREFIX}:kalendar:{odkud}:{kam}:{mesic}', dny, {odkud, kam}, razitko_pred,
+          settings.KALENDAR_CEN_CACHE_TTL)
+
+
+def globalni_razitko():
+    return aktualni_razitka([VSE])[VSE]
@@ -0,0 +1,125 @@
+"""
+Data aerolinky pro správu letů (flight_management.js) po jednotlivých zdrojích.
+
+Dřív api_load_airline_data posílal při každém výběru aerolinky najednou
+všechna letadla, posádku, třídy a všechny lety, které kdy aerolinka měla.
+Teď má každý zdroj vlastní URL a vlastní počítadlo VerzeDat na aerolinku:
+- letadla, posádka a třídy jsou malé - odpověď nese verzi jako ETag
+  (a Last-Modified), prohlížeč se ptá If-None-Match a dostane 304;
+  klient bez HTTP cache pošle ?since=<verze> a při shodě dostane jen
+  {"zmeneno": false},
+- lety se neposílají vůbec - konkrétní let se hledá na serveru podle
+  začátku čísla (hledej_lety), klient nemusí znát celou historii letů.
+Počítadla zvyšují signály (signals.py) až po commitu.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Letadla, Lety, TridySedadel, Uzivatele, VerzeDat
+from . import opravneni
+
+LETADLA = 'letadla'
+POSADKA = 'posadka'
+TRIDY = 'tridy'
+ZDROJE = (LETADLA, POSADKA, TRIDY)
+
+# Třídy bez aerolinky jsou společné všem - mají vlastní počítadlo
+SPOLECNE = '*'
+
+
+def _klic(zdroj, aerolinka_id):
+    return f'sprava:{zdroj}:{aerolinka_id}'
+
+
+def _klice(zdroj, aerolinka_id):
+    klice = [_klic(zdroj, aerolinka_id)]
+    if zdroj == TRIDY:
+        klice.append(_klic(TRIDY, SPOLECNE))
+    return klice
+
+
+def verze(zdroj, aerolinka_id):
+    """
+    Verze zdroje jedním dotazem: (text verze, kdy se naposledy změnil nebo None).
+    Text verze je i ETagem odpovědi (a hodnotou pro ?since=).
+    """
+    stav = VerzeDat.stav(_klice(zdroj, aerolinka_id))
+    text = '.'.join(str(v) for v, _ in stav.values())
+    zmeny = [z for _, z in stav.values() if z is not None]
+    return text, max(zmeny) if zmeny else None
+
+
+def zmena(zdroj, aerolinka_ids):
+    """Zdroj aerolinek se změnil - po commitu zvýší jejich počítadla."""
+    klice = set()
+    for aerolinka_id in aerolinka_ids:
+        if aerolinka_id is None and zdroj != TRIDY:
+            continue
+        klice.add(_klic(zdroj, SPOLECNE if aerolinka_id is None else aerolinka_id))
+    if klice:
+        transaction.on_commit(lambda: [VerzeDat.zvys(klic) for klic in sorted(klice)])
+
+
+def zmena_posadky(uzivatel_ids):
+    """Uživatelé dostali / ztratili roli - mění se posádka jejich aerolinek."""
+    uzivatel_ids = list(uzivatel_ids)
+    if uzivatel_ids:
+        zmena(POSADKA, set(Uzivatele.objects.filter(pk__in=uzivatel_ids, id_aerolinky__isnull=False)
+                           .values_list('id_aerolinky_id', flat=True)))
+
+
+# --- ZDROJE ---
+
+def letadla(aerolinka_id):
+    return list(Letadla.objects.filter(id_aerolinky_id=aerolinka_id).order_by('id')
+                .values('id', 'model', 'kapacita_sedadel'))
+
+
+def posadka(aerolinka_id):
+    """Piloti a palubní průvodčí aerolinky jedním dotazem."""
+    piloti, pruvodci = opravneni.id_roli("Pilot"), opravneni.id_roli("Palubní průvodčí")
+    vysledek = {'piloti': [], 'pruvodci': []}
+    for clen in (Uzivatele.objects
+                 .filter(id_aerolinky_id=aerolinka_id, role__in=piloti | pruvodci)
+                 .order_by('id')
+                 .values('id', 'first_name', 'last_name', 'email', 'role')):
+        role = clen.pop('role')
+        seznam = vysledek['piloti'] if role in piloti else vysledek['pruvodci']
+        if not seznam or seznam[-1]['id'] != clen['id']:
+            seznam.append(clen)
+    return vysledek
+
+
+def tridy(aerolinka_id):
+    return list(TridySedadel.objects.filter(Q(id_aerolinky_id=aerolinka_id) | Q(id_aerolinky__isnull=True))
+                .order_by('id').values('id', 'nazev_tridy'))
+
+
+NACITANI = {LETADLA: letadla, POSADKA: posadka, TRIDY: tridy}
+
+
+# --- HLEDÁNÍ PODLE ČÍSLA LETU ---
+
+def hledej_lety(aerolinka_id, q, od=None, do=None, bez_letu=None, limit=20):
+    """
+    Lety aerolinky, jejichž číslo začíná na q (a volitelně s odletem v <od, do)),
+    seřazené podle čísla a odletu - čte se po indexu lety_aerolinka_cislo_idx.
+    Vrací (lety, existuje - zda už jiný let přesně s číslem q existuje).
+    """
+    q = q.strip().upper()
+    lety = Lety.objects.filter(id_aerolinky_id=aerolinka_id)
+    if od is not None:
+        lety = lety.filter(cas_odletu__gte=od)
+    if do is not None:
+        lety = lety.filter(cas_odletu__lt=do)
+    nalezene = list(lety.filter(cislo_letu__startswith=q)
+                    .order_by('cislo_letu', 'cas_odletu', 'id')
+                    .values('id', 'cislo_letu', 'cas_odletu')[:limit])
+
+    # Přesná shoda bez ohledu na okno (číslo letu nesmí kolidovat s historií)
+    if any(l['cislo_letu'] == q and l['id'] != bez_letu for l in nalezene):
+        existuje = True
+    else:
+        existuje = (Lety.objects.filter(id_aerolinky_id=aerolinka_id, cislo_letu=q)
+                    .exclude(id=bez_letu).exists())
+    return nalezene, existuje
@@ -0,0 +1,89 @@
+"""
+Hromadný výpočet dostupnosti letů.
+
+Dřív se pro každý let zvlášť načítal inventář a pro každou třídu
+se počítaly prodané letenky (N+1 dotazů). Tady načteme dostupnost
+pro celou sadu letů najednou - obsazenost se už nepočítá z letenek,
+ale čte z počítadel v InventarLetu (viz obsazenost.py). Místa držená
+propadlými rezervacemi, které ještě nesmazal úklid, se počítají jako volná.
+"""
+from django.db.models import Min
+
+from .models import InventarLetu
+from .obsazenost import propadle_drzeni
+
+# SQLite má limit na počet parametrů v jednom dotazu, proto IN (...) dělíme na dávky
+VELIKOST_DAVKY = 500
+
+
+def po_davkach(hodnoty, velikost=VELIKOST_DAVKY):
+    hodnoty = list(hodnoty)
+    for i in range(0, len(hodnoty), velikost):
+        yield hodnoty[i:i + velikost]
+
+
+class DostupnostLetu:
+    """
+    Souhrn dostupnosti jednoho letu přes všechny jeho třídy.
+    """
+    __slots__ = ('tridy', 'nejnizsi_cena')
+
+    def __init__(self):
+        # id_tridy -> (kapacita, prodáno, cena)
+        self.tridy = {}
+        # Nejnižší cena ze tříd, kde je ještě volné místo (None = vyprodáno)
+        self.nejnizsi_cena = None
+
+    @property
+    def je_volno(self):
+        return self.nejnizsi_cena is not None
+
+    def zbyva_mist(self, id_tridy=None):
+        if id_tridy is not None:
+            kapacita, prodano, _ = self.tridy.get(id_tridy, (0, 0, None))
+            return max(kapacita - prodano, 0)
+        return sum(max(kapacita - prodano, 0) for kapacita, prodano, _ in self.tridy.values())
+
+
+def nacti_dostupnost(let_ids):
+    """
+    Vrátí slovník {id_letu: DostupnostLetu} pro všechny zadané lety.
+    Počet dotazů nezávisí na počtu letů (2 dotazy na každou dávku ID).
+    """
+    let_ids = set(let_ids)
+    vysledek = {let_id: DostupnostLetu() for let_id in let_ids}
+
+    for davka in po_davkach(let_ids):
+        # Inventář (kapacita, obsazenost a cena) všech tříd těchto letů
+        inventare = (InventarLetu.objects
+                     .filter(id_letu_id__in=davka)
+                     .values_list('id_letu_id', 'id_tridy_id', 'pocet_mist_k_prodeji', 'prodano', 'drzeno', 'cena'))
+        propadle = propadle_drzeni(davka)
+
+        for let_id, trida_id, kapacita, prodano, drzeno, cena in inventare:
+            info = vysledek[let_id]
+            pocet = prodano + drzeno - propadle.get((let_id, trida_id), 0)
+            info.tridy[trida_id] = (kapacita, pocet, cena)
+
+            # Hledáme nejnižší cenu z tříd, kde je ještě volno
+            if pocet < kapacita and (info.nejnizsi_cena is None or cena < info.nejnizsi_cena):
+                info.nejnizsi_cena = cena
+
+    return vysledek
+
+
+def nejnizsi_ceny(let_ids):
+    """
+    Vrátí {id_letu: nejnižší cena ze všech tříd} bez ohledu na obsazenost.
+    Jen jeden levný dotaz na inventář (bez letenek) - slouží jako dolní odhad
+    ceny při řazení, skutečnou dostupnost pak stačí spočítat pro jednu stránku.
+    """
+    vysledek = {}
+    for davka in po_davkach(set(let_ids)):
+        vysledek.update(InventarLetu.objects
+                        .filter(id_letu_id__in=davka)
+                        .values('id_letu_id')
+                        .annotate(cena=Min('cena'))
+                        .order_by()
+                        .values_list('id_letu_id', 'cena'))
+    return vysledek
@@ -0,0 +1,139 @@
+"""
+Paměťový prefixový index letišť pro našeptávač (jeden pro každý proces).
+
+Dřív se do domovské stránky i do správy letů vkládala celá tabulka Letiste
+a filtrovalo se v prohlížeči. Teď prohlížeč volá /api/airports/?q=
+a hledá se tady:
+- každé slovo kódu IATA, města, názvu letiště a země je v seřazeném seznamu
+  (bez diakritiky a malými písmeny - "brno" najde i "Brno", "plzen" i "Plzeň"),
+- slova s daným prefixem najdeme binárním vyhledáváním (bisect).
+
+Index se načte líně a zahodí se při změně letiště - ve vlastním procesu hned
+(signál), v ostatních přes počítadlo VerzeDat('letiste'), které se kvůli
+rychlosti kontroluje nejvýš jednou za KONTROLA_VERZE sekund.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.db import transaction
+
+from .models import Letiste, VerzeDat
+
+KLIC_VERZE = 'letiste'
+KONTROLA_VERZE = 5  # sekund
+
+# Pořadí polí = priorita při řazení výsledků (shoda v kódu IATA je nejlepší)
+POLE = ('kod_iata', 'mesto', 'nazev_letiste', 'zeme')
+
+_zamek = threading.RLock()
+_index = None
+_verze = None
+_zkontrolovano = 0.0
+
+
+def normalizuj(text):
+    """Malá písmena bez diakritiky ('Plzeň' -> 'plzen')."""
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(z for z in text if not unicodedata.combining(z)).casefold()
+
+
+def slova(text):
+    return re.findall(r'\w+', normalizuj(text))
+
+
+class IndexLetist:
+    def __init__(self, radky):
+        # id -> slovník pro JSON
+        self.letiste = {}
+        # id -> [(pole, slovo)] pro kontrolu dalších slov dotazu
+        self.slova_letiste = {}
+        # Seřazené (slovo, pole, id) + souběžný seznam slov kvůli bisect
+        zaznamy = []
+
+        for radek in radky:
+            letiste_id = radek[0]
+            self.letiste[letiste_id] = dict(zip(('id',) + POLE, radek))
+            self.slova_letiste[letiste_id] = []
+            for pole, hodnota in enumerate(radek[1:]):
+                for slovo in set(slova(hodnota or '')):
+                    zaznamy.append((slovo, pole, letiste_id))
+                    self.slova_letiste[letiste_id].append((pole, slovo))
+
+        zaznamy.sort()
+        self.zaznamy = zaznamy
+        self.klice = [z[0] for z in zaznamy]
+
+    def __len__(self):
+        return len(self.letiste)
+
+    def _s_prefixem(self, prefix):
+        # Všechna slova začínající prefixem leží v seřazeném seznamu za sebou
+        od = bisect_left(self.klice, prefix)
+        do = bisect_left(self.klice, prefix + '\U0010ffff', od)
+        return self.zaznamy[od:do]
+
+    def hledej(self, dotaz, limit=10):
+        """
+        Vrátí nejlepší letiště, kde každé slovo dotazu je začátkem
+        některého slova letiště. Řazení: pole shody (IATA, město, název, země),
+        přesná shoda před prefixem, pak podle města.
+        """
+        hledana = slova(dotaz)
+        if not hledana:
+            return []
+        # Nejdelší slovo je nejselektivnější - podle něj vybereme kandidáty
+        hledana.sort(key=len, reverse=True)
+        prvni, ostatni = hledana[0], hledana[1:]
+
+        nejlepsi = {}
+        for slovo, pole, letiste_id in self._s_prefixem(prvni):
+            skore = (pole, slovo != prvni)
+            if letiste_id not in nejlepsi or skore < nejlepsi[letiste_id]:
+                nejlepsi[letiste_id] = skore
+
+        vysledky = []
+        for letiste_id, skore in nejlepsi.items():
+            slova_letiste = self.slova_letiste[letiste_id]
+            if all(any(s.startswith(h) for _, s in slova_letiste) for h in ostatni):
+                vysledky.append((skore, normalizuj(self.letiste[letiste_id]['mesto']), letiste_id))
+
+        return [self.letiste[letiste_id] for _, _, letiste_id in heapq.nsmallest(limit, vysledky)]
+
+
+def _nacti():
+    verze = VerzeDat.aktualni(KLIC_VERZE)
+    return IndexLetist(Letiste.objects.values_list('id', *POLE)), verze
+
+
+def ziskej_index():
+    """
+    Vrátí index letišť tohoto procesu (sdílenou verzi kontroluje jen občas).
+    """
+    global _index, _verze, _zkontrolovano
+    with _zamek:
+        ted = time.monotonic()
+        if _index is not None and ted - _zkontrolovano < KONTROLA_VERZE:
+            return _index
+        _zkontrolovano = ted
+
+        if _index is None or VerzeDat.aktualni(KLIC_VERZE) != _verze:
+            _index, _verze = _nacti()
+        return _index
+
+
+def _zahod():
+    global _index, _verze
+    with _zamek:
+        VerzeDat.zvys(KLIC_VERZE)
+        _index, _verze = None, None
+
+
+def letiste_zmeneno():
+    """
+    Volá se ze signálů - index zahodíme po commitu (načte se při dalším hledání).
+    """
+    transaction.on_commit(_zahod)
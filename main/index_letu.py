@@ -0,0 +1,106 @@
+"""
+Paměťový index nadcházejících letů (jeden pro každý proces / gunicorn worker).
+
+Vyhledávání tras pak nemusí při každém požadavku číst celou tabulku Lety,
+z databáze se čte jen dostupnost. Index se načte líně při prvním použití
+a udržuje se aktuální:
+- ve vlastním procesu po jednotlivých letech přes signály post_save / post_delete,
+- mezi procesy přes počítadlo VerzeDat('lety') - když ho změní jiný proces,
+  index se při příštím použití načte znovu.
+"""
+import threading
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Lety, VerzeDat
+from .vyhledavani import HranaLetu, SitLetu
+
+KLIC_VERZE = 'lety'
+
+SLOUPCE = ('id', 'id_letiste_odletu_id', 'id_letiste_priletu_id', 'cas_odletu', 'cas_priletu')
+
+_zamek = threading.RLock()
+_sit = None
+_verze = None
+
+
+def hranice_indexu():
+    """
+    Od kdy držíme lety v paměti - od začátku dnešního dne (místní čas).
+    """
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def _nacti():
+    hranice = hranice_indexu()
+    # Verzi čteme PŘED načtením letů - změna během načítání pak vyvolá další načtení
+    verze = VerzeDat.aktualni(KLIC_VERZE)
+    radky = Lety.objects.filter(cas_odletu__gte=hranice).values_list(*SLOUPCE)
+    sit = SitLetu(HranaLetu(*r) for r in radky.iterator(chunk_size=5000))
+    sit.hranice = hranice
+    return sit, verze
+
+
+def ziskej_sit():
+    """
+    Vrátí aktuální síť nadcházejících letů (SitLetu) tohoto procesu.
+    Stojí jeden malý dotaz na verzi, lety se čtou jen při první/vynucené obnově.
+    """
+    global _sit, _verze
+    with _zamek:
+        verze = VerzeDat.aktualni(KLIC_VERZE)
+        zastarala = _sit is not None and hranice_indexu() - _sit.hranice >= timedelta(days=1)
+        if _sit is None or verze != _verze or zastarala:
+            _sit, _verze = _nacti()
+        return _sit
+
+
+def zahod_index():
+    """
+    Zahodí index v tomto procesu a zvýší sdílenou verzi, takže se všude načte znovu.
+    Použít po hromadných operacích, které neposílají signály (bulk_create, update).
+    """
+    global _sit, _verze
+    with _zamek:
+        VerzeDat.zvys(KLIC_VERZE)
+        _sit, _verze = None, None
+
+
+def _aplikuj_zmenu(let_id):
+    global _sit, _verze
+    with _zamek:
+        nova_verze = VerzeDat.zvys(KLIC_VERZE)
+        if _sit is None:
+            return
+        if nova_verze != _verze + 1:
+            # Mezitím změnil lety i jiný proces - jeho změnu neznáme, načteme vše znovu
+            _sit, _verze = None, None
+            return
+
+        _sit.odeber(let_id)
+        radek = Lety.objects.filter(id=let_id, cas_odletu__gte=_sit.hranice).values_list(*SLOUPCE).first()
+        if radek:
+            _sit.pridej(HranaLetu(*radek))
+        _verze = nova_verze
+
+
+def let_zmenen(let_id):
+    """
+    Volá se ze signálů. Změnu promítneme až po commitu transakce
+    (a z databáze, protože instance může mít časy ještě jako text z formuláře).
+    """
+    transaction.on_commit(lambda: _aplikuj_zmenu(let_id))
+
+
+def letiste_letu(let_id):
+    """
+    Vrátí (id_letiste_odletu, id_letiste_priletu) letu - z indexu, pokud
+    let máme v paměti, jinak z databáze (None, pokud let neexistuje).
+    """
+    sit = _sit
+    if sit is not None and let_id in sit.lety:
+        let = sit.lety[let_id]
+        return let.id_letiste_odletu_id, let.id_letiste_priletu_id
+    return Lety.objects.filter(id=let_id).values_list('id_letiste_odletu_id', 'id_letiste_priletu_id').first()
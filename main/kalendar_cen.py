@@ -0,0 +1,143 @@
+"""
+Cenový kalendář trasy: nejlevnější dostupná cena pro každý den.
+
+Zákazník tak nemusí zkoušet vyhledávání den po dni. Kalendář se počítá
+po celých měsících (a tak se i ukládá do cache, viz cache_vyhledavani):
+- přímé lety: jeden dotaz seskupený podle dne odletu (Lety + InventarLetu),
+- lety s jedním přestupem: dva dotazy (lety z výchozího letiště a lety do cíle,
+  každý s nejnižší volnou cenou) a spojení přes najdi_prestupy.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import F, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import InventarLetu, Lety
+from .vyhledavani import HranaLetu, najdi_prestupy, MAX_CAS_PRESTUPU
+from . import cache_vyhledavani
+
+# Třída má volné místo (počítadla viz obsazenost.py)
+VOLNO = Q(pocet_mist_k_prodeji__gt=F('prodano') + F('drzeno'))
+VOLNO_LETU = Q(inventarletu__pocet_mist_k_prodeji__gt=F('inventarletu__prodano') + F('inventarletu__drzeno'))
+
+# Jak dlouho po konci měsíce ještě může odlétat druhý úsek přestupu
+# (přílet prvního úseku + čekání; delší lety než den nepředpokládáme)
+PRESAH_PRESTUPU = MAX_CAS_PRESTUPU + timedelta(days=1)
+
+
+def _zacatek_dne(den):
+    return timezone.make_aware(datetime.combine(den, time.min))
+
+
+def _mesice(od, do):
+    """Všechny měsíce (první den), do kterých zasahuje interval <od, do>."""
+    mesic = od.replace(day=1)
+    while mesic <= do:
+        yield mesic
+        mesic = (mesic + timedelta(days=32)).replace(day=1)
+
+
+def _lety_s_cenou(lety):
+    """Lety jako HranaLetu + {id_letu: nejnižší volná cena} (jen lety s volným místem)."""
+    radky = (lety
+             .annotate(cena=Min('inventarletu__cena', filter=VOLNO_LETU))
+             .filter(cena__isnull=False)
+             .values_list('id', 'id_letiste_odletu_id', 'id_letiste_priletu_id',
+                          'cas_odletu', 'cas_priletu', 'cena'))
+    hrany, ceny = [], {}
+    for *sloupce, cena in radky:
+        hrany.append(HranaLetu(*sloupce))
+        ceny[sloupce[0]] = cena
+    return hrany, ceny
+
+
+def spocitej_mesic(odkud, kam, mesic):
+    """
+    Vrátí {den: {'cena': nejnižší cena nebo None, 'volno': bool, 'prestup': bool}}
+    pro dny měsíce, kdy z 'odkud' do 'kam' něco letí.
+    """
+    od = _zacatek_dne(mesic)
+    do = _zacatek_dne((mesic + timedelta(days=32)).replace(day=1))
+    dny = {}
+
+    def zapis(den, cena, prestup):
+        zaznam = dny.setdefault(den, {'cena': None, 'volno': False, 'prestup': False})
+        if cena is not None and (zaznam['cena'] is None or cena < zaznam['cena']):
+            zaznam.update(cena=cena, volno=True, prestup=prestup)
+
+    # --- 1. PŘÍMÉ LETY (jeden dotaz seskupený podle dne) ---
+    prime = (InventarLetu.objects
+             .filter(id_letu__id_letiste_odletu_id=odkud, id_letu__id_letiste_priletu_id=kam,
+                     id_letu__cas_odletu__gte=od, id_letu__cas_odletu__lt=do)
+             .annotate(den=TruncDate('id_letu__cas_odletu'))
+             .values('den')
+             .annotate(cena=Min('cena', filter=VOLNO))
+             .order_by())
+    for r in prime:
+        # I den, kdy je všechno vyprodané, v kalendáři ukážeme (volno=False)
+        zapis(r['den'], r['cena'], False)
+
+    # --- 2. JEDEN PŘESTUP ---
+    prvni, ceny = _lety_s_cenou(Lety.objects.filter(
+        id_letiste_odletu_id=odkud, cas_odletu__gte=od, cas_odletu__lt=do,
+    ).exclude(id_letiste_priletu_id=kam))
+    if prvni:
+        druhe, ceny_druhych = _lety_s_cenou(Lety.objects.filter(
+            id_letiste_priletu_id=kam, cas_odletu__gte=od, cas_odletu__lt=do + PRESAH_PRESTUPU,
+        ).exclude(id_letiste_odletu_id=odkud))
+        ceny.update(ceny_druhych)
+
+        for let1, let2 in najdi_prestupy(prvni, druhe):
+            zapis(timezone.localdate(let1.cas_odletu), ceny[let1.id] + ceny[let2.id], True)
+
+    return dny
+
+
+def kalendar(odkud, kam, od, do):
+    """
+    Cenový kalendář pro dny <od, do> (date). Měsíce bere z cache,
+    chybějící spočítá. Vrací seznam dní (i těch bez letů) pro JSON.
+    """
+    dny = {}
+    for mesic in _mesice(od, do):
+        klic = mesic.strftime('%Y-%m')
+        vysledek = cache_vyhledavani.nacti_kalendar(odkud, kam, klic)
+        if vysledek is None:
+            razitko_pred = cache_vyhledavani.globalni_razitko()
+            vysledek = spocitej_mesic(odkud, kam, mesic)
+            cache_vyhledavani.uloz_kalendar(odkud, kam, klic, vysledek, razitko_pred)
+        dny.update(vysledek)
+
+    seznam = []
+    den = od
+    while den <= do:
+        zaznam = dny.get(den)
+        cena = zaznam['cena'] if zaznam else None
+        seznam.append({
+            'datum': den.isoformat(),
+            # Agregace v SQLite vrací ceny bez desetinných míst, sjednotíme formát
+            'cena': Decimal(cena).quantize(Decimal('0.01')) if cena is not None else None,
+            'volno': zaznam['volno'] if zaznam else False,
+            'prestup': zaznam['prestup'] if zaznam else False,
+            'lety': zaznam is not None,
+        })
+        den += timedelta(days=1)
+    return seznam
+
+
+def rozsah_z_parametru(mesic=None, datum=None, dni=3, max_dni=15):
+    """
+    Z parametrů API udělá interval (od, do). Buď celý měsíc 'YYYY-MM',
+    nebo datum ± dni. Při chybném vstupu vyhodí ValueError.
+    """
+    if mesic:
+        zacatek = date.fromisoformat(f'{mesic}-01')
+        return zacatek, (zacatek + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    stred = date.fromisoformat(datum) if datum else timezone.localdate()
+    dni = int(dni)
+    if not 0 <= dni <= max_dni:
+        raise ValueError(f'Rozsah musí být 0 až {max_dni} dní.')
+    return stred - timedelta(days=dni), stred + timedelta(days=dni)
@@ -0,0 +1,156 @@
+"""
+Kolize v rozvrhu letů: letadlo na dvou letech najednou, nedodržená obrátka
+letadla a člen posádky na dvou letech najednou.
+
+Dřív api_check_collisions posílal na každou kontrolu dotaz na překryv a pak
+další dotaz pro posádku každého kolidujícího letu - a uměl jen jeden let.
+Teď se rozvrh (lety + posádky) načte dvěma dotazy do RozvrhLetu, který má
+pro každé letadlo a každého člena posádky seřazený IntervalovyIndex:
+- kontrola jednoho letu je binární vyhledávání v indexech jeho letadla
+  a posádky - O(log n + počet kolizí),
+- report celého rozvrhu je jeden průchod seřazenými intervaly
+  (zametání s haldou aktivních letů) - O(n log n + počet kolizí).
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Lety
+
+# Typy kolizí
+LETADLO = 'letadlo'     # letadlo má dva lety, které se časově překrývají
+OBRATKA = 'obratka'     # mezi přistáním a dalším odletem letadla je méně než min. obrátka
+POSADKA = 'posadka'     # člen posádky je na dvou letech, které se překrývají
+
+
+def min_obratka():
+    return timedelta(minutes=settings.KOLIZE_MIN_OBRATKA)
+
+
+class IntervalovyIndex:
+    """
+    Lety jednoho letadla / člena posádky seřazené podle odletu.
+    Vedle začátků si drží průběžné maximum konců, takže první let, který
+    může zasahovat do dotazu, se najde binárním vyhledáváním.
+    """
+    __slots__ = ('intervaly', 'zacatky', 'max_konce')
+
+    def __init__(self, intervaly):
+        # intervaly: [(odlet, přílet, id_letu)]
+        self.intervaly = sorted(intervaly)
+        self.zacatky = [i[0] for i in self.intervaly]
+        self.max_konce = list(accumulate((i[1] for i in self.intervaly), max))
+
+    def __len__(self):
+        return len(self.intervaly)
+
+    def prekryvy(self, zacatek, konec, rezerva=timedelta(0)):
+        """
+        Lety, které se překrývají s <zacatek, konec> rozšířeným o rezervu
+        na obě strany: [(odlet, přílet, id_letu)].
+        """
+        do = bisect_left(self.zacatky, konec + rezerva)
+        # Dřív začínající lety končí nejpozději v max_konce - ty před 'od' skončily včas
+        od = bisect_right(self.max_konce, zacatek - rezerva, 0, do)
+        return [i for i in self.intervaly[od:do] if i[1] > zacatek - rezerva]
+
+
+def _zametani(intervaly, rezerva):
+    """
+    Dvojice intervalů, které se překrývají (nebo jsou blíž než rezerva).
+    Jeden průchod seřazenými intervaly, halda drží ty, které ještě "běží".
+    """
+    aktivni = []  # (přílet, odlet, id_letu)
+    for zacatek, konec, let_id in intervaly:
+        while aktivni and aktivni[0][0] + rezerva <= zacatek:
+            heapq.heappop(aktivni)
+        for predchozi_konec, predchozi_zacatek, predchozi_id in aktivni:
+            yield (predchozi_zacatek, predchozi_konec, predchozi_id), (zacatek, konec, let_id)
+        heapq.heappush(aktivni, (konec, zacatek, let_id))
+
+
+class RozvrhLetu:
+    """Lety a posádky jednoho časového okna s intervalovými indexy."""
+
+    def __init__(self, lety, posadka, obratka=None):
+        # lety: [(id, cislo_letu, id_letadla, odlet, přílet)], posadka: [(id_letu, id_uzivatele)]
+        self.obratka = min_obratka() if obratka is None else obratka
+        self.lety = {let[0]: let for let in lety}
+
+        podle_letadla = defaultdict(list)
+        for let_id, _, letadlo_id, odlet, prilet in lety:
+            podle_letadla[letadlo_id].append((odlet, prilet, let_id))
+        podle_clena = defaultdict(list)
+        for let_id, uzivatel_id in posadka:
+            if let_id in self.lety:
+                _, _, _, odlet, prilet = self.lety[let_id]
+                podle_clena[uzivatel_id].append((odlet, prilet, let_id))
+
+        self.letadla = {k: IntervalovyIndex(v) for k, v in podle_letadla.items()}
+        self.posadka = {k: IntervalovyIndex(v) for k, v in podle_clena.items()}
+
+    @classmethod
+    def nacti(cls, od=None, do=None, aerolinka_id=None, letadlo_id=None, posadka_ids=None, obratka=None):
+        """
+        Načte rozvrh dvěma dotazy (lety, posádky). Okno <od, do> se rozšíří
+        o obrátku. Pro kontrolu jednoho letu stačí lety jeho letadla
+        a jeho posádky (letadlo_id, posadka_ids); bez nich se načte vše.
+        """
+        obratka = min_obratka() if obratka is None else obratka
+        lety = Lety.objects.all()
+        if od is not None:
+            lety = lety.filter(cas_priletu__gt=od - obratka)
+        if do is not None:
+            lety = lety.filter(cas_odletu__lt=do + obratka)
+        if aerolinka_id is not None:
+            lety = lety.filter(id_aerolinky_id=aerolinka_id)
+        if letadlo_id is not None or posadka_ids is not None:
+            lety = lety.filter(Q(id_letadla_id=letadlo_id) | Q(posadka__in=posadka_ids or [])).distinct()
+
+        radky = list(lety.values_list('id', 'cislo_letu', 'id_letadla_id', 'cas_odletu', 'cas_priletu'))
+        posadka = Lety.posadka.through.objects.filter(lety_id__in=[r[0] for r in radky])
+        if posadka_ids is not None:
+            posadka = posadka.filter(uzivatele_id__in=posadka_ids)
+        return cls(radky, list(posadka.values_list('lety_id', 'uzivatele_id')) if radky else [], obratka)
+
+    def zkontroluj_let(self, odlet, prilet, letadlo_id=None, posadka_ids=(), bez_letu=None):
+        """
+        Kolize navrhovaného letu (bez_letu = jeho id, pokud se upravuje existující).
+        Vrací [(typ, id_letu, id_uzivatele nebo None)].
+        """
+        kolize = []
+        index = self.letadla.get(int(letadlo_id)) if letadlo_id else None
+        if index is not None:
+            for zacatek, konec, let_id in index.prekryvy(odlet, prilet, self.obratka):
+                if let_id != bez_letu:
+                    typ = LETADLO if zacatek < prilet and konec > odlet else OBRATKA
+                    kolize.append((typ, let_id, None))
+
+        for uzivatel_id in posadka_ids:
+            index = self.posadka.get(int(uzivatel_id))
+            if index is not None:
+                for _, _, let_id in index.prekryvy(odlet, prilet):
+                    if let_id != bez_letu:
+                        kolize.append((POSADKA, let_id, int(uzivatel_id)))
+        return kolize
+
+    def report(self):
+        """
+        Všechny kolize rozvrhu jedním průchodem:
+        [(typ, id_letu_a, id_letu_b, id_letadla nebo id_uzivatele)], let A odlétá dřív.
+        """
+        kolize = []
+        for letadlo_id, index in self.letadla.items():
+            for (_, konec_a, a), (zacatek_b, _, b) in _zametani(index.intervaly, self.obratka):
+                kolize.append((LETADLO if konec_a > zacatek_b else OBRATKA, a, b, letadlo_id))
+        for uzivatel_id, index in self.posadka.items():
+            for (_, _, a), (_, _, b) in _zametani(index.intervaly, timedelta(0)):
+                kolize.append((POSADKA, a, b, uzivatel_id))
+        kolize.sort(key=lambda k: (self.lety[k[1]][3], k[0], k[2]))
+        return kolize
+
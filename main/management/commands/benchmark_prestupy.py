@@ -0,0 +1,73 @@
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from main.vyhledavani import najdi_prestupy, MIN_CAS_PRESTUPU, MAX_CAS_PRESTUPU
+
+
+def puvodni_smycka(lety_start, lety_cil, min_cas=MIN_CAS_PRESTUPU, max_cas=MAX_CAS_PRESTUPU):
+    """
+    Původní algoritmus z verejny_seznam_letu (dvojitá smyčka),
+    jen bez databáze - porovnává rovnou *_id.
+    """
+    vysledek = []
+    for let1 in lety_start:
+        for let2 in lety_cil:
+            if let1.id_letiste_priletu_id == let2.id_letiste_odletu_id:
+                cas_cekani = let2.cas_odletu - let1.cas_priletu
+                if min_cas <= cas_cekani <= max_cas:
+                    vysledek.append((let1, let2))
+    return vysledek
+
+
+class Command(BaseCommand):
+    help = 'Porovná rychlost hledání přestupů: původní dvojitá smyčka vs. index podle letiště'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hubu', type=int, default=10, help='Počet přestupních letišť')
+        parser.add_argument('--letu', type=int, default=1000, help='Počet letů na jedno přestupní letiště (v každém směru)')
+        parser.add_argument('--dni', type=int, default=30, help='Rozptyl odletů ve dnech')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        start = datetime(2030, 1, 1)
+        minut = options['dni'] * 24 * 60
+
+        # Syntetická data: A -> hub a hub -> B (bez databáze, jen atributy jako u Lety)
+        lety_start, lety_cil = [], []
+        for hub in range(1, options['hubu'] + 1):
+            for _ in range(options['letu']):
+                odlet = start + timedelta(minutes=rnd.randrange(minut))
+                lety_start.append(SimpleNamespace(
+                    id=len(lety_start), id_letiste_odletu_id=0, id_letiste_priletu_id=hub,
+                    cas_odletu=odlet, cas_priletu=odlet + timedelta(minutes=rnd.randint(60, 600))))
+
+                odlet = start + timedelta(minutes=rnd.randrange(minut))
+                lety_cil.append(SimpleNamespace(
+                    id=len(lety_cil), id_letiste_odletu_id=hub, id_letiste_priletu_id=-1,
+                    cas_odletu=odlet, cas_priletu=odlet + timedelta(minutes=rnd.randint(60, 600))))
+
+        self.stdout.write(f"Letů z výchozího letiště: {len(lety_start)}, do cíle: {len(lety_cil)}")
+
+        t0 = time.perf_counter()
+        nove = najdi_prestupy(lety_start, lety_cil)
+        cas_novy = time.perf_counter() - t0
+        self.stdout.write(f"  Index + bisect:  {cas_novy * 1000:10.1f} ms ({len(nove)} spojení)")
+
+        t0 = time.perf_counter()
+        puvodni = puvodni_smycka(lety_start, lety_cil)
+        cas_puvodni = time.perf_counter() - t0
+        self.stdout.write(f"  Dvojitá smyčka:  {cas_puvodni * 1000:10.1f} ms ({len(puvodni)} spojení)")
+
+        # Kontrola, že oba algoritmy vrací stejná spojení
+        klic = lambda dvojice: {(a.id, b.id) for a, b in dvojice}
+        if klic(nove) != klic(puvodni):
+            self.stdout.write(self.style.ERROR("CHYBA: Výsledky se liší!"))
+            return
+
+        zrychleni = cas_puvodni / cas_novy if cas_novy else float('inf')
+        self.stdout.write(self.style.SUCCESS(f"Výsledky jsou shodné, zrychlení {zrychleni:.1f}x"))
@@ -0,0 +1,46 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main.kolize import RozvrhLetu, LETADLO, OBRATKA, POSADKA
+from main.models import Uzivatele
+
+
+class Command(BaseCommand):
+    help = 'Vypíše kolize v rozvrhu letů: letadlo na dvou letech, krátká obrátka, posádka na dvou letech'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--aerolinka', type=int, help='Jen lety této aerolinky (id), jinak všech')
+        parser.add_argument('--od', help='Od data YYYY-MM-DD (výchozí dnes)')
+        parser.add_argument('--do', help='Do data YYYY-MM-DD včetně (výchozí bez omezení)')
+        parser.add_argument('--obratka', type=int, help='Minimální obrátka v minutách (výchozí KOLIZE_MIN_OBRATKA)')
+
+    def handle(self, *args, **options):
+        try:
+            od = date.fromisoformat(options['od']) if options['od'] else timezone.localdate()
+            do = date.fromisoformat(options['do']) + timedelta(days=1) if options['do'] else None
+        except ValueError as e:
+            raise CommandError(f"Neplatné datum: {e}")
+        od = timezone.make_aware(datetime.combine(od, time.min))
+        do = timezone.make_aware(datetime.combine(do, time.min)) if do else None
+        obratka = timedelta(minutes=options['obratka']) if options['obratka'] is not None else None
+
+        rozvrh = RozvrhLetu.nacti(od, do, aerolinka_id=options['aerolinka'], obratka=obratka)
+        kolize = rozvrh.report()
+        clenove = Uzivatele.objects.in_bulk({zdroj for typ, _, _, zdroj in kolize if typ == POSADKA})
+
+        popis = {
+            LETADLO: "letadlo {zdroj} má zároveň",
+            OBRATKA: "letadlo {zdroj} nestihne obrátku mezi",
+            POSADKA: "{zdroj} letí zároveň",
+        }
+        for typ, a, b, zdroj in kolize:
+            let_a, let_b = rozvrh.lety[a], rozvrh.lety[b]
+            if typ == POSADKA:
+                zdroj = clenove[zdroj].email
+            self.stdout.write(
+                f"{timezone.localtime(let_a[3]):%Y-%m-%d %H:%M}  {popis[typ].format(zdroj=zdroj)} "
+                f"{let_a[1]} a {let_b[1]}"
+            )
+        self.stdout.write(f"Letů: {len(rozvrh.lety)}, kolizí: {len(kolize)}")
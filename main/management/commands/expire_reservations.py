@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main.obsazenost import uvolni_propadle
+
+
+class Command(BaseCommand):
+    help = 'Smaže propadlé nezaplacené rezervace a uvolní jejich místa (po dávkách)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Běžet stále (worker), jinak jeden průchod')
+        parser.add_argument('--interval', type=float, default=30, help='Pauza mezi průchody v sekundách (s --loop)')
+        parser.add_argument('--batch', type=int, default=500, help='Kolik rezervací smazat v jedné transakci')
+
+    def handle(self, *args, **options):
+        while True:
+            smazano = self.pruchod(options['batch'])
+            if smazano:
+                self.stdout.write(f"Smazáno propadlých rezervací: {smazano}")
+            if not options['loop']:
+                break
+            # Dlouho běžící proces - ať nedržíme spojení, které mezitím spadlo
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def pruchod(self, davka):
+        # Malé transakce jedna po druhé - zámky se drží jen krátce
+        celkem = 0
+        while True:
+            smazano = uvolni_propadle(davka)
+            celkem += smazano
+            if smazano < davka:
+                return celkem
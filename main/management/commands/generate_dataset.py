@@ -0,0 +1,303 @@
+import math
+import random
+import time as hodiny
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import (
+    Aerolinky, Letiste, Letadla, Lety, InventarLetu, TridySedadel, Role, RoleUzivatel,
+    Rezervace, Letenky, Uzivatele,
+)
+from main.mapa_sedadel import MapaSedadel
+from main import index_letu, index_letist, cache_vyhledavani, data_aerolinky
+
+# Typy letadel: (model, kapacita, písmena sedadel v řadě)
+TYPY_LETADEL = [
+    ("Airbus A220", 120, "ACDEF"),
+    ("Airbus A320", 180, "ABCDEF"),
+    ("Boeing 737-800", 186, "ABCDEF"),
+    ("Embraer E190", 100, "ACDF"),
+    ("Boeing 787-9", 279, "ABCDEFGHJ"),
+]
+ZEME = ["CZ", "DE", "AT", "PL", "SK", "FR", "IT", "ES", "NL", "GB", "US", "TR", "AE", "SG"]
+
+PODIL_BUSINESS = 0.12
+RYCHLOST_KM_H = 780
+MIN_OBRATKA, MAX_OBRATKA = 45, 150  # minuty na zemi mezi dvěma lety letadla
+PRVNI_ODLET, POSLEDNI_ODLET = 6, 22  # hodiny, mimo ně letadlo stojí do rána
+
+
+class Command(BaseCommand):
+    help = ('Vygeneruje syntetická data pro zátěžové testy (letiště, aerolinky, flotily, posádky, lety, '
+            'inventář, rezervace). Data se zapisují po dávkách přes bulk_create, '
+            'stejný --seed a --start dá stejná data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', type=int, default=50, help='Počet letišť')
+        parser.add_argument('--airlines', type=int, default=5, help='Počet aerolinek')
+        parser.add_argument('--flights', type=int, default=10000, help='Počet letů celkem')
+        parser.add_argument('--bookings', type=int, default=0, help='Max. počet rezervací (0 = bez rezervací)')
+        parser.add_argument('--load-factor', type=float, default=0.75,
+                            help='Průměrná obsazenost letů, které se plní rezervacemi (0-1)')
+        parser.add_argument('--customers', type=int, help='Počet zákazníků (výchozí bookings / 5, aspoň 10)')
+        parser.add_argument('--days', type=int, default=60, help='Přes kolik dní se lety rozloží (určuje velikost flotily)')
+        parser.add_argument('--start', help='První den letů YYYY-MM-DD (výchozí dnes)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--chunk', type=int, default=5000, help='Kolik letů se zapíše v jedné dávce')
+
+    def handle(self, *args, **options):
+        if options['airports'] < 2 or options['airlines'] < 1 or options['flights'] < 0:
+            raise CommandError("Je potřeba aspoň 2 letiště a 1 aerolinka.")
+        if not 0 <= options['load_factor'] <= 1:
+            raise CommandError("--load-factor musí být mezi 0 a 1.")
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate()
+        except ValueError as e:
+            raise CommandError(f"Neplatné datum: {e}")
+
+        self.rnd = random.Random(options['seed'])
+        self.chunk = max(options['chunk'], 1)
+        self.zbyva_rezervaci = options['bookings']
+        self.load_factor = options['load_factor']
+        self.heslo = make_password(None)  # nepoužitelné heslo - jednou, hashování je drahé
+        zacatek = hodiny.monotonic()
+
+        with transaction.atomic():
+            letiste = self.vytvor_letiste(options['airports'])
+            aerolinky = self.vytvor_aerolinky(options['airlines'], letiste)
+            self.tridy = self.vytvor_tridy()
+            zakaznici = options['customers'] or max(options['bookings'] // 5, 10)
+            self.zakaznici = self.vytvor_uzivatele(
+                [f"zakaznik{i}@{aerolinky[0]['kod'].lower()}.gen.test" for i in range(zakaznici)]
+            ) if options['bookings'] else []
+
+            letadel = max(len(aerolinky), math.ceil(options['flights'] / (options['days'] * 4)))
+            rotace = self.vytvor_flotily(aerolinky, letadel, options['flights'])
+        self.stdout.write(f"Letiště: {len(letiste)}, aerolinky: {len(aerolinky)}, letadla: {len(rotace)}, "
+                          f"zákazníci: {len(self.zakaznici)}")
+
+        # Lety se generují líně (rotace letadel) a zapisují po dávkách - paměť nezávisí na --flights
+        lety = self.lety(rotace, letiste, timezone.make_aware(datetime.combine(start, time.min)))
+        celkem = {'lety': 0, 'rezervace': 0, 'letenky': 0}
+        while True:
+            davka = list(islice(lety, self.chunk))
+            if not davka:
+                break
+            with transaction.atomic():
+                for klic, pocet in self.zapis_davku(davka).items():
+                    celkem[klic] += pocet
+            self.stdout.write(f"  {celkem['lety']} letů, {celkem['rezervace']} rezervací, "
+                              f"{celkem['letenky']} letenek ({hodiny.monotonic() - zacatek:.1f} s)")
+
+        # bulk_create neposílá signály - indexy a cache zneplatníme sami
+        index_letu.zahod_index()
+        index_letist.letiste_zmeneno()
+        cache_vyhledavani.zneplatni_letiste([l['id'] for l in letiste])
+        for zdroj in data_aerolinky.ZDROJE:
+            data_aerolinky.zmena(zdroj, [a['id'] for a in aerolinky])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Hotovo za {hodiny.monotonic() - zacatek:.1f} s: {celkem['lety']} letů, "
+            f"{celkem['rezervace']} rezervací, {celkem['letenky']} letenek."))
+
+    # --- KMENOVÁ DATA ---
+
+    def _nove_kody(self, model, pocet, delka=3):
+        """Deterministické kódy IATA, které v databázi ještě nejsou."""
+        obsazene = set(model.objects.values_list('kod_iata', flat=True))
+        kody = []
+        while len(kody) < pocet:
+            kod = ''.join(self.rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(delka))
+            if kod not in obsazene:
+                obsazene.add(kod)
+                kody.append(kod)
+        return kody
+
+    def vytvor_letiste(self, pocet):
+        # Váhy podle Zipfa: pár velkých letišť, dlouhý chvost malých
+        letiste = []
+        for poradi, kod in enumerate(self._nove_kody(Letiste, pocet), start=1):
+            letiste.append({
+                'kod': kod,
+                'vaha': 1 / poradi ** 0.8,
+                'xy': (self.rnd.uniform(0, 4000), self.rnd.uniform(0, 3000)),  # km
+                'model': Letiste(nazev_letiste=f"Letiště {kod}", kod_iata=kod, mesto=f"Město {kod}",
+                                 zeme=self.rnd.choice(ZEME)),
+            })
+        for l, obj in zip(letiste, Letiste.objects.bulk_create([l['model'] for l in letiste])):
+            l['id'] = obj.id
+        return letiste
+
+    def vytvor_aerolinky(self, pocet, letiste):
+        # Největší letiště jsou huby, každá aerolinka má jeden až dva
+        huby = letiste[:max(2, len(letiste) // 15)]
+        aerolinky = []
+        for kod in self._nove_kody(Aerolinky, pocet):
+            vlastni = self.rnd.sample(huby, min(len(huby), self.rnd.choice([1, 1, 2])))
+            aerolinky.append({'kod': kod, 'huby': vlastni,
+                              'model': Aerolinky(nazev=f"Generated Air {kod}", kod_iata=kod,
+                                                 zeme_registrace=self.rnd.choice(ZEME))})
+        for a, obj in zip(aerolinky, Aerolinky.objects.bulk_create([a['model'] for a in aerolinky])):
+            a['id'] = obj.id
+        return aerolinky
+
+    def vytvor_tridy(self):
+        eco, _ = TridySedadel.objects.get_or_create(nazev_tridy="Economy", id_aerolinky=None,
+                                                    defaults={'popis': 'Standardní třída'})
+        bus, _ = TridySedadel.objects.get_or_create(nazev_tridy="Business", id_aerolinky=None,
+                                                    defaults={'popis': 'Luxusní třída'})
+        return eco.id, bus.id
+
+    def vytvor_uzivatele(self, emaily, aerolinka_id=None):
+        uzivatele = Uzivatele.objects.bulk_create(
+            [Uzivatele(email=email, password=self.heslo, id_aerolinky_id=aerolinka_id) for email in emaily],
+            batch_size=self.chunk)
+        return [u.id for u in uzivatele]
+
+    def vytvor_flotily(self, aerolinky, letadel, letu):
+        """
+        Letadla a posádky: každé letadlo létá se stálou posádkou (2 piloti,
+        2-4 průvodčí), takže vygenerovaný rozvrh nemá kolize posádky.
+        Vrací rotace: [{aerolinka, letadlo, kapacita, pismena, posadka, letu}].
+        """
+        pilot, _ = Role.objects.get_or_create(nazev_role="Pilot")
+        pruvodci, _ = Role.objects.get_or_create(nazev_role="Palubní průvodčí")
+
+        rotace = []
+        for i in range(letadel):
+            aerolinka = aerolinky[i % len(aerolinky)]
+            model, kapacita, pismena = self.rnd.choice(TYPY_LETADEL)
+            rotace.append({'aerolinka': aerolinka, 'kapacita': kapacita, 'pismena': pismena,
+                           'letu': letu // letadel + (i < letu % letadel),
+                           'model': Letadla(model=model, kapacita_sedadel=kapacita, pismena_sedadel=pismena,
+                                            datum_vyroby=date(self.rnd.randint(2000, 2023), 1, 1),
+                                            id_aerolinky_id=aerolinka['id'])})
+        for r, obj in zip(rotace, Letadla.objects.bulk_create([r['model'] for r in rotace], batch_size=self.chunk)):
+            r['letadlo'] = obj.id
+
+        role = []
+        for i, r in enumerate(rotace):
+            kod = r['aerolinka']['kod'].lower()
+            emaily = [f"pilot{i}.{j}@{kod}.gen.test" for j in range(2)]
+            emaily += [f"pruvodci{i}.{j}@{kod}.gen.test" for j in range(self.rnd.randint(2, 4))]
+            r['posadka'] = self.vytvor_uzivatele(emaily, r['aerolinka']['id'])
+            role += [RoleUzivatel(id_uzivatele_id=u, id_role=pilot if j < 2 else pruvodci)
+                     for j, u in enumerate(r['posadka'])]
+        RoleUzivatel.objects.bulk_create(role, batch_size=self.chunk)
+        return rotace
+
+    # --- LETY ---
+
+    def lety(self, rotace, letiste, start):
+        """
+        Rotace letadel hub-and-spoke: z hubu na vybrané letiště (podle váhy)
+        a zpět, občas mezi dvěma huby. Odlet až po obrátce, v noci letadlo stojí.
+        Stejná trasa aerolinky má vždy stejné číslo letu.
+        """
+        vahy = [l['vaha'] for l in letiste]
+        cisla_tras = {}
+        for r in rotace:
+            aerolinka = r['aerolinka']
+            huby = aerolinka['huby']
+            kde = self.rnd.choice(huby)
+            cas = start + timedelta(hours=PRVNI_ODLET, minutes=self.rnd.randrange(0, 240, 5))
+            for _ in range(r['letu']):
+                if kde in huby:
+                    kam = kde
+                    while kam is kde:
+                        kam = (self.rnd.choice([h for h in huby if h is not kde] or huby)
+                               if self.rnd.random() < 0.15 else self.rnd.choices(letiste, vahy)[0])
+                else:
+                    kam = self.rnd.choice(huby)
+
+                vzdalenost = math.dist(kde['xy'], kam['xy'])
+                doba = timedelta(minutes=max(40, round(vzdalenost / RYCHLOST_KM_H * 60 / 5) * 5 + 30))
+                trasa = (aerolinka['id'], kde['id'], kam['id'])
+                if trasa not in cisla_tras:
+                    cisla_tras[trasa] = f"{aerolinka['kod']}{100 + len(cisla_tras)}"
+                yield {'rotace': r, 'cislo': cisla_tras[trasa], 'odkud': kde, 'kam': kam,
+                       'odlet': cas, 'prilet': cas + doba}
+
+                kde, cas = kam, cas + doba + timedelta(minutes=self.rnd.randrange(MIN_OBRATKA, MAX_OBRATKA, 5))
+                mistni = timezone.localtime(cas)
+                if mistni.hour >= POSLEDNI_ODLET or mistni.hour < PRVNI_ODLET:
+                    rano = mistni.date() + timedelta(days=mistni.hour >= POSLEDNI_ODLET)
+                    cas = timezone.make_aware(datetime.combine(rano, time(PRVNI_ODLET))) + \
+                        timedelta(minutes=self.rnd.randrange(0, 120, 5))
+
+    def zapis_davku(self, davka):
+        """Jedna dávka letů: lety, posádky, inventář a rezervace - pár velkých INSERTů."""
+        lety = Lety.objects.bulk_create([
+            Lety(cislo_letu=l['cislo'], cas_odletu=l['odlet'], cas_priletu=l['prilet'],
+                 id_letiste_odletu_id=l['odkud']['id'], id_letiste_priletu_id=l['kam']['id'],
+                 id_letadla_id=l['rotace']['letadlo'], id_aerolinky_id=l['rotace']['aerolinka']['id'])
+            for l in davka
+        ])
+        Posadka = Lety.posadka.through
+        Posadka.objects.bulk_create([Posadka(lety_id=let.id, uzivatele_id=u)
+                                     for let, l in zip(lety, davka) for u in l['rotace']['posadka']])
+
+        inventare, plneni = [], []
+        eco, bus = self.tridy
+        for let, l in zip(lety, davka):
+            kapacita = l['rotace']['kapacita']
+            mist_bus = int(kapacita * PODIL_BUSINESS)
+            # Cena podle délky letu
+            cena = Decimal(round(30 + (l['prilet'] - l['odlet']).total_seconds() / 3600 * 60))
+            kabiny = [InventarLetu(id_letu=let, id_tridy_id=eco, pocet_mist_k_prodeji=kapacita - mist_bus, cena=cena,
+                                   kabina='A'),
+                      InventarLetu(id_letu=let, id_tridy_id=bus, pocet_mist_k_prodeji=mist_bus, cena=cena * 3,
+                                   kabina='B')]
+            inventare += kabiny
+            if self.zbyva_rezervaci > 0:
+                plneni.append((let, l['rotace']['pismena'], kabiny))
+        plne = self.naplneni(plneni)
+        InventarLetu.objects.bulk_create(inventare)
+
+        rezervace = Rezervace.objects.bulk_create([r for r, _ in plne], batch_size=self.chunk)
+        letenky = Letenky.objects.bulk_create([
+            Letenky(id_rezervace=r, **letenka) for r, (_, seznam) in zip(rezervace, plne) for letenka in seznam
+        ], batch_size=self.chunk)
+        return {'lety': len(lety), 'rezervace': len(rezervace), 'letenky': len(letenky)}
+
+    def naplneni(self, plneni):
+        """
+        Rezervace pro lety dávky do cílové obsazenosti (dokud nedojde --bookings).
+        Sedadla jdou popořadě podle mapy sedadel, počítadla inventáře se nastaví rovnou.
+        Vrací [(Rezervace, [pole jejích letenek])].
+        """
+        rezervace = []
+        ted = timezone.now()
+        for let, pismena, kabiny in plneni:
+            mapa = MapaSedadel(pismena, [(i, inv.id_tridy_id, inv.pocet_mist_k_prodeji, inv.kabina)
+                                         for i, inv in enumerate(kabiny)])
+            for kabina, inv in zip(mapa.kabiny, kabiny):
+                cil = int(inv.pocet_mist_k_prodeji * min(max(self.rnd.gauss(self.load_factor, 0.1), 0), 1))
+                sedadlo = kabina['od']
+                while sedadlo < kabina['od'] + cil and self.zbyva_rezervaci > 0:
+                    # Skupiny 1-3 cestujících sedí vedle sebe
+                    skupina = min(self.rnd.choice([1, 1, 1, 2, 2, 3]), kabina['od'] + cil - sedadlo)
+                    zaplaceno = self.rnd.random() < 0.9
+                    rezervace.append((Rezervace(
+                        celkova_cena=inv.cena * skupina,
+                        status_platby='ZAPLACENO' if zaplaceno else 'NEZAPLACENO',
+                        expirace=None if zaplaceno else ted + timedelta(minutes=self.rnd.randint(5, 30)),
+                        id_uzivatele_id=self.rnd.choice(self.zakaznici),
+                    ), [
+                        {'cislo_sedadla': mapa.kod(s), 'cena_letenky': inv.cena,
+                         'id_letu': let, 'id_tridy_id': inv.id_tridy_id}
+                        for s in range(sedadlo, sedadlo + skupina)
+                    ]))
+                    if zaplaceno:
+                        inv.prodano += skupina
+                    else:
+                        inv.drzeno += skupina
+                    sedadlo += skupina
+                    self.zbyva_rezervaci -= 1
+        return rezervace
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main.obsazenost import prepocitej_obsazenost
+
+
+class Command(BaseCommand):
+    help = 'Přepočítá počítadla obsazenosti (prodano / drzeno) v InventarLetu z letenek'
+
+    def add_arguments(self, parser):
+        parser.add_argument('let_ids', nargs='*', type=int, help='Jen tyto lety (výchozí: všechny)')
+
+    def handle(self, *args, **options):
+        opraveno = prepocitej_obsazenost(options['let_ids'] or None)
+
+        if opraveno:
+            self.stdout.write(self.style.WARNING(f"Opraveno inventářů: {opraveno}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Počítadla odpovídají letenkám."))
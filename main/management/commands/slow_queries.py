@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main import pomale_dotazy
+
+
+class Command(BaseCommand):
+    help = ('Vypíše nejpomalejší SQL dotazy (podle celkového času) zaznamenané všemi procesy '
+            'aplikace i s plánem - viz main/pomale_dotazy.py')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, help='Kolik dotazů vypsat (výchozí POMALE_DOTAZY_TOP)')
+        parser.add_argument('--bez-planu', action='store_true', help='Nevypisovat plány (EXPLAIN)')
+        parser.add_argument('--cele-sql', action='store_true', help='Nezkracovat SQL')
+        parser.add_argument('--vynulovat', action='store_true', help='Po výpisu smazat zaznamenané statistiky')
+
+    def handle(self, *args, **options):
+        dotazy = pomale_dotazy.report(options['top'])
+        if not dotazy and settings.POMALE_DOTAZY_PRAH_MS is None:
+            self.stdout.write("Sledování pomalých dotazů je vypnuté (POMALE_DOTAZY_PRAH_MS).")
+        elif not dotazy:
+            self.stdout.write(f"Žádné dotazy delší než {settings.POMALE_DOTAZY_PRAH_MS} ms.")
+        for poradi, dotaz in enumerate(dotazy, start=1):
+            sql = dotaz['otisk']
+            if not options['cele_sql'] and len(sql) > 300:
+                sql = sql[:300] + '...'
+            self.stdout.write(self.style.WARNING(
+                f"#{poradi}  {dotaz['pocet']}x  p95 {dotaz['p95_ms']:.1f} ms  max {dotaz['max_ms']:.1f} ms  "
+                f"celkem {dotaz['celkem_ms'] / 1000:.2f} s"))
+            self.stdout.write(f"    {sql}")
+            if not options['bez_planu'] and dotaz['plan']:
+                self.stdout.write("    plán:")
+                for radek in dotaz['plan'].splitlines():
+                    self.stdout.write(f"      {radek}")
+            self.stdout.write("")
+
+        if options['vynulovat']:
+            pomale_dotazy.vynuluj()
+            self.stdout.write("Statistiky smazány.")
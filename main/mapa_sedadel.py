@@ -0,0 +1,176 @@
+"""
+Mapy sedadel letů (generované na serveru).
+
+Dřív se do stránky posílal JSON seznam obsazených sedadel a prohlížeč si
+sedadla vymýšlel sám (písmeno třídy podle pořadí ceny) a pro každé sedadlo
+procházel celý seznam (occupiedSeats.includes -> O(n²)). Teď:
+- rozložení je dané letadlem (Letadla.pismena_sedadel = sedadla v řadě)
+  a inventářem letu: každá třída je kabina s vlastními řadami a prefixem
+  A, B, C... (kódy sedadel jako dřív: 'A1A'). Prefix je uložený v
+  InventarLetu.kabina, takže změna ceny ani odebrání jiné třídy kódy sedadel
+  prodaných letenek nepřečísluje,
+- obsazenost je bitová mapa přes všechna sedadla letu (jeden bit = jedno sedadlo),
+  postavená jedním dotazem na letenky a uložená v cache,
+- do stránky jde kompaktní payload (rozložení + bitmapa v base64)
+  a prohlížeč ho vykreslí v lineárním čase (static/js/mapa_sedadel.js).
+
+Cache se maže při změně letenek, inventáře nebo letadla (signály). Místa
+nezaplacených rezervací propadají s časem, proto záznam neplatí déle,
+než do nejbližší expirace.
+"""
+import base64
+import json
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import InventarLetu, Letenky, Lety
+from .obsazenost import je_propadla
+
+PREFIX = 'mapa_sedadel'
+CACHE_TTL = 300  # sekund
+
+
+def _klic(let_id):
+    return f'{PREFIX}:{let_id}'
+
+
+class MapaSedadel:
+    """
+    Rozložení sedadel jednoho letu a bitová mapa obsazených míst.
+    Sedadlo má index 0..celkem-1: kabiny jdou za sebou, v kabině řada po řadě.
+    """
+
+    def __init__(self, pismena, kabiny):
+        # kabiny: [(id_inventare, id_tridy, pocet_mist, prefix)] seřazené podle prefixu
+        self.pismena = pismena
+        self.kabiny = []
+        self.podle_prefixu = {}
+        od = 0
+        for inventar_id, trida_id, pocet, prefix in kabiny:
+            kabina = {
+                'inventar': inventar_id,
+                'trida': trida_id,
+                'prefix': prefix,
+                'pocet': pocet,
+                'od': od,
+            }
+            self.kabiny.append(kabina)
+            self.podle_prefixu[prefix] = kabina
+            od += pocet
+        self.celkem = od
+        self.obsazeno = bytearray((od + 7) // 8)
+
+    def index(self, kod):
+        """
+        Index sedadla podle kódu ('B3C' = kabina B, řada 3, sedadlo C),
+        nebo None, pokud takové sedadlo v letu není.
+        """
+        if not kod or len(kod) < 3:
+            return None
+        kabina = self.podle_prefixu.get(kod[0])
+        pozice = self.pismena.find(kod[-1])
+        rada = kod[1:-1]
+        if kabina is None or pozice < 0 or not rada.isdigit():
+            return None
+        i = (int(rada) - 1) * len(self.pismena) + pozice
+        if not 0 <= i < kabina['pocet']:
+            return None
+        return kabina['od'] + i
+
+    def kod(self, index):
+        for kabina in self.kabiny:
+            if index < kabina['od'] + kabina['pocet']:
+                i = index - kabina['od']
+                return f"{kabina['prefix']}{i // len(self.pismena) + 1}{self.pismena[i % len(self.pismena)]}"
+        raise IndexError(index)
+
+    def oznac(self, kod):
+        i = self.index(kod)
+        if i is not None:
+            self.obsazeno[i >> 3] |= 1 << (i & 7)
+
+    def je_obsazeno(self, kod):
+        i = self.index(kod)
+        return i is not None and bool(self.obsazeno[i >> 3] & (1 << (i & 7)))
+
+    def kabina(self, kod):
+        """Kabina (slovník z self.kabiny), do které sedadlo patří, nebo None."""
+        if self.index(kod) is None:
+            return None
+        return self.podle_prefixu[kod[0]]
+
+    def je_volne(self, kod, trida_id=None):
+        """
+        Sedadlo existuje, je volné a (pokud je zadaná třída) patří do její kabiny.
+        """
+        i = self.index(kod)
+        if i is None or self.obsazeno[i >> 3] & (1 << (i & 7)):
+            return False
+        return trida_id is None or self.kabina(kod)['trida'] == trida_id
+
+    def payload(self):
+        """Kompaktní data pro šablonu (JSON)."""
+        return json.dumps({
+            'pismena': self.pismena,
+            'kabiny': self.kabiny,
+            'obsazeno': base64.b64encode(bytes(self.obsazeno)).decode('ascii'),
+        })
+
+
+def sestav_mapy(let_ids):
+    """
+    Postaví mapy letů z databáze (tři dotazy pro libovolný počet letů):
+    letadlo + inventář (rozložení) a letenky (obsazenost).
+    Vrací {id_letu: (mapa, nejbližší expirace držených míst nebo None)}.
+    """
+    let_ids = set(let_ids)
+    pismena = dict(Lety.objects.filter(id__in=let_ids).values_list('id', 'id_letadla__pismena_sedadel'))
+    kabiny = {let_id: [] for let_id in let_ids}
+    for let_id, *kabina in (InventarLetu.objects
+                            .filter(id_letu_id__in=let_ids, pocet_mist_k_prodeji__gt=0)
+                            .order_by('kabina')
+                            .values_list('id_letu_id', 'id', 'id_tridy_id', 'pocet_mist_k_prodeji', 'kabina')):
+        kabiny[let_id].append(kabina)
+    mapy = {let_id: (MapaSedadel(pismena.get(let_id) or 'ABCDEF', kabiny[let_id]), None) for let_id in let_ids}
+
+    letenky = (Letenky.objects
+               .filter(id_letu_id__in=let_ids)
+               .exclude(je_propadla('id_rezervace__'))
+               .values_list('id_letu_id', 'cislo_sedadla', 'id_rezervace__status_platby', 'id_rezervace__expirace'))
+    for let_id, kod, stav, expirace in letenky:
+        mapa, nejblizsi = mapy[let_id]
+        mapa.oznac(kod)
+        if stav == 'NEZAPLACENO' and expirace and (nejblizsi is None or expirace < nejblizsi):
+            mapy[let_id] = (mapa, expirace)
+    return mapy
+
+
+def mapy_letu(let_ids):
+    """
+    Vrátí {id_letu: MapaSedadel} - co je v cache, vezme odtud,
+    zbytek postaví najednou a uloží.
+    """
+    klice = {_klic(let_id): let_id for let_id in let_ids}
+    mapy = {klice[klic]: mapa for klic, mapa in cache.get_many(klice).items()}
+
+    chybi = [let_id for let_id in klice.values() if let_id not in mapy]
+    if chybi:
+        ted = timezone.now()
+        for let_id, (mapa, nejblizsi) in sestav_mapy(chybi).items():
+            timeout = CACHE_TTL
+            if nejblizsi is not None:
+                # Po expiraci nezaplacené rezervace je její místo volné
+                timeout = max(min(timeout, int((nejblizsi - ted).total_seconds()) + 1), 1)
+            cache.set(_klic(let_id), mapa, timeout=timeout)
+            mapy[let_id] = mapa
+    return mapy
+
+
+def mapa_letu(let_id):
+    """Vrátí MapaSedadel jednoho letu (viz mapy_letu)."""
+    return mapy_letu([let_id])[let_id]
+
+
+def zneplatni(let_ids):
+    cache.delete_many([_klic(let_id) for let_id in let_ids])
@@ -0,0 +1,273 @@
+"""
+Metriky požadavků (latence, SQL dotazy, vykreslení šablon) pro Prometheus.
+
+MetrikyMiddleware u každého požadavku změří:
+- celkovou dobu zpracování,
+- počet SQL dotazů a čas v databázi (connection.execute_wrapper),
+- čas vykreslování šablon (backend MereneSablony v settings.TEMPLATES),
+a přičte je do histogramů podle názvu URL (home, rezervace_detail,
+api_check_collisions...).
+
+Histogramy jsou v paměti procesu a /metrics obslouží vždy jen jeden gunicorn
+worker, proto každý proces nejvýš jednou za METRIKY_ZAPIS_S sekund (a při
+ukončení) zapíše své hodnoty do METRIKY_ADRESAR/{pid}.json - stejně jako
+pomale_dotazy.py. Export (/metrics, views.metriky_prometheus) sečte soubory
+všech procesů. Soubory skončených procesů zůstávají, aby čítače neklesaly
+(jinak by rate() v Prometheu viděl reset); adresář se vyprázdní s novým
+nasazením. Hodnoty ostatních workerů jsou tak staré nejvýš METRIKY_ZAPIS_S.
+Zaměstnanci (is_staff) navíc dostanou u každé odpovědi hlavičku Server-Timing,
+kterou ukazují vývojářské nástroje prohlížeče.
+"""
+import atexit
+import json
+import os
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+
+PREFIX = 'caelus'
+
+# Hranice košů histogramů (Prometheus "le")
+KOSE_CASU = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # sekundy
+KOSE_DOTAZU = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METODY = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+NENALEZENO = '<nenalezeno>'  # požadavek, který neodpovídá žádné URL (404)
+
+_aktualni = ContextVar('metriky_pozadavku', default=None)
+
+
+class Mereni:
+    """Čísla jednoho požadavku. sql() je execute_wrapper pro connection."""
+
+    def __init__(self):
+        self.dotazu = 0
+        self.cas_sql = 0.0
+        self.cas_sablon = 0.0
+        self.celkem = 0.0
+
+    def sql(self, execute, sql, params, many, context):
+        zacatek = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.cas_sql += perf_counter() - zacatek
+            self.dotazu += 1
+
+
+class Histogram:
+    def __init__(self, nazev, popis, kose, labely):
+        self.nazev = nazev
+        self.popis = popis
+        self.kose = kose
+        self.labely = labely
+        self.rady = {}  # hodnoty labelů -> [počty v koších..., součet, počet]
+
+    def pridej(self, hodnoty_labelu, hodnota):
+        rada = self.rady.get(hodnoty_labelu)
+        if rada is None:
+            rada = self.rady[hodnoty_labelu] = [0] * len(self.kose) + [0.0, 0]
+        for i, hranice in enumerate(self.kose):
+            if hodnota <= hranice:
+                rada[i] += 1
+        rada[-2] += hodnota
+        rada[-1] += 1
+
+    def export(self, rady):
+        radky = [f'# HELP {self.nazev} {self.popis}', f'# TYPE {self.nazev} histogram']
+        for hodnoty_labelu, rada in sorted(rady.items()):
+            labely = _labely(zip(self.labely, hodnoty_labelu))
+            for hranice, pocet in zip(self.kose, rada):
+                radky.append(f'{self.nazev}_bucket{{{labely},le="{hranice}"}} {pocet}')
+            radky.append(f'{self.nazev}_bucket{{{labely},le="+Inf"}} {rada[-1]}')
+            radky.append(f'{self.nazev}_sum{{{labely}}} {rada[-2]:.6f}')
+            radky.append(f'{self.nazev}_count{{{labely}}} {rada[-1]}')
+        return radky
+
+
+class Citac:
+    def __init__(self, nazev, popis, labely):
+        self.nazev = nazev
+        self.popis = popis
+        self.labely = labely
+        self.rady = {}
+
+    def pridej(self, hodnoty_labelu):
+        self.rady[hodnoty_labelu] = self.rady.get(hodnoty_labelu, 0) + 1
+
+    def export(self, rady):
+        radky = [f'# HELP {self.nazev} {self.popis}', f'# TYPE {self.nazev} counter']
+        for hodnoty_labelu, pocet in sorted(rady.items()):
+            radky.append(f'{self.nazev}{{{_labely(zip(self.labely, hodnoty_labelu))}}} {pocet}')
+        return radky
+
+
+def _labely(dvojice):
+    def escape(hodnota):
+        return str(hodnota).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{nazev}="{escape(hodnota)}"' for nazev, hodnota in dvojice)
+
+
+_zamek = threading.Lock()
+_zapsano = monotonic()
+POZADAVKY = Citac(f'{PREFIX}_http_requests_total', 'Počet požadavků.', ('view', 'method', 'status'))
+LATENCE = Histogram(f'{PREFIX}_http_request_duration_seconds', 'Celková doba zpracování požadavku.',
+                    KOSE_CASU, ('view', 'method'))
+DOTAZY = Histogram(f'{PREFIX}_db_queries_per_request', 'Počet SQL dotazů na požadavek.', KOSE_DOTAZU, ('view',))
+CAS_SQL = Histogram(f'{PREFIX}_db_duration_seconds', 'Čas strávený v SQL během požadavku.', KOSE_CASU, ('view',))
+CAS_SABLON = Histogram(f'{PREFIX}_template_render_duration_seconds', 'Čas vykreslování šablon během požadavku.',
+                       KOSE_CASU, ('view',))
+METRIKY = (POZADAVKY, LATENCE, DOTAZY, CAS_SQL, CAS_SABLON)
+
+
+def zaznamenej(pohled, metoda, status, mereni):
+    metoda = metoda if metoda in METODY else 'OTHER'
+    with _zamek:
+        POZADAVKY.pridej((pohled, metoda, str(status)))
+        LATENCE.pridej((pohled, metoda), mereni.celkem)
+        DOTAZY.pridej((pohled,), mereni.dotazu)
+        CAS_SQL.pridej((pohled,), mereni.cas_sql)
+        CAS_SABLON.pridej((pohled,), mereni.cas_sablon)
+    if monotonic() - _zapsano >= settings.METRIKY_ZAPIS_S:
+        zapis()
+
+
+# --- SOUBORY PROCESŮ ---
+
+def _adresar():
+    return Path(settings.METRIKY_ADRESAR)
+
+
+def zapis():
+    """Zapíše metriky tohoto procesu do {pid}.json (přepíše předchozí zápis)."""
+    global _zapsano
+    with _zamek:
+        _zapsano = monotonic()
+        if not any(metrika.rady for metrika in METRIKY):
+            return
+        data = json.dumps({metrika.nazev: [[list(labely), hodnota] for labely, hodnota in metrika.rady.items()]
+                           for metrika in METRIKY})
+    adresar = _adresar()
+    adresar.mkdir(parents=True, exist_ok=True)
+    docasny = adresar / f'{os.getpid()}.json.tmp'
+    docasny.write_text(data, encoding='utf-8')
+    os.replace(docasny, adresar / f'{os.getpid()}.json')
+
+
+atexit.register(zapis)
+
+
+def _secti(rady, labely, hodnota):
+    # Čítač je číslo, histogram seznam [koše..., součet, počet]
+    puvodni = rady.get(labely)
+    if puvodni is None:
+        rady[labely] = hodnota
+    elif isinstance(hodnota, list):
+        rady[labely] = [a + b for a, b in zip(puvodni, hodnota)]
+    else:
+        rady[labely] = puvodni + hodnota
+
+
+def export():
+    """Metriky všech procesů (součet jejich souborů) v textovém formátu Prometheus."""
+    zapis()
+    souhrn = {metrika.nazev: {} for metrika in METRIKY}
+    soubory = _adresar().glob('*.json') if _adresar().is_dir() else []
+    for soubor in soubory:
+        try:
+            data = json.loads(soubor.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue  # rozepsaný nebo poškozený soubor
+        for nazev, rady in data.items():
+            if nazev in souhrn:
+                for labely, hodnota in rady:
+                    _secti(souhrn[nazev], tuple(labely), hodnota)
+    radky = [radek for metrika in METRIKY for radek in metrika.export(souhrn[metrika.nazev])]
+    return '\n'.join(radky) + '\n'
+
+
+def vynuluj():
+    """Smaže metriky tohoto procesu i soubory všech procesů."""
+    with _zamek:
+        for metrika in METRIKY:
+            metrika.rady.clear()
+    if _adresar().is_dir():
+        for soubor in _adresar().glob('*.json'):
+            soubor.unlink(missing_ok=True)
+
+
+def nazev_pohledu(request):
+    """Název URL (view_name, u adminu s namespace) - ne cesta, ta by měla neomezeně hodnot."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else NENALEZENO
+
+
+# --- MIDDLEWARE ---
+
+class MetrikyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mereni = Mereni()
+        token = _aktualni.set(mereni)
+        zacatek = perf_counter()
+        try:
+            with connection.execute_wrapper(mereni.sql):
+                odpoved = self.get_response(request)
+        finally:
+            _aktualni.reset(token)
+        mereni.celkem = perf_counter() - zacatek
+
+        zaznamenej(nazev_pohledu(request), request.method, odpoved.status_code, mereni)
+        uzivatel = getattr(request, 'user', None)
+        if uzivatel is not None and uzivatel.is_staff:
+            odpoved['Server-Timing'] = server_timing(mereni)
+        return odpoved
+
+
+def server_timing(mereni):
+    return (f'sql;dur={mereni.cas_sql * 1000:.1f};desc="{mereni.dotazu} dotazu", '
+            f'sablony;dur={mereni.cas_sablon * 1000:.1f}, '
+            f'celkem;dur={mereni.celkem * 1000:.1f}')
+
+
+# --- ŠABLONY ---
+
+class MerenaSablona:
+    """Šablona backendu, která připočte dobu vykreslení k měření požadavku."""
+
+    def __init__(self, sablona):
+        self.sablona = sablona
+
+    def __getattr__(self, nazev):
+        return getattr(self.sablona, nazev)
+
+    def render(self, context=None, request=None):
+        mereni = _aktualni.get()
+        if mereni is None:
+            return self.sablona.render(context, request)
+        zacatek = perf_counter()
+        try:
+            return self.sablona.render(context, request)
+        finally:
+            mereni.cas_sablon += perf_counter() - zacatek
+
+
+class MereneSablony(DjangoTemplates):
+    """
+    Django šablony s měřením doby vykreslení. Měří se jen šablony načtené
+    přes backend (render, TemplateResponse) - {% include %} a {% extends %}
+    jsou jejich součástí, takže se nic nepočítá dvakrát.
+    """
+
+    def from_string(self, template_code):
+        return MerenaSablona(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return MerenaSablona(super().get_template(template_name))
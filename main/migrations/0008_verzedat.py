@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_inventarletu_cena'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerzeDat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nazev', models.CharField(max_length=50, unique=True)),
+                ('verze', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
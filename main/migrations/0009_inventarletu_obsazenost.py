@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:51
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def napln_pocitadla(apps, schema_editor):
+    # Počáteční naplnění počítadel z existujících letenek
+    InventarLetu = apps.get_model('main', 'InventarLetu')
+    Letenky = apps.get_model('main', 'Letenky')
+
+    skupiny = (Letenky.objects
+               .values('id_letu_id', 'id_tridy_id', 'id_rezervace__status_platby')
+               .annotate(pocet=Count('id'))
+               .order_by())
+    for s in skupiny:
+        pole = 'drzeno' if s['id_rezervace__status_platby'] == 'NEZAPLACENO' else 'prodano'
+        InventarLetu.objects.filter(id_letu_id=s['id_letu_id'], id_tridy_id=s['id_tridy_id']).update(
+            **{pole: F(pole) + s['pocet']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_verzedat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventarletu',
+            name='drzeno',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='inventarletu',
+            name='prodano',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(napln_pocitadla, migrations.RunPython.noop),
+    ]
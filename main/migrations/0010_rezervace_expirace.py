@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:56
+
+import datetime
+
+import main.models
+from django.db import migrations, models
+
+
+def nastav_expiraci(apps, schema_editor):
+    # Nezaplacené rezervace propadnou 30 minut po vytvoření (jako dřív ve vycistit_stare_rezervace),
+    # ostatní nepropadají nikdy
+    Rezervace = apps.get_model('main', 'Rezervace')
+    Rezervace.objects.exclude(status_platby='NEZAPLACENO').update(expirace=None)
+    Rezervace.objects.filter(status_platby='NEZAPLACENO').update(
+        expirace=models.F('datum_rezervace') + datetime.timedelta(minutes=30))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_inventarletu_obsazenost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rezervace',
+            name='expirace',
+            field=models.DateTimeField(blank=True, default=main.models.vychozi_expirace, null=True),
+        ),
+        migrations.RunPython(nastav_expiraci, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rezervace',
+            index=models.Index(condition=models.Q(('status_platby', 'NEZAPLACENO')), fields=['expirace'], name='rezervace_expirace_idx'),
+        ),
+    ]
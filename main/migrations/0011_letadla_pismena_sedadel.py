@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:58
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_rezervace_expirace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='letadla',
+            name='pismena_sedadel',
+            field=models.CharField(default='ABCDEF', max_length=12, validators=[django.core.validators.RegexValidator('^(?!.*(.).*\\1)[A-Z]+$', 'Jen velká písmena A-Z bez opakování (např. ABCDEF).')]),
+        ),
+    ]
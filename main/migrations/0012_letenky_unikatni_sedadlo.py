@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+def uvolni_dvojita_sedadla(apps, schema_editor):
+    # Stejné sedadlo prodané dvakrát (souběžné rezervace před zavedením zámků):
+    # sedadlo si nechá zaplacená letenka (jinak ta nejstarší), ostatním se
+    # sedadlo odebere a zákazník si vybere nové (zmenit_sedadlo)
+    Letenky = apps.get_model('main', 'Letenky')
+    dvojice = (Letenky.objects
+               .exclude(cislo_sedadla='')
+               .values('id_letu', 'cislo_sedadla')
+               .annotate(pocet=models.Count('id'))
+               .filter(pocet__gt=1))
+    for d in dvojice:
+        ids = list(Letenky.objects
+                   .filter(id_letu=d['id_letu'], cislo_sedadla=d['cislo_sedadla'])
+                   .order_by(models.Case(models.When(id_rezervace__status_platby='ZAPLACENO', then=0), default=1), 'id')
+                   .values_list('id', flat=True))
+        Letenky.objects.filter(id__in=ids[1:]).update(cislo_sedadla='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_letadla_pismena_sedadel'),
+    ]
+
+    operations = [
+        migrations.RunPython(uvolni_dvojita_sedadla, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='letenky',
+            constraint=models.UniqueConstraint(condition=models.Q(('cislo_sedadla', ''), _negated=True), fields=('id_letu', 'cislo_sedadla'), name='letenky_let_sedadlo_uniq'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_letenky_unikatni_sedadlo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verzedat',
+            name='zmeneno',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lety',
+            index=models.Index(fields=['id_aerolinky', 'cas_odletu', 'id'], name='lety_aerolinka_odlet_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_verzedat_zmeneno_lety_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lety',
+            index=models.Index(fields=['id_aerolinky', 'cislo_letu', 'cas_odletu'], name='lety_aerolinka_cislo_idx'),
+        ),
+    ]
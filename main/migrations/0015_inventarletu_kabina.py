@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+KABINY = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def napln_kabiny(apps, schema_editor):
+    # Stejné prefixy, jaké dosud mapa sedadel odvozovala z pořadí ceny (kabiny
+    # s místy podle ceny a id), takže sedadla prodaných letenek zůstanou platná.
+    # Třídy bez míst v mapě nebyly - dostanou další volná písmena.
+    InventarLetu = apps.get_model('main', 'InventarLetu')
+    poradi = {}
+    for inv in InventarLetu.objects.order_by('id_letu_id', 'cena', 'id').only('id', 'id_letu_id',
+                                                                              'pocet_mist_k_prodeji'):
+        poradi.setdefault(inv.id_letu_id, ([], []))[inv.pocet_mist_k_prodeji == 0].append(inv)
+    zmenene = []
+    for s_misty, bez_mist in poradi.values():
+        for kabina, inv in zip(KABINY, s_misty + bez_mist):
+            inv.kabina = kabina
+            zmenene.append(inv)
+    InventarLetu.objects.bulk_update(zmenene, ['kabina'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_lety_aerolinka_cislo_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventarletu',
+            name='kabina',
+            field=models.CharField(default='', editable=False, max_length=1),
+            preserve_default=False,
+        ),
+        migrations.RunPython(napln_kabiny, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='inventarletu',
+            unique_together={('id_letu', 'id_tridy'), ('id_letu', 'kabina')},
+        ),
+    ]
@@ -2,7 +2,10 @@ from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
+from django.core.validators import RegexValidator
+from django.db.models import Q, Sum
+from django.utils import timezone
+from datetime import timedelta
 
 # PK je vzdy vytvoren automaticky pro kazdou tabulku
 
@@ -58,6 +61,11 @@ class Letadla(models.Model):
     model = models.CharField(max_length=100)  # text
     kapacita_sedadel = models.PositiveIntegerField()  # int
     datum_vyroby = models.DateField()  # time
+    # Rozložení sedadel v jedné řadě (písmena zleva doprava), viz main/mapa_sedadel.py
+    pismena_sedadel = models.CharField(
+        max_length=12, default='ABCDEF',
+        validators=[RegexValidator(r'^(?!.*(.).*\1)[A-Z]+$', 'Jen velká písmena A-Z bez opakování (např. ABCDEF).')],
+    )  # text
 
     # FK (VAZBA 1:N)
     id_aerolinky = models.ForeignKey(
@@ -185,14 +193,34 @@ class Lety(models.Model):
         related_name="lety"  # Umožní najít všechny lety pro daného uživatele (clena posadky)
     )
 
+    class Meta:
+        indexes = [
+            # Lety aerolinky po časech (report kolizí rozvrhu aerolinky, viz kolize.py)
+            models.Index(fields=['id_aerolinky', 'cas_odletu', 'id'], name='lety_aerolinka_odlet_idx'),
+            # Hledání letu podle začátku čísla (našeptávač ve správě letů)
+            models.Index(fields=['id_aerolinky', 'cislo_letu', 'cas_odletu'], name='lety_aerolinka_cislo_idx'),
+        ]
+
     def __str__(self):
         return self.cislo_letu
 
 
+KABINY = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'  # prefixy kabin letu
+
+
 class InventarLetu(models.Model):
     pocet_mist_k_prodeji = models.PositiveIntegerField()  # int
     cena = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Počítadla obsazenosti (udržuje main/obsazenost.py, přepočet: manage.py prepocitej_obsazenost)
+    prodano = models.PositiveIntegerField(default=0, editable=False)  # letenky zaplacených rezervací
+    drzeno = models.PositiveIntegerField(default=0, editable=False)  # letenky nezaplacených rezervací
+
+    # Prefix kódů sedadel kabiny této třídy ('A' -> sedadla A1A, A1B...), viz main/mapa_sedadel.py.
+    # Přidělí se jednou při vytvoření a už se nemění - změna ceny ani odebrání
+    # jiné třídy nesmí přečíslovat sedadla prodaných letenek.
+    kabina = models.CharField(max_length=1, editable=False)
+
     # FK
     id_letu = models.ForeignKey(Lety, on_delete=models.CASCADE)  # Pokud smažu let, smažou se i inventary
     id_tridy = models.ForeignKey(
@@ -202,7 +230,35 @@ class InventarLetu(models.Model):
 
     class Meta:
         # Zajišťuje, že nemůžeme mít dvě definice inventáře pro stejnou třídu na stejném letu
-        unique_together = ('id_letu', 'id_tridy')
+        unique_together = [('id_letu', 'id_tridy'), ('id_letu', 'kabina')]
+
+    @classmethod
+    def pridel_kabiny(cls, inventare):
+        """
+        Nově vytvářeným inventářům (bez kabiny) přidělí první volná písmena
+        jejich letu, v pořadí seznamu. Pro bulk_create, save() to dělá samo.
+        """
+        bez_kabiny = [inv for inv in inventare if not inv.kabina]
+        zabrane = {}
+        for let_id, kabina in cls.objects.filter(
+                id_letu_id__in={inv.id_letu_id for inv in bez_kabiny}).values_list('id_letu_id', 'kabina'):
+            zabrane.setdefault(let_id, set()).add(kabina)
+        for inv in inventare:
+            if inv.kabina:
+                zabrane.setdefault(inv.id_letu_id, set()).add(inv.kabina)
+        for inv in bez_kabiny:
+            pouzite = zabrane.setdefault(inv.id_letu_id, set())
+            inv.kabina = next(p for p in KABINY if p not in pouzite)
+            pouzite.add(inv.kabina)
+
+    def save(self, *args, **kwargs):
+        if not self.kabina:
+            InventarLetu.pridel_kabiny([self])
+        super().save(*args, **kwargs)
+
+    @property
+    def volnych_mist(self):
+        return max(self.pocet_mist_k_prodeji - self.prodano - self.drzeno, 0)
 
     # --- NOVÁ VALIDAČNÍ METODA ---
     def clean(self):
@@ -229,8 +285,15 @@ class InventarLetu(models.Model):
             )
 
 
+def vychozi_expirace():
+    return timezone.now() + timedelta(minutes=settings.REZERVACE_DOBA_DRZENI)
+
+
 class Rezervace(models.Model):
     datum_rezervace = models.DateTimeField(auto_now_add=True)  # time (automaticky)
+    # Do kdy musí být nezaplacená rezervace zaplacena, pak její místa propadnou
+    # (zaplacené rezervace mají None). Maže je manage.py expire_reservations.
+    expirace = models.DateTimeField(null=True, blank=True, default=vychozi_expirace)
     celkova_cena = models.DecimalField(max_digits=10, decimal_places=2)  # int
 
     # Výběr z možností
@@ -248,6 +311,14 @@ class Rezervace(models.Model):
     # FK
     id_uzivatele = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
 
+    class Meta:
+        indexes = [
+            # Částečný index jen přes nezaplacené rezervace - hledání propadlých je
+            # rychlé a index se nezvětšuje se zaplacenými (SQLite i Postgres)
+            models.Index(fields=['expirace'], name='rezervace_expirace_idx',
+                         condition=Q(status_platby='NEZAPLACENO')),
+        ]
+
     def __str__(self):
         return f"Rezervace {self.id} - {self.status_platby}"
 
@@ -263,6 +334,14 @@ class Letenky(models.Model):
     id_letu = models.ForeignKey(Lety, on_delete=models.CASCADE)
     id_tridy = models.ForeignKey(TridySedadel, on_delete=models.PROTECT)
 
+    class Meta:
+        constraints = [
+            # Jedno sedadlo na letu má nejvýš jedna letenka (viz main/rezervovani.py).
+            # Prázdné číslo = sedadlo zatím nepřidělené.
+            models.UniqueConstraint(fields=['id_letu', 'cislo_sedadla'], name='letenky_let_sedadlo_uniq',
+                                    condition=~Q(cislo_sedadla='')),
+        ]
+
     def __str__(self):
         return f"Letenka {self.id} ({self.cislo_sedadla})"
 
@@ -290,3 +369,40 @@ class RoleUzivatel(models.Model):
         # ve stejný čas
         unique_together = ('id_uzivatele', 'id_role', 'plati_do')
 
+
+
+# --- TECHNICKÉ TABULKY ---
+
+class VerzeDat(models.Model):
+    """
+    Sdílené počítadlo změn (např. 'lety'). Každý proces (gunicorn worker)
+    si drží vlastní cache a podle tohoto čísla pozná, že ji má zahodit,
+    protože data změnil jiný proces.
+    """
+    nazev = models.CharField(max_length=50, unique=True)  # text
+    verze = models.PositiveBigIntegerField(default=0)  # int
+    zmeneno = models.DateTimeField(null=True, blank=True)  # kdy se verze naposledy zvýšila
+
+    def __str__(self):
+        return f"{self.nazev} (v{self.verze})"
+
+    @classmethod
+    def aktualni(cls, nazev):
+        return cls.objects.filter(nazev=nazev).values_list('verze', flat=True).first() or 0
+
+    @classmethod
+    def zvys(cls, nazev):
+        """
+        Atomicky zvýší počítadlo (UPDATE ... SET verze = verze + 1) a vrátí novou hodnotu.
+        """
+        zmena = {'verze': models.F('verze') + 1, 'zmeneno': timezone.now()}
+        if not cls.objects.filter(nazev=nazev).update(**zmena):
+            cls.objects.get_or_create(nazev=nazev)
+            cls.objects.filter(nazev=nazev).update(**zmena)
+        return cls.aktualni(nazev)
+
+    @classmethod
+    def stav(cls, nazvy):
+        """Verze a čas poslední změny více počítadel jedním dotazem: {nazev: (verze, zmeneno)}."""
+        nalezene = {n: (v, z) for n, v, z in cls.objects.filter(nazev__in=nazvy).values_list('nazev', 'verze', 'zmeneno')}
+        return {nazev: nalezene.get(nazev, (0, None)) for nazev in nazvy}
@@ -0,0 +1,225 @@
+"""
+Počítadla obsazenosti v InventarLetu (prodano / drzeno).
+
+Dřív se obsazenost počítala při každém čtení jako COUNT letenek a při
+rezervaci se kapacita vůbec nekontrolovala - dva souběžné nákupy mohly
+prodat stejné poslední místo. Teď se místo zabírá podmíněným UPDATE:
+
+    UPDATE inventar SET drzeno = drzeno + 1
+    WHERE id = ? AND prodano + drzeno < pocet_mist_k_prodeji
+
+Databáze ho provede atomicky, takže když UPDATE nezmění žádný řádek,
+místo už není. Všechny funkce je potřeba volat uvnitř transaction.atomic()
+spolu se změnou letenek, aby počítadla a letenky zůstaly v souladu.
+
+Letenky nezaplacené rezervace se počítají do 'drzeno', ostatní do 'prodano'.
+Kdyby se počítadla přece jen rozešla (ruční zásah v adminu apod.),
+přepočítá je manage.py prepocitej_obsazenost.
+
+Propadlé nezaplacené rezervace (Rezervace.expirace) maže na pozadí
+manage.py expire_reservations. Než se k nim dostane, čtení s nimi
+počítá jako s volnými místy (viz propadle_drzeni) a rezervace si je
+v případě potřeby uvolní sama (viz zaber_misto).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import InventarLetu, Letenky, Rezervace
+
+STAV_DRZENO = 'NEZAPLACENO'
+
+
+def _pole(status_platby):
+    return 'drzeno' if status_platby == STAV_DRZENO else 'prodano'
+
+
+def je_propadla(prefix=''):
+    """
+    Podmínka pro propadlou nezaplacenou rezervaci (prefix např. 'id_rezervace__' pro letenky).
+    Odpovídá částečnému indexu rezervace_expirace_idx.
+    """
+    return Q(**{f'{prefix}status_platby': STAV_DRZENO, f'{prefix}expirace__lt': timezone.now()})
+
+
+def _zaber(inventar_id, pole):
+    return InventarLetu.objects.filter(
+        pk=inventar_id,
+        pocet_mist_k_prodeji__gt=F('prodano') + F('drzeno'),
+    ).update(**{pole: F(pole) + 1}) == 1
+
+
+def zaber_misto(inventar_id, status_platby):
+    """
+    Zabere jedno místo v inventáři pro letenku rezervace ve stavu status_platby.
+    Vrátí False, pokud už žádné volné není. Pokud místa blokují propadlé
+    rezervace, které úklid ještě nesmazal, uvolníme je hned a zkusíme to znovu.
+    """
+    pole = _pole(status_platby)
+    if _zaber(inventar_id, pole):
+        return True
+    let_id = InventarLetu.objects.filter(pk=inventar_id).values_list('id_letu_id', flat=True).first()
+    if let_id is None or not uvolni_propadle(let_id=let_id):
+        return False
+    return _zaber(inventar_id, pole)
+
+
+class _Nezabrano(Exception):
+    pass
+
+
+def _zaber_vse(inventar_ids, pole):
+    # Jeden UPDATE pro všechny inventáře; když některý nemá místo,
+    # savepoint vrátí i ty ostatní (všechno, nebo nic)
+    try:
+        with transaction.atomic():
+            zabrano = InventarLetu.objects.filter(
+                pk__in=inventar_ids,
+                pocet_mist_k_prodeji__gt=F('prodano') + F('drzeno'),
+            ).update(**{pole: F(pole) + 1})
+            if zabrano != len(inventar_ids):
+                raise _Nezabrano
+    except _Nezabrano:
+        return False
+    return True
+
+
+def zaber_mista(inventar_ids, pole='drzeno'):
+    """
+    Zabere po jednom místě v každém z (různých) inventářů, všechno najednou.
+    Vrátí seznam id inventářů bez volného místa (prázdný = vše zabráno,
+    jinak se nezabralo nic). Propadlé rezervace uvolní stejně jako zaber_misto.
+    """
+    inventar_ids = set(inventar_ids)
+    if not inventar_ids or _zaber_vse(inventar_ids, pole):
+        return []
+
+    def bez_mista():
+        return inventar_ids - set(InventarLetu.objects.filter(
+            pk__in=inventar_ids, pocet_mist_k_prodeji__gt=F('prodano') + F('drzeno'),
+        ).values_list('id', flat=True))
+
+    let_ids = InventarLetu.objects.filter(pk__in=bez_mista()).values_list('id_letu_id', flat=True)
+    uvolneno = [uvolni_propadle(let_id=let_id) for let_id in set(let_ids)]
+    if any(uvolneno) and _zaber_vse(inventar_ids, pole):
+        return []
+    return sorted(bez_mista())
+
+
+def _odecti(let_id, trida_id, pole, pocet):
+    # Greatest: počítadlo nikdy nejde pod nulu, ani kdyby se rozešlo s letenkami
+    InventarLetu.objects.filter(id_letu_id=let_id, id_tridy_id=trida_id).update(
+        **{pole: Greatest(F(pole) - pocet, 0)})
+
+
+def uvolni_misto(let_id, trida_id, status_platby):
+    """
+    Uvolní místo jedné letenky (např. při změně třídy). status_platby je stav
+    její rezervace - zaplacená letenka se odečte z 'prodano', ne z 'drzeno'.
+    """
+    _odecti(let_id, trida_id, _pole(status_platby), 1)
+
+
+def uvolni_mista(letenky):
+    """
+    Uvolní místa všech zadaných letenek (QuerySet) - jeden UPDATE na každou
+    dvojici (let, třída) a stav rezervace. Volat PŘED smazáním letenek.
+    """
+    skupiny = (letenky
+               .values('id_letu_id', 'id_tridy_id', 'id_rezervace__status_platby')
+               .annotate(pocet=Count('id'))
+               .order_by())
+    for s in skupiny:
+        _odecti(s['id_letu_id'], s['id_tridy_id'], _pole(s['id_rezervace__status_platby']), s['pocet'])
+
+
+def zmen_stav_rezervace(rezervace, novy_stav):
+    """
+    Přesune místa letenek rezervace mezi 'drzeno' a 'prodano' podle nového stavu
+    (např. po zaplacení). Samotný stav rezervace ukládá volající.
+    """
+    stare_pole, nove_pole = _pole(rezervace.status_platby), _pole(novy_stav)
+    if stare_pole == nove_pole:
+        return
+
+    pocty = Counter(rezervace.letenky_set.values_list('id_letu_id', 'id_tridy_id'))
+    for (let_id, trida_id), pocet in pocty.items():
+        InventarLetu.objects.filter(id_letu_id=let_id, id_tridy_id=trida_id).update(**{
+            stare_pole: Greatest(F(stare_pole) - pocet, 0),
+            nove_pole: F(nove_pole) + pocet,
+        })
+
+
+def propadle_drzeni(let_ids):
+    """
+    Vrátí {(id_letu, id_tridy): počet} letenek z propadlých rezervací, které
+    se ještě počítají do 'drzeno'. Čtení dostupnosti je odečte - díky částečnému
+    indexu je to levný dotaz a obvykle prázdný (úklid běží průběžně).
+    """
+    skupiny = (Letenky.objects
+               .filter(je_propadla('id_rezervace__'), id_letu_id__in=let_ids)
+               .values('id_letu_id', 'id_tridy_id')
+               .annotate(pocet=Count('id'))
+               .order_by())
+    return {(s['id_letu_id'], s['id_tridy_id']): s['pocet'] for s in skupiny}
+
+
+def uvolni_propadle(davka=500, let_id=None):
+    """
+    Smaže jednu dávku propadlých nezaplacených rezervací a uvolní jejich místa.
+    Vrátí počet smazaných rezervací (0 = není co mazat).
+    """
+    propadle = Rezervace.objects.filter(je_propadla())
+    if let_id is not None:
+        propadle = propadle.filter(letenky__id_letu_id=let_id).distinct()
+
+    with transaction.atomic():
+        # skip_locked: souběžné úklidy (nebo rezervace) si v Postgresu nepřekáží;
+        # SQLite zámky řádků nemá a zápisy stejně serializuje.
+        # Podmínku opakujeme, protože rezervace mohla být mezitím zaplacena.
+        ids = list(Rezervace.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(je_propadla(), id__in=list(propadle.values_list('id', flat=True)[:davka]))
+                   .values_list('id', flat=True))
+        if ids:
+            uvolni_mista(Letenky.objects.filter(id_rezervace_id__in=ids))
+            Rezervace.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def prepocitej_obsazenost(let_ids=None):
+    """
+    Přepočítá počítadla z letenek. Vrátí počet opravených inventářů.
+    Inventáře se nejdřív zamknou, takže rozpracované rezervace se buď
+    dokončí před přepočtem, nebo počkají až po něm.
+    """
+    inventare = InventarLetu.objects.all()
+    letenky = Letenky.objects.all()
+    if let_ids is not None:
+        inventare = inventare.filter(id_letu_id__in=let_ids)
+        letenky = letenky.filter(id_letu_id__in=let_ids)
+
+    with transaction.atomic():
+        inventare = list(inventare.select_for_update().only('id', 'id_letu_id', 'id_tridy_id', 'prodano', 'drzeno'))
+
+        pocty = Counter()
+        skupiny = (letenky
+                   .values('id_letu_id', 'id_tridy_id', 'id_rezervace__status_platby')
+                   .annotate(pocet=Count('id'))
+                   .order_by())
+        for s in skupiny:
+            pocty[(s['id_letu_id'], s['id_tridy_id'], _pole(s['id_rezervace__status_platby']))] += s['pocet']
+
+        opravit = []
+        for inv in inventare:
+            prodano = pocty[(inv.id_letu_id, inv.id_tridy_id, 'prodano')]
+            drzeno = pocty[(inv.id_letu_id, inv.id_tridy_id, 'drzeno')]
+            if (inv.prodano, inv.drzeno) != (prodano, drzeno):
+                inv.prodano, inv.drzeno = prodano, drzeno
+                opravit.append(inv)
+
+        InventarLetu.objects.bulk_update(opravit, ['prodano', 'drzeno'], batch_size=500)
+    return len(opravit)
@@ -0,0 +1,116 @@
+"""
+Platné role uživatele - jeden zdroj pro admin, správu letů i přihlášení.
+
+Dřív se "má uživatel platnou roli?" zjišťovalo dvěma dotazy exists()
+(plati_do >= teď / plati_do IS NULL) s JOINem na název role, a admin to volá
+z každého has_*_permission, tedy mnohokrát při jednom vykreslení seznamu. Teď:
+- všechny platné role uživatele se načtou jedním dotazem jako množina id,
+- množina se drží na objektu uživatele (request.user žije jen po dobu
+  požadavku) a v cache mezi požadavky; z cache vypadne při změně
+  RoleUzivatel (signály) a nejpozději ve chvíli, kdy některá role vyprší,
+- názvy rolí se převádějí na id přes cachovaný číselník, takže se
+  nemusí joinovat tabulka Role.
+
+Cache je v každém procesu vlastní (LocMemCache), signál ji ale smaže jen
+v procesu, který změnu provedl. Proto má každý uživatel počítadlo
+VerzeDat('platne_role:<id>'), které signál zvýší, a množina z cache se použije,
+jen když je uložená se stejnou verzí (jeden malý dotaz na začátku požadavku).
+Číselník názvů má počítadlo VerzeDat('role_podle_nazvu'), to se kvůli
+rychlosti kontroluje nejvýš jednou za KONTROLA_VERZE sekund.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Role, RoleUzivatel, VerzeDat
+
+PREFIX = 'platne_role'
+KLIC_NAZVU = 'role_podle_nazvu'
+CACHE_TTL = 300  # sekund
+KONTROLA_VERZE = 5  # sekund
+
+
+def _klic(uzivatel_id):
+    return f'{PREFIX}:{uzivatel_id}'
+
+
+def id_roli(nazvy):
+    """Id rolí podle názvů (neznámé názvy se ignorují)."""
+    if isinstance(nazvy, str):
+        nazvy = [nazvy]
+    ulozeno = cache.get(KLIC_NAZVU)
+    ted = time.time()
+    if ulozeno is None or ted - ulozeno[1] >= KONTROLA_VERZE:
+        verze = VerzeDat.aktualni(KLIC_NAZVU)
+        if ulozeno is None or ulozeno[0] != verze:
+            podle_nazvu = {}
+            for role_id, nazev in Role.objects.values_list('id', 'nazev_role'):
+                podle_nazvu.setdefault(nazev, set()).add(role_id)
+            ulozeno = (verze, ted, podle_nazvu)
+        else:
+            ulozeno = (verze, ted, ulozeno[2])
+        cache.set(KLIC_NAZVU, ulozeno, timeout=CACHE_TTL)
+    podle_nazvu = ulozeno[2]
+    return set().union(*(podle_nazvu.get(nazev, ()) for nazev in nazvy))
+
+
+def _nacti(uzivatel_id):
+    """Platné role jedním dotazem: (množina id, kdy nejdřív některá vyprší)."""
+    ted = timezone.now()
+    role, vyprsi = set(), None
+    for role_id, plati_do in (RoleUzivatel.objects
+                              .filter(Q(plati_do__isnull=True) | Q(plati_do__gte=ted), id_uzivatele_id=uzivatel_id)
+                              .values_list('id_role_id', 'plati_do')):
+        role.add(role_id)
+        if plati_do is not None and (vyprsi is None or plati_do < vyprsi):
+            vyprsi = plati_do
+    return frozenset(role), vyprsi
+
+
+def platne_role(uzivatel):
+    """Množina id rolí, které uživatel právě má (z paměti požadavku, cache, nebo DB)."""
+    ted = timezone.now()
+    ulozeno = getattr(uzivatel, '_platne_role', None)
+    if ulozeno is None or (ulozeno[1] is not None and ulozeno[1] < ted):
+        klic = _klic(uzivatel.pk)
+        verze = VerzeDat.aktualni(klic)
+        v_cache = cache.get(klic)
+        if v_cache is not None and v_cache[0] == verze and (v_cache[2] is None or v_cache[2] >= ted):
+            ulozeno = v_cache[1:]
+        else:
+            # Verzi čteme PŘED načtením rolí - změna mezitím vyvolá další načtení
+            ulozeno = _nacti(uzivatel.pk)
+            timeout = CACHE_TTL
+            if ulozeno[1] is not None:
+                timeout = max(min(timeout, int((ulozeno[1] - ted).total_seconds()) + 1), 1)
+            cache.set(klic, (verze, *ulozeno), timeout=timeout)
+        uzivatel._platne_role = ulozeno
+    return ulozeno[0]
+
+
+def ma_platnou_roli(user, role_nazvy):
+    """Má uživatel aspoň jednu z rolí (název nebo seznam názvů)? Superuser vždy."""
+    if user.is_superuser:
+        return True
+    return not platne_role(user).isdisjoint(id_roli(role_nazvy))
+
+
+def _zvys_verze(klice):
+    # Ostatní procesy poznají změnu podle verze, ve vlastním rovnou mažeme
+    for klic in sorted(klice):
+        VerzeDat.zvys(klic)
+    cache.delete_many(klice)
+
+
+def zneplatni(uzivatel_ids):
+    """Volá se ze signálů - role uživatelů se po commitu znovu načtou ve všech procesech."""
+    klice = [_klic(uzivatel_id) for uzivatel_id in set(uzivatel_ids)]
+    if klice:
+        transaction.on_commit(lambda: _zvys_verze(klice))
+
+
+def zneplatni_nazvy():
+    transaction.on_commit(lambda: _zvys_verze([KLIC_NAZVU]))
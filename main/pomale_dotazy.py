@@ -0,0 +1,225 @@
+"""
+Vzorkování pomalých SQL dotazů s plánem (EXPLAIN).
+
+Každé databázové spojení dostane execute_wrapper sleduj() (signál
+connection_created, viz signals.py). Dotaz delší než
+settings.POMALE_DOTAZY_PRAH_MS se zaznamená pod svým otiskem - SQL bez
+konkrétních hodnot, takže dotazy lišící se jen parametry (id, datum, délka
+seznamu v IN) se sčítají dohromady. U otisku se drží počet, součet a maximum
+času a vzorek časů pro p95. Při prvním výskytu otisku se spustí EXPLAIN
+(SQLite: EXPLAIN QUERY PLAN, PostgreSQL: EXPLAIN) se stejnými parametry.
+
+Statistiky jsou v paměti procesu a nejvýš jednou za POMALE_DOTAZY_ZAPIS_S
+sekund (a při ukončení procesu) se zapíšou do POMALE_DOTAZY_ADRESAR/{pid}.json.
+manage.py slow_queries soubory všech procesů sloučí a vypíše nejhorší dotazy.
+
+Vynulování (slow_queries --vynulovat) zapíše do adresáře novou generaci.
+Každý proces ji před zápisem porovná se svou; když se liší, zahodí statistiky
+z paměti, takže je po vynulování znovu nezapíše. Report slučuje jen soubory
+aktuální generace, a soubory, které se ZASTARALY_PO intervalů nepřepsaly
+(proces skončil), maže.
+"""
+import atexit
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+VZORKU = 200  # kolik časů na otisk držíme pro p95 (reservoir sampling)
+KAPACITA = 4  # drží se až KAPACITA * POMALE_DOTAZY_TOP otisků, pak se vyhazují ty s nejmenším součtem
+ZASTARALY_PO = 10  # soubor nepřepsaný tolik intervalů POMALE_DOTAZY_ZAPIS_S patří skončenému procesu
+SOUBOR_GENERACE = 'generace'
+
+_RETEZEC = re.compile(r"'(?:[^']|'')*'")
+_CISLO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETR = re.compile(r'%s|\?')
+_SEZNAM = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_MEZERY = re.compile(r'\s+')
+_CTENI = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+def otisk(sql):
+    """
+    SQL bez konkrétních hodnot: řetězce, čísla a parametry -> ?, seznamy
+    hodnot (IN (...)) -> (...). Funguje pro SQL s parametry (%s) i pro SQL
+    s dosazenými hodnotami (connection.queries).
+    """
+    sql = _RETEZEC.sub('?', sql)
+    sql = _CISLO.sub('?', sql)
+    sql = _PARAMETR.sub('?', sql)
+    sql = _SEZNAM.sub('(...)', sql)
+    return _MEZERY.sub(' ', sql).strip()
+
+
+_zamek = threading.Lock()
+_dotazy = {}  # otisk -> záznam (slovník, stejný tvar jako v souborech)
+_mimo = threading.local()  # EXPLAIN vlastních dotazů už nesledujeme
+_zapsano = time.monotonic()
+_generace = None  # generace, do které patří statistiky v paměti (načte se při prvním zápisu)
+
+
+def sleduj(execute, sql, params, many, context):
+    """execute_wrapper: změří dotaz a pomalý zaznamená."""
+    if getattr(_mimo, 'aktivni', False):
+        return execute(sql, params, many, context)
+    zacatek = time.perf_counter()
+    vysledek = execute(sql, params, many, context)
+    ms = (time.perf_counter() - zacatek) * 1000
+    # Dotaz, který skončil chybou, se nezaznamenává (transakce může být
+    # rozbitá a EXPLAIN by v ní neprošel)
+    prah = settings.POMALE_DOTAZY_PRAH_MS
+    if prah is not None and ms >= prah:
+        _zaznamenej(context['connection'], sql, params, many, ms)
+    # Zapisuje se i bez nových pomalých dotazů - čerstvý soubor = proces žije
+    if time.monotonic() - _zapsano >= settings.POMALE_DOTAZY_ZAPIS_S:
+        zapis()
+    return vysledek
+
+
+def _zaznamenej(connection, sql, params, many, ms):
+    klic = otisk(sql)
+    with _zamek:
+        zaznam = _dotazy.get(klic)
+        novy = zaznam is None
+        if novy:
+            if len(_dotazy) >= KAPACITA * settings.POMALE_DOTAZY_TOP:
+                del _dotazy[min(_dotazy, key=lambda k: _dotazy[k]['celkem_ms'])]
+            zaznam = _dotazy[klic] = {
+                'otisk': klic, 'pocet': 0, 'celkem_ms': 0.0, 'max_ms': 0.0, 'casy': [],
+                'priklad': sql, 'plan': None,
+            }
+        zaznam['pocet'] += 1
+        zaznam['celkem_ms'] += ms
+        zaznam['max_ms'] = max(zaznam['max_ms'], ms)
+        if len(zaznam['casy']) < VZORKU:
+            zaznam['casy'].append(ms)
+        else:
+            i = random.randrange(zaznam['pocet'])
+            if i < VZORKU:
+                zaznam['casy'][i] = ms
+
+    if novy and not many:
+        zaznam['plan'] = explain(connection, sql, params)
+
+
+def explain(connection, sql, params):
+    """Plán dotazu jako text (None pro dotazy, které nejsou SELECT)."""
+    if not _CTENI.match(sql):
+        return None
+    predpona = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    _mimo.aktivni = True
+    try:
+        # Savepoint - chyba EXPLAINu nesmí rozbít transakci požadavku
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(predpona + sql, params)
+                radky = cursor.fetchall()
+    except DatabaseError as e:
+        return f'EXPLAIN selhal: {e}'
+    finally:
+        _mimo.aktivni = False
+    # SQLite: (id, parent, notused, detail), PostgreSQL: jeden sloupec s řádkem plánu
+    return '\n'.join(str(radek[-1]) for radek in radky)
+
+
+# --- ULOŽENÍ A REPORT ---
+
+def _adresar():
+    return Path(settings.POMALE_DOTAZY_ADRESAR)
+
+
+def _zapis_atomicky(soubor, text):
+    soubor.parent.mkdir(parents=True, exist_ok=True)
+    docasny = soubor.with_name(f'{soubor.name}.{os.getpid()}.tmp')
+    docasny.write_text(text, encoding='utf-8')
+    os.replace(docasny, soubor)
+
+
+def _aktualni_generace():
+    try:
+        return (_adresar() / SOUBOR_GENERACE).read_text(encoding='utf-8').strip()
+    except OSError:
+        return ''
+
+
+def zapis():
+    """Zapíše statistiky tohoto procesu do {pid}.json (přepíše předchozí zápis)."""
+    global _zapsano, _generace
+    generace = _aktualni_generace()
+    with _zamek:
+        _zapsano = time.monotonic()
+        if _generace is None:
+            _generace = generace
+        elif generace != _generace:
+            # Mezitím se vynulovalo - statistiky v paměti patří do staré generace
+            _dotazy.clear()
+            _generace = generace
+        if not _dotazy:
+            return
+        data = json.dumps({'generace': generace, 'dotazy': list(_dotazy.values())}, ensure_ascii=False)
+    _zapis_atomicky(_adresar() / f'{os.getpid()}.json', data)
+
+
+atexit.register(zapis)
+
+
+def _p95(casy):
+    casy = sorted(casy)
+    return casy[min(len(casy) - 1, int(len(casy) * 0.95))] if casy else 0.0
+
+
+def report(top=None):
+    """
+    Nejhorší otisky ze všech procesů (podle součtu času):
+    [{'otisk', 'pocet', 'celkem_ms', 'max_ms', 'p95_ms', 'priklad', 'plan'}].
+    """
+    zapis()
+    generace = _aktualni_generace()
+    zastaraly = time.time() - ZASTARALY_PO * settings.POMALE_DOTAZY_ZAPIS_S
+    slouceno = {}
+    soubory = _adresar().glob('*.json') if _adresar().is_dir() else []
+    for soubor in soubory:
+        try:
+            if soubor.stat().st_mtime < zastaraly:
+                soubor.unlink(missing_ok=True)
+                continue
+            obsah = json.loads(soubor.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue  # rozepsaný nebo poškozený soubor
+        if not isinstance(obsah, dict) or obsah.get('generace') != generace:
+            continue  # zapsáno před vynulováním
+        for zaznam in obsah['dotazy']:
+            cil = slouceno.setdefault(zaznam['otisk'], {**zaznam, 'pocet': 0, 'celkem_ms': 0.0, 'max_ms': 0.0,
+                                                        'casy': []})
+            cil['pocet'] += zaznam['pocet']
+            cil['celkem_ms'] += zaznam['celkem_ms']
+            cil['max_ms'] = max(cil['max_ms'], zaznam['max_ms'])
+            cil['casy'] += zaznam['casy']
+            cil['plan'] = cil['plan'] or zaznam['plan']
+
+    vysledek = sorted(slouceno.values(), key=lambda z: z['celkem_ms'], reverse=True)
+    for zaznam in vysledek:
+        zaznam['p95_ms'] = _p95(zaznam.pop('casy'))
+    return vysledek[:top or settings.POMALE_DOTAZY_TOP]
+
+
+def vynuluj():
+    """
+    Začne novou generaci: smaže statistiky tohoto procesu i všechny zapsané
+    soubory, ostatní procesy svoje zahodí při příštím zápisu.
+    """
+    global _generace
+    generace = uuid.uuid4().hex
+    _zapis_atomicky(_adresar() / SOUBOR_GENERACE, generace)
+    with _zamek:
+        _dotazy.clear()
+        _generace = generace
+    for soubor in _adresar().glob('*.json'):
+        soubor.unlink(missing_ok=True)
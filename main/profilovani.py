@@ -0,0 +1,176 @@
+"""
+Profilování jednoho požadavku na vyžádání (pro zaměstnance).
+
+Zaměstnanec (is_staff) přidá k URL ?_profil=1 (nebo hlavičku X-Profil: 1)
+a požadavek proběhne pod cProfile; ?_profil=sql navíc zaznamená všechny
+SQL dotazy s časy. Výsledek se uloží na disk do settings.PROFILOVANI_ADRESAR:
+- {id}.prof - pstats (snakeviz, flameprof, py-spy/speedscope přes převod...),
+- {id}.json - údaje o požadavku a zachycené SQL.
+Adresář je kruhový buffer - drží se nejvýš PROFILOVANI_MAX_PROFILU
+nejnovějších profilů, starší se mažou. Procházet je jde v adminu
+(/admin/profily/), id profilu vrací odpověď v hlavičce X-Profil-Id.
+
+Bez příznaku middleware jen zkontroluje GET a hlavičky, s
+PROFILOVANI_ZAPNUTO = False se do řetězce middleware vůbec nezařadí.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+PARAMETR = '_profil'
+HLAVICKA = 'X-Profil'
+S_SQL = 'sql'
+
+_ID = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+
+def _adresar():
+    return Path(settings.PROFILOVANI_ADRESAR)
+
+
+def _soubor(profil_id, pripona):
+    if not _ID.match(profil_id):
+        raise FileNotFoundError(profil_id)
+    return _adresar() / f'{profil_id}.{pripona}'
+
+
+class ZaznamSQL:
+    """execute_wrapper: SQL dotazy požadavku s časem v ms."""
+
+    def __init__(self):
+        self.dotazy = []
+
+    def __call__(self, execute, sql, params, many, context):
+        zacatek = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = round((time.perf_counter() - zacatek) * 1000, 3)
+            self.dotazy.append({'sql': sql, 'params': repr(params), 'ms': ms})
+
+
+# --- MIDDLEWARE ---
+
+class ProfilovaniMiddleware:
+    """Musí být za AuthenticationMiddleware (potřebuje request.user)."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILOVANI_ZAPNUTO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rezim = request.GET.get(PARAMETR) or request.headers.get(HLAVICKA)
+        if not rezim or not request.user.is_staff:
+            return self.get_response(request)
+        return self._profiluj(request, rezim)
+
+    def _profiluj(self, request, rezim):
+        zaznam = ZaznamSQL() if rezim == S_SQL else None
+        profiler = cProfile.Profile()
+        zacatek = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Jiný profiler už běží (souběžné profilování ve stejném vlákně) - požadavek jen obsloužíme
+            return self.get_response(request)
+        try:
+            if zaznam:
+                with connection.execute_wrapper(zaznam):
+                    odpoved = self.get_response(request)
+            else:
+                odpoved = self.get_response(request)
+        finally:
+            profiler.disable()
+        trvani = time.perf_counter() - zacatek
+
+        odpoved[f'{HLAVICKA}-Id'] = uloz(profiler, {
+            'cas': timezone.now().isoformat(),
+            'metoda': request.method,
+            'cesta': request.get_full_path(),
+            'pohled': request.resolver_match.view_name if request.resolver_match else None,
+            'status': odpoved.status_code,
+            'uzivatel_id': request.user.id,
+            'uzivatel': request.user.email,
+            'ms': round(trvani * 1000, 1),
+            'sql': zaznam.dotazy if zaznam else None,
+        })
+        return odpoved
+
+
+# --- ÚLOŽIŠTĚ (KRUHOVÝ BUFFER NA DISKU) ---
+
+def uloz(profiler, udaje):
+    """Uloží profil a údaje o požadavku, nejstarší profily nad limit smaže. Vrátí id."""
+    adresar = _adresar()
+    adresar.mkdir(parents=True, exist_ok=True)
+    # Id začíná časem (i mikrosekundami, hexadecimálně) - řazení podle jména = řazení podle stáří,
+    # i když vznikne víc profilů v jedné sekundě
+    ted = time.time()
+    profil_id = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(ted))}"
+                 f"-{int(ted % 1 * 1_000_000):05x}{uuid.uuid4().hex[:3]}")
+    profiler.dump_stats(_soubor(profil_id, 'prof'))
+    udaje['id'] = profil_id
+    _soubor(profil_id, 'json').write_text(json.dumps(udaje, ensure_ascii=False), encoding='utf-8')
+
+    for stary in _ids()[settings.PROFILOVANI_MAX_PROFILU:]:
+        for pripona in ('json', 'prof'):
+            # Souběžně může mazat jiný proces
+            _soubor(stary, pripona).unlink(missing_ok=True)
+    return profil_id
+
+
+def _ids():
+    """Id uložených profilů od nejnovějšího."""
+    if not _adresar().is_dir():
+        return []
+    return sorted((p.stem for p in _adresar().glob('*.json') if _ID.match(p.stem)), reverse=True)
+
+
+def seznam(uzivatel_id=None):
+    """Údaje o uložených profilech od nejnovějšího (volitelně jen jednoho uživatele), bez SQL."""
+    profily = []
+    for profil_id in _ids():
+        try:
+            udaje = nacti(profil_id)
+        except FileNotFoundError:
+            continue
+        if uzivatel_id is not None and udaje['uzivatel_id'] != uzivatel_id:
+            continue
+        sql = udaje.pop('sql')
+        udaje['pocet_sql'] = len(sql) if sql is not None else None
+        profily.append(udaje)
+    return profily
+
+
+def nacti(profil_id):
+    return json.loads(_soubor(profil_id, 'json').read_text(encoding='utf-8'))
+
+
+def cesta_prof(profil_id):
+    """Cesta k .prof souboru (FileNotFoundError, pokud neexistuje)."""
+    soubor = _soubor(profil_id, 'prof')
+    if not soubor.exists():
+        raise FileNotFoundError(profil_id)
+    return soubor
+
+
+RAZENI = ('cumulative', 'tottime', 'ncalls')
+
+
+def statistiky(profil_id, razeni='cumulative', limit=60):
+    """Textový výpis pstats - nejdražší funkce podle razeni."""
+    vystup = io.StringIO()
+    stats = pstats.Stats(str(cesta_prof(profil_id)), stream=vystup)
+    stats.strip_dirs().sort_stats(razeni if razeni in RAZENI else RAZENI[0]).print_stats(limit)
+    return vystup.getvalue()
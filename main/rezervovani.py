@@ -0,0 +1,220 @@
+"""
+Rezervace míst bez souběhů.
+
+Dřív rezervace_detail i zmenit_sedadlo zapisovaly letenky bez zámku a bez
+kontroly, takže dva zákazníci mohli dostat stejné sedadlo. Teď:
+- rezervace i všechny její letenky vznikají v jedné transakci,
+- nejdřív se zamknou dotčené řádky InventarLetu, vždy seřazené podle id
+  (dvě rezervace stejných letů na sebe počkají, ale nezablokují se navzájem);
+  zamyká se jen konkrétní třída na konkrétním letu, ne celý let nebo web,
+- pod zámkem se ověří sedadla; propadlé nezaplacené rezervace, které na
+  sedadle ještě leží, se uvolní hned,
+- poslední pojistkou je unikátní (id_letu, cislo_sedadla) v databázi
+  (Letenky.Meta) - chrání i zápisy mimo tento modul (admin),
+- když databáze transakci odmítne (deadlock, zamčená SQLite, souběžně vložené
+  sedadlo), zkusí se celá znovu (nejvýš settings.REZERVACE_OPAKOVANI krát).
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import InventarLetu, Letenky, Rezervace
+from . import obsazenost, mapa_sedadel
+
+class RezervaceError(Exception):
+    """Rezervaci (změnu) nelze provést - zpráva je pro zákazníka, nic se neuložilo."""
+
+
+class VyprodanoError(RezervaceError):
+    """Vybraná třída už nemá volné místo."""
+
+
+class SedadloObsazenoError(RezervaceError):
+    """Vybrané sedadlo má už někdo jiný."""
+
+
+def s_opakovanim(funkce):
+    """
+    Spustí transakci znovu, když ji databáze odmítne kvůli souběhu.
+    Uvnitř cizí transakce se neopakuje (rollback patří té vnější).
+    """
+    @wraps(funkce)
+    def obal(*args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            return funkce(*args, **kwargs)
+        opakovani = settings.REZERVACE_OPAKOVANI
+        for pokus in range(1, opakovani + 1):
+            try:
+                return funkce(*args, **kwargs)
+            except IntegrityError:
+                # Sedadlo obsadil někdo, kdo nečekal na náš zámek;
+                # napodruhé to kontrola sedadel pozná a ohlásí
+                if pokus == opakovani:
+                    raise SedadloObsazenoError("Sedadlo bylo právě obsazeno, vyberte prosím jiné.")
+            except OperationalError:
+                if pokus == opakovani:
+                    raise
+            # Náhodný odstup, aby se souběžné pokusy znovu nesrazily
+            time.sleep(random.uniform(0.01, 0.05) * pokus)
+    return obal
+
+
+def _zamkni_inventare(inventar_ids):
+    """Zamkne inventáře v pořadí podle id (jedním dotazem) a vrátí {id: inventář}."""
+    return (InventarLetu.objects
+            .select_for_update(of=('self',))
+            .select_related('id_letu', 'id_tridy')
+            .order_by('id')
+            .in_bulk(set(inventar_ids)))
+
+
+def _over_kabinu(inventar, sedadlo, mapa):
+    """Sedadlo musí existovat a patřit do kabiny vybrané třídy."""
+    kabina = mapa.kabina(sedadlo)
+    if kabina is None or kabina['inventar'] != inventar.id:
+        raise RezervaceError(f"Sedadlo {sedadlo} ve třídě {inventar.id_tridy} na letu "
+                             f"{inventar.id_letu.cislo_letu} neexistuje.")
+
+
+def _over_sedadla(sedadla, bez_letenky=None):
+    """
+    sedadla: [(id_letu, cislo_sedadla)]. Pokud je některé obsazené, vyhodí
+    SedadloObsazenoError; sedadla propadlých rezervací rovnou uvolní.
+    Volá se pod zámkem inventářů, takže výsledek platí až do commitu.
+    """
+    podminka = Q()
+    for let_id, sedadlo in sedadla:
+        podminka |= Q(id_letu_id=let_id, cislo_sedadla=sedadlo)
+    obsazena = Letenky.objects.filter(podminka)
+    if bez_letenky is not None:
+        obsazena = obsazena.exclude(id=bez_letenky)
+
+    ted = timezone.now()
+    propadle_lety = set()
+    for let_id, sedadlo, stav, expirace in obsazena.values_list(
+            'id_letu_id', 'cislo_sedadla', 'id_rezervace__status_platby', 'id_rezervace__expirace'):
+        if stav == obsazenost.STAV_DRZENO and expirace is not None and expirace < ted:
+            propadle_lety.add(let_id)
+        else:
+            raise SedadloObsazenoError(f"Sedadlo {sedadlo} je už obsazené, vyberte prosím jiné.")
+
+    for let_id in propadle_lety:
+        obsazenost.uvolni_propadle(let_id=let_id)
+
+
+@s_opakovanim
+def rezervuj(uzivatel, polozky):
+    """
+    Vytvoří nezaplacenou rezervaci s letenkami.
+    polozky: [(id_letu, id_inventare, cislo_sedadla)] - jedna za každý let.
+    Vrátí Rezervace, jinak vyhodí RezervaceError a neuloží nic.
+    """
+    try:
+        polozky = [(int(let_id), int(inventar_id), sedadlo) for let_id, inventar_id, sedadlo in polozky]
+    except (TypeError, ValueError):
+        raise RezervaceError("Vyberte prosím třídu pro každý let.")
+    if not all(sedadlo for _, _, sedadlo in polozky):
+        raise RezervaceError("Vyberte prosím sedadlo pro každý let.")
+
+    let_ids = [let_id for let_id, _, _ in polozky]
+    if len(set(let_ids)) != len(let_ids):
+        raise RezervaceError("Každý let může být v rezervaci jen jednou.")
+
+    # Počet dotazů nezávisí na počtu letů: vše se načítá a zapisuje hromadně
+    with transaction.atomic():
+        # 1. Zámky (deterministické pořadí) a kontrola výběru
+        inventare = _zamkni_inventare(inventar_id for _, inventar_id, _ in polozky)
+        mapy = mapa_sedadel.mapy_letu(let_ids)
+        for let_id, inventar_id, sedadlo in polozky:
+            inventar = inventare.get(inventar_id)
+            if inventar is None or inventar.id_letu_id != let_id:
+                raise RezervaceError("Vybraná třída na tomto letu neexistuje.")
+            _over_kabinu(inventar, sedadlo, mapy[let_id])
+        _over_sedadla([(let_id, sedadlo) for let_id, _, sedadlo in polozky])
+
+        # 2. Místa v počítadlech - jeden podmíněný UPDATE pro všechny lety
+        # (nelze prodat víc, než je kapacita)
+        vyprodane = obsazenost.zaber_mista(inventar_id for _, inventar_id, _ in polozky)
+        if vyprodane:
+            inventar = inventare[vyprodane[0]]
+            raise VyprodanoError(f"Třída {inventar.id_tridy} na letu "
+                                 f"{inventar.id_letu.cislo_letu} je už vyprodaná.")
+
+        # 3. Rezervace (celková cena předem) a všechny letenky jedním INSERT
+        rezervace = Rezervace.objects.create(
+            celkova_cena=sum(inventare[inventar_id].cena for _, inventar_id, _ in polozky),
+            status_platby=obsazenost.STAV_DRZENO,
+            id_uzivatele=uzivatel,
+        )
+        Letenky.objects.bulk_create([
+            Letenky(
+                cislo_sedadla=sedadlo,
+                cena_letenky=inventare[inventar_id].cena,
+                id_rezervace=rezervace,
+                id_letu_id=let_id,
+                id_tridy_id=inventare[inventar_id].id_tridy_id,
+            )
+            for let_id, inventar_id, sedadlo in polozky
+        ])
+        # bulk_create neposílá signály - mapy sedadel zneplatníme sami
+        transaction.on_commit(lambda: mapa_sedadel.zneplatni(let_ids))
+    return rezervace
+
+
+@s_opakovanim
+def zmen_letenku(letenka, sedadlo, inventar_id=None):
+    """
+    Změní sedadlo letenky a případně i třídu (inventar_id; None = stejná třída).
+    Při změně třídy se místo v nové třídě zabere a ve staré uvolní.
+    """
+    if not sedadlo:
+        raise RezervaceError("Vyberte prosím sedadlo.")
+    try:
+        inventar_id = int(inventar_id) if inventar_id is not None else None
+    except (TypeError, ValueError):
+        raise RezervaceError("Vyberte prosím třídu.")
+
+    with transaction.atomic():
+        # Stará i nová třída letu, obě zamčené v pořadí podle id
+        zamknout = InventarLetu.objects.filter(id_letu_id=letenka.id_letu_id, id_tridy_id=letenka.id_tridy_id)
+        if inventar_id is not None:
+            zamknout = zamknout | InventarLetu.objects.filter(id=inventar_id, id_letu_id=letenka.id_letu_id)
+        inventare = _zamkni_inventare(zamknout.values_list('id', flat=True))
+
+        if inventar_id is None:
+            inventar = next((inv for inv in inventare.values() if inv.id_tridy_id == letenka.id_tridy_id), None)
+        else:
+            inventar = inventare.get(inventar_id)
+        if inventar is None:
+            raise RezervaceError("Vybraná třída na tomto letu neexistuje.")
+
+        letenka = Letenky.objects.select_related('id_rezervace').get(pk=letenka.pk)
+        # Při změně třídy musí i ponechané sedadlo ležet v kabině nové třídy
+        if sedadlo != letenka.cislo_sedadla or inventar.id_tridy_id != letenka.id_tridy_id:
+            _over_kabinu(inventar, sedadlo, mapa_sedadel.mapa_letu(letenka.id_letu_id))
+        if sedadlo != letenka.cislo_sedadla:
+            _over_sedadla([(letenka.id_letu_id, sedadlo)], bez_letenky=letenka.id)
+
+        if inventar.id_tridy_id != letenka.id_tridy_id:
+            stav = letenka.id_rezervace.status_platby
+            if not obsazenost.zaber_misto(inventar.id, stav):
+                raise VyprodanoError(f"Třída {inventar.id_tridy} je už vyprodaná.")
+            obsazenost.uvolni_misto(letenka.id_letu_id, letenka.id_tridy_id, stav)
+            letenka.id_tridy_id = inventar.id_tridy_id
+        if inventar_id is not None:
+            # Výběr třídy (upravit_letenku) - platí aktuální cena třídy
+            letenka.cena_letenky = inventar.cena
+
+        letenka.cislo_sedadla = sedadlo
+        letenka.save()
+
+        # Přepočet ceny rezervace
+        rezervace = letenka.id_rezervace
+        rezervace.celkova_cena = rezervace.letenky_set.aggregate(celkem=Sum('cena_letenky'))['celkem']
+        rezervace.save(update_fields=['celkova_cena'])
+    return letenka
@@ -1,8 +1,12 @@
 from django.contrib.auth.signals import user_logged_in
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.utils import timezone
 # Importujeme přímo třídu RoleUzivatel
-from .models import RoleUzivatel
+from .models import Role, RoleUzivatel, Uzivatele, Lety, Letiste, Letadla, InventarLetu, Letenky, TridySedadel
+from . import index_letu, index_letist, cache_vyhledavani, mapa_sedadel, opravneni, data_aerolinky, pomale_dotazy
 
 # Seznam rolí, které opravňují ke vstupu do Adminu
 # (Pilot a Průvodčí zde záměrně chybí - ti do adminu nesmí)
@@ -28,17 +32,8 @@ def aktualizuj_pristup_do_adminu(sender, user, request, **kwargs):
     if user.is_superuser:
         return
 
-    # 2. KONTROLA ROLÍ
-    # Používáme přímo 'RoleUzivatel' (ne 'models.RoleUzivatel')
-    ma_platnou_roli = (RoleUzivatel.objects.filter(
-        id_uzivatele=user,
-        id_role__nazev_role__in=ZAMESTNANECKE_ROLE,
-        plati_do__gte=timezone.now()
-    ).exists() | RoleUzivatel.objects.filter(
-        id_uzivatele=user,
-        id_role__nazev_role__in=ZAMESTNANECKE_ROLE,
-        plati_do__isnull=True
-    ).exists())
+    # 2. KONTROLA ROLÍ (jeden dotaz, viz opravneni.py)
+    ma_platnou_roli = opravneni.ma_platnou_roli(user, ZAMESTNANECKE_ROLE)
 
     # 3. PŘIDĚLENÍ / ODEBRÁNÍ PRÁV
     if ma_platnou_roli:
@@ -54,3 +49,157 @@ def aktualizuj_pristup_do_adminu(sender, user, request, **kwargs):
             user.save()
             print(f"Uživatel {user.email} ztratil přístup do adminu (nemá platnou roli).")
 
+
+# --- INDEX LETŮ PRO VYHLEDÁVÁNÍ ---
+
+@receiver(post_save, sender=Lety)
+@receiver(post_delete, sender=Lety)
+def aktualizuj_index_letu(sender, instance, **kwargs):
+    """
+    Při vytvoření, úpravě nebo smazání letu aktualizujeme paměťový index
+    (a zvýšíme sdílenou verzi, aby si toho všimly ostatní procesy).
+    """
+    index_letu.let_zmenen(instance.id)
+
+
+@receiver(post_save, sender=Letiste)
+@receiver(post_delete, sender=Letiste)
+def aktualizuj_index_letist(sender, instance, **kwargs):
+    """
+    Změna letiště - index pro našeptávač se načte znovu (ve všech procesech).
+    """
+    index_letist.letiste_zmeneno()
+
+
+# --- ZNEPLATNĚNÍ CACHE VYHLEDÁVÁNÍ ---
+
+def _zneplatni_po_commitu(letiste_ids):
+    letiste_ids = set(letiste_ids)
+    transaction.on_commit(lambda: cache_vyhledavani.zneplatni_letiste(letiste_ids))
+
+
+@receiver(pre_save, sender=Lety)
+def zapamatuj_puvodni_letiste(sender, instance, **kwargs):
+    """
+    Před úpravou letu si zapamatujeme jeho původní letiště - pokud se trasa
+    změní, musíme zneplatnit výsledky pro staré i nové letiště.
+    """
+    instance._puvodni_letiste = index_letu.letiste_letu(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Lety)
+@receiver(post_delete, sender=Lety)
+def zneplatni_vyhledavani_letu(sender, instance, **kwargs):
+    letiste_ids = {instance.id_letiste_odletu_id, instance.id_letiste_priletu_id}
+    letiste_ids.update(getattr(instance, '_puvodni_letiste', None) or ())
+    _zneplatni_po_commitu(letiste_ids)
+
+
+# --- MAPY SEDADEL ---
+
+def _zneplatni_mapy_po_commitu(let_ids):
+    let_ids = set(let_ids)
+    if let_ids:
+        transaction.on_commit(lambda: mapa_sedadel.zneplatni(let_ids))
+
+
+@receiver(post_save, sender=Letenky)
+@receiver(post_delete, sender=Letenky)
+@receiver(post_save, sender=InventarLetu)
+@receiver(post_delete, sender=InventarLetu)
+def zneplatni_mapu_sedadel(sender, instance, **kwargs):
+    """
+    Změna letenky (obsazenost) nebo inventáře (kabiny) mění mapu sedadel letu.
+    """
+    _zneplatni_mapy_po_commitu([instance.id_letu_id])
+
+
+@receiver(post_save, sender=Lety)
+def zneplatni_mapu_letu(sender, instance, created, **kwargs):
+    # Let mohl dostat jiné letadlo
+    if not created:
+        _zneplatni_mapy_po_commitu([instance.id])
+
+
+@receiver(post_save, sender=Letadla)
+def zneplatni_mapy_letadla(sender, instance, created, **kwargs):
+    # Změna rozložení sedadel - týká se všech letů tohoto letadla
+    if not created:
+        _zneplatni_mapy_po_commitu(Lety.objects.filter(id_letadla=instance).values_list('id', flat=True))
+
+
+# --- PLATNÉ ROLE (cache v opravneni.py) ---
+
+@receiver(post_save, sender=RoleUzivatel)
+@receiver(post_delete, sender=RoleUzivatel)
+def zneplatni_role_uzivatele(sender, instance, **kwargs):
+    opravneni.zneplatni([instance.id_uzivatele_id])
+    data_aerolinky.zmena_posadky([instance.id_uzivatele_id])
+
+
+@receiver(m2m_changed, sender=Uzivatele.role.through)
+def zneplatni_role_pres_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    # user.role.add(...) / role.uzivatele.clear() neposílají post_save
+    if not reverse:
+        uzivatel_ids = [instance.pk] if action.startswith('post_') else []
+    elif action == 'pre_clear':
+        # Po clear() už nevíme, koho se týkal
+        uzivatel_ids = list(instance.uzivatele.values_list('pk', flat=True))
+    elif action.startswith('post_') and pk_set:
+        uzivatel_ids = list(pk_set)
+    else:
+        return
+    opravneni.zneplatni(uzivatel_ids)
+    data_aerolinky.zmena_posadky(uzivatel_ids)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def zneplatni_nazvy_roli(sender, **kwargs):
+    opravneni.zneplatni_nazvy()
+
+
+# --- DATA PRO SPRÁVU LETŮ (verze v data_aerolinky.py) ---
+
+ZDROJ_DAT_AEROLINKY = {
+    Letadla: data_aerolinky.LETADLA,
+    Uzivatele: data_aerolinky.POSADKA,
+    TridySedadel: data_aerolinky.TRIDY,
+}
+
+# Pole uživatele, která správa letů zobrazuje (přihlášení mění jen last_login)
+POLE_POSADKY = {'first_name', 'last_name', 'email', 'id_aerolinky'}
+
+
+@receiver(pre_save, sender=Letadla)
+@receiver(pre_save, sender=Uzivatele)
+@receiver(pre_save, sender=TridySedadel)
+def zapamatuj_puvodni_aerolinku(sender, instance, update_fields=None, **kwargs):
+    # Přesun pod jinou aerolinku mění data staré i nové aerolinky
+    if instance.pk and (update_fields is None or 'id_aerolinky' in update_fields):
+        instance._puvodni_aerolinka = (sender.objects.filter(pk=instance.pk)
+                                       .values_list('id_aerolinky_id', flat=True).first())
+
+
+@receiver(post_save, sender=Letadla)
+@receiver(post_save, sender=Uzivatele)
+@receiver(post_save, sender=TridySedadel)
+@receiver(post_delete, sender=Letadla)
+@receiver(post_delete, sender=Uzivatele)
+@receiver(post_delete, sender=TridySedadel)
+def zmena_dat_aerolinky(sender, instance, update_fields=None, **kwargs):
+    if sender is Uzivatele and update_fields is not None and not POLE_POSADKY & set(update_fields):
+        return
+    aerolinky = {instance.id_aerolinky_id}
+    if hasattr(instance, '_puvodni_aerolinka'):
+        aerolinky.add(instance._puvodni_aerolinka)
+    data_aerolinky.zmena(ZDROJ_DAT_AEROLINKY[sender], aerolinky)
+
+
+# --- POMALÉ DOTAZY ---
+
+@receiver(connection_created)
+def sleduj_pomale_dotazy(sender, connection, **kwargs):
+    """Každé spojení měří dotazy a pomalé zaznamená (viz pomale_dotazy.py)."""
+    if settings.POMALE_DOTAZY_PRAH_MS is not None and pomale_dotazy.sleduj not in connection.execute_wrappers:
+        connection.execute_wrappers.append(pomale_dotazy.sleduj)
@@ -0,0 +1,120 @@
+"""
+Uložení letu ze správy letů (management_novy_let) - let, posádka a inventář
+v jedné transakci.
+
+Dřív se při úpravě letu smazal celý inventář a vytvořil znovu po jednom
+create(): třídy dostávaly nová id, obešla se kontrola kapacity
+(InventarLetu.clean) a chyba uprostřed nechala let napůl uložený. Teď:
+- vše proběhne v transakci, inventáře letu jsou po dobu úpravy zamčené
+  (souběžná rezervace počká a počítadla obsazenosti zůstanou platná),
+- inventář se porovná s formulářem: nové třídy jedním bulk_create, změněné
+  jedním bulk_update, odebrané se smažou - ale jen pokud na ně není prodaná
+  žádná letenka,
+- kapacita letadla se ověří jednou pro celý let v paměti,
+- posádka se mění přes posadka.set(), které přidá a odebere jen rozdíl.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import InventarLetu, Letadla, Letenky, Lety
+from . import mapa_sedadel
+
+
+class SpravaLetuError(Exception):
+    """Let nelze uložit - zpráva je pro správce, nic se neuložilo."""
+
+
+def inventar_z_formulare(post):
+    """
+    Řádky inventáře z formuláře (inv_trida_N, inv_pocet_N, inv_cena_N):
+    {id_tridy: (pocet_mist, cena)}.
+    """
+    inventar = {}
+    for key in post:
+        if not key.startswith('inv_trida_'):
+            continue
+        index = key.split('_')[-1]
+        try:
+            trida_id = int(post.get(f'inv_trida_{index}'))
+            pocet = int(post.get(f'inv_pocet_{index}'))
+            cena = Decimal(post.get(f'inv_cena_{index}'))
+        except (TypeError, ValueError, InvalidOperation):
+            raise SpravaLetuError("Vyplňte prosím u každé třídy počet míst a cenu.")
+        if pocet < 0 or cena < 0:
+            raise SpravaLetuError("Počet míst ani cena nesmí být záporné.")
+        if trida_id in inventar:
+            raise SpravaLetuError("Každá třída může být v inventáři letu jen jednou.")
+        inventar[trida_id] = (pocet, cena)
+    return inventar
+
+
+def _over_kapacitu(letadlo_id, inventar):
+    kapacita = None
+    if letadlo_id:
+        kapacita = Letadla.objects.filter(pk=letadlo_id).values_list('kapacita_sedadel', flat=True).first()
+    if kapacita is None:
+        raise SpravaLetuError("Vyberte prosím letadlo.")
+    celkem = sum(pocet for pocet, _ in inventar.values())
+    if celkem > kapacita:
+        raise SpravaLetuError(f"Nelze uložit! Překročena kapacita letadla ({kapacita} míst). "
+                              f"Třídy dohromady nabízejí {celkem} míst.")
+
+
+def _uloz_inventar(let, inventar):
+    """Porovná inventář letu s formulářem a zapíše jen rozdíl."""
+    # Zámky v pořadí podle id jako rezervovani._zamkni_inventare - jinak by souběžná
+    # rezervace více tříd téhož letu mohla skončit deadlockem
+    stavajici = {inv.id_tridy_id: inv
+                 for inv in (InventarLetu.objects.select_for_update(of=('self',))
+                              .filter(id_letu=let).select_related('id_tridy').order_by('id'))}
+
+    odebrane = [inv for trida_id, inv in stavajici.items() if trida_id not in inventar]
+    if odebrane:
+        prodane = (Letenky.objects.filter(id_letu=let, id_tridy__in=[inv.id_tridy_id for inv in odebrane])
+                   .values_list('id_tridy__nazev_tridy').annotate(pocet=Count('id')))
+        prodane = [f"{nazev} ({pocet})" for nazev, pocet in prodane]
+        if prodane:
+            raise SpravaLetuError(f"Třídu nelze odebrat, má prodané letenky: {', '.join(prodane)}.")
+        InventarLetu.objects.filter(pk__in=[inv.pk for inv in odebrane]).delete()
+
+    nove, zmenene = [], []
+    for trida_id, (pocet, cena) in inventar.items():
+        inv = stavajici.get(trida_id)
+        if inv is None:
+            nove.append(InventarLetu(id_letu=let, id_tridy_id=trida_id, pocet_mist_k_prodeji=pocet, cena=cena))
+        elif (inv.pocet_mist_k_prodeji, inv.cena) != (pocet, cena):
+            if pocet < inv.prodano + inv.drzeno:
+                raise SpravaLetuError(f"Třída {inv.id_tridy} má už {inv.prodano + inv.drzeno} prodaných "
+                                      f"nebo držených míst, nelze ji snížit na {pocet}.")
+            inv.pocet_mist_k_prodeji, inv.cena = pocet, cena
+            zmenene.append(inv)
+
+    # bulk_create nevolá save() - kabiny (prefixy sedadel) přidělíme sami, nejlevnější třída dřív
+    nove.sort(key=lambda inv: inv.cena)
+    InventarLetu.pridel_kabiny(nove)
+    InventarLetu.objects.bulk_create(nove)
+    InventarLetu.objects.bulk_update(zmenene, ['pocet_mist_k_prodeji', 'cena'])
+    if nove or zmenene:
+        # bulk operace neposílají signály - kabiny v mapě sedadel zneplatníme sami
+        transaction.on_commit(lambda: mapa_sedadel.zneplatni([let.id]))
+
+
+def uloz_let(let, udaje, posadka_ids, inventar):
+    """
+    Vytvoří (let=None) nebo upraví let, jeho posádku a inventář - vše, nebo nic.
+    udaje: pole letu ({'cislo_letu': ..., 'id_letadla_id': ...}),
+    inventar: {id_tridy: (pocet_mist, cena)} (viz inventar_z_formulare).
+    """
+    _over_kapacitu(udaje.get('id_letadla_id'), inventar)
+    with transaction.atomic():
+        if let is None:
+            let = Lety.objects.create(**udaje)
+        else:
+            for key, value in udaje.items():
+                setattr(let, key, value)
+            let.save()
+        let.posadka.set(posadka_ids)
+        _uloz_inventar(let, inventar)
+    return let
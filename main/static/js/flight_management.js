@@ -6,13 +6,14 @@ document.addEventListener("DOMContentLoaded", function() {
         piloti: [],
         pruvodci: [],
         tridy: [],
-        existujiciLety: [] // Jen {id, cislo, cas} pro našeptávač
+        nalezeneLety: [] // Poslední výsledky našeptávače čísla letu {id, cislo_letu, cas_odletu}
     };
 
     const state = {
         selectedAirlineId: null,
         currentCapacity: 0,
-        editingFlightId: null
+        editingFlightId: null,
+        editingCislo: null
     };
 
     // ELEMENTY
@@ -86,23 +87,40 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 
     // --- 2. FETCH DAT AEROLINKY ---
+    // Každý zdroj má vlastní verzi; při návratu k aerolince se posílá ?since=
+    // a server při shodě vrátí jen {zmeneno: false}. Prohlížeč navíc sám
+    // ověřuje ETag (If-None-Match -> 304).
+    const ZDROJE = {letadla: 'aircraft', posadka: 'crew', tridy: 'classes'};
+    const CACHE_ZDROJU = {}; // {"aid:zdroj": {verze, data}}
+
+    async function fetchZdroj(aid, zdroj) {
+        const klic = `${aid}:${zdroj}`;
+        const ulozeno = CACHE_ZDROJU[klic];
+        const since = ulozeno ? `&since=${encodeURIComponent(ulozeno.verze)}` : '';
+        const res = await fetch(`/api/airline-data/${ZDROJE[zdroj]}/?airline_id=${aid}${since}`);
+        const d = await res.json();
+        if(d.error) throw new Error(d.error);
+        if(d.zmeneno) CACHE_ZDROJU[klic] = {verze: d.verze, data: d[zdroj]};
+        return CACHE_ZDROJU[klic].data;
+    }
+
     async function fetchAirlineData(aid) {
         state.selectedAirlineId = parseInt(aid);
         document.body.style.cursor = 'wait';
         try {
-            const res = await fetch(`/api/load-airline-data/?airline_id=${aid}`);
-            const d = await res.json();
-            if(d.error) { alert(d.error); return; }
+            const [letadla, posadka, tridy] = await Promise.all([
+                fetchZdroj(aid, 'letadla'), fetchZdroj(aid, 'posadka'), fetchZdroj(aid, 'tridy')
+            ]);
 
             // Uložení do STORE
-            STORE.letadla = d.letadla;
-            STORE.piloti = d.piloti;
-            STORE.pruvodci = d.pruvodci;
-            STORE.tridy = d.tridy;
-            STORE.existujiciLety = d.existujici_lety;
+            STORE.letadla = letadla;
+            STORE.piloti = posadka.piloti;
+            STORE.pruvodci = posadka.pruvodci;
+            STORE.tridy = tridy;
+            STORE.nalezeneLety = [];
 
             renderForms();
-        } catch(e) { console.error(e); alert("Chyba při načítání dat."); }
+        } catch(e) { console.error(e); alert(e.message || "Chyba při načítání dat."); }
         finally { document.body.style.cursor = 'default'; }
     }
 
@@ -128,80 +146,102 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 
     // --- 3. NAČTENÍ LETU (EDITACE + KONTROLA) ---
-    els.inpCislo.addEventListener('input', function() {
+    // Lety hledá server podle začátku čísla (viz /api/flights/search/),
+    // dotaz odchází až po krátké pauze v psaní
+    let casovacLetu = null;
+    let posledniDotazLetu = 0;
+
+    function zobrazStavCisla(existuje) {
+        if (!els.statCislo) return; // Pojistka kdyby element neexistoval
+        if (existuje) {
+            els.statCislo.innerText = "❌ Už existuje";
+            els.statCislo.style.color = "red";
+        } else if (state.editingFlightId && els.inpCislo.value.trim().toUpperCase() === state.editingCislo) {
+            // Pokud editujeme tento let, je to OK
+            els.statCislo.innerText = "✅ Aktuální";
+            els.statCislo.style.color = "green";
+        } else {
+            els.statCislo.innerText = "✅ Volné";
+            els.statCislo.style.color = "green";
+        }
+    }
+
+    els.inpCislo.addEventListener('input', function(e) {
         const val = this.value.trim().toUpperCase();
+        const otevritNabidku = !e.detail || !e.detail.bezNabidky;
 
         // Reset
+        clearTimeout(casovacLetu);
         els.sugBoxLet.innerHTML = '';
-        if (els.statCislo) els.statCislo.innerText = ''; // Pojistka kdyby element neexistoval
+        if (els.statCislo) els.statCislo.innerText = '';
 
-        if(val.length < 1) {
+        if(val.length < 1 || !state.selectedAirlineId) {
             els.sugBoxLet.style.display='none';
+            STORE.nalezeneLety = [];
             return;
         }
 
-        // 1. Kontrola existence (Barevný nápis)
-        const exactMatch = STORE.existujiciLety.find(l => l.cislo_letu.toUpperCase() === val);
-
-        if (els.statCislo) {
-            if (exactMatch) {
-                // Pokud editujeme tento let, je to OK
-                if (state.editingFlightId && parseInt(state.editingFlightId) === exactMatch.id) {
-                    els.statCislo.innerText = "✅ Aktuální";
-                    els.statCislo.style.color = "green";
+        casovacLetu = setTimeout(async () => {
+            const cislo = ++posledniDotazLetu;
+            const bez = state.editingFlightId ? `&bez=${state.editingFlightId}` : '';
+            try {
+                const res = await fetch(`/api/flights/search/?airline_id=${state.selectedAirlineId}&q=${encodeURIComponent(val)}${bez}`);
+                const d = await res.json();
+                if(cislo !== posledniDotazLetu) return; // Odpověď na starší dotaz
+                if(d.error) { console.error(d.error); return; }
+                STORE.nalezeneLety = d.lety;
+
+                // 1. Kontrola existence (Barevný nápis)
+                zobrazStavCisla(d.existuje);
+
+                // 2. Našeptávač
+                els.sugBoxLet.innerHTML = '';
+                if(d.lety.length > 0 && otevritNabidku) {
+                    els.sugBoxLet.style.display = 'block';
+                    d.lety.forEach(l => {
+                        const div = document.createElement('div');
+                        div.className = 'suggestion-item';
+                        div.innerText = `${l.cislo_letu} (${new Date(l.cas_odletu).toLocaleDateString()})`;
+                        div.addEventListener('click', () => {
+                            // 1. Vyplníme text
+                            els.inpCislo.value = l.cislo_letu;
+
+                            // 2. Skryjeme nabídku
+                            els.sugBoxLet.style.display = 'none';
+
+                            // 3. Načteme právě vybraný let (stejné číslo může mít víc letů)
+                            nactiLet(l.id);
+                        });
+                        els.sugBoxLet.appendChild(div);
+                    });
                 } else {
-                    els.statCislo.innerText = "❌ Už existuje";
-                    els.statCislo.style.color = "red";
+                    els.sugBoxLet.style.display='none';
                 }
-            } else {
-                els.statCislo.innerText = "✅ Volné";
-                els.statCislo.style.color = "green";
-            }
-        }
-
-        // 2. Našeptávač
-        const matches = STORE.existujiciLety.filter(l => l.cislo_letu.toUpperCase().includes(val));
-        if(matches.length > 0) {
-            els.sugBoxLet.style.display = 'block';
-            matches.forEach(l => {
-                const d = document.createElement('div');
-                d.className = 'suggestion-item';
-                d.innerText = `${l.cislo_letu} (${new Date(l.cas_odletu).toLocaleDateString()})`;
-                d.addEventListener('click', () => {
-                    // 1. Vyplníme text
-                    els.inpCislo.value = l.cislo_letu;
-
-                    // 2. Skryjeme nabídku
-                    els.sugBoxLet.style.display = 'none';
-
-                    // 3. AUTOMATICKY KLIKNEME NA TLAČÍTKO "NAČÍST LET"
-                    // To zajistí načtení dat a přepnutí stavu na "Aktuální"
-                    els.btnLoadFlight.click();
-                });
-                els.sugBoxLet.appendChild(d);
-            });
-        } else {
-            els.sugBoxLet.style.display='none';
-        }
+            } catch(err) { console.error(err); }
+        }, 250);
     });
 
-    els.btnLoadFlight.addEventListener('click', async () => {
-        const cislo = els.inpCislo.value;
-        const found = STORE.existujiciLety.find(l => l.cislo_letu === cislo);
-        if(!found) { alert("Let nenalezen!"); return; }
-
+    async function nactiLet(id) {
         try {
-            const res = await fetch(`/api/load-flight-detail/?flight_id=${found.id}`);
+            const res = await fetch(`/api/load-flight-detail/?flight_id=${id}`);
             const flight = await res.json();
             if(flight.error) { alert(flight.error); return; }
 
             fillFlightForm(flight);
         } catch(e) { alert("Chyba při načítání detailu letu."); }
+    }
+
+    els.btnLoadFlight.addEventListener('click', () => {
+        const cislo = els.inpCislo.value.trim().toUpperCase();
+        const found = STORE.nalezeneLety.find(l => l.cislo_letu === cislo);
+        if(!found) { alert("Let nenalezen!"); return; }
+        nactiLet(found.id);
     });
 
     function fillFlightForm(f) {
         document.getElementById('flight-id').value = f.id;
         state.editingFlightId = f.id;
+        state.editingCislo = f.cislo_letu.toUpperCase();
 
         // Zobrazit delete tlačítko
         els.btnDelete.style.display = 'block';
@@ -226,11 +266,8 @@ document.addEventListener("DOMContentLoaded", function() {
         els.contInv.innerHTML = '';
         f.inventar.forEach(i => addInventoryRow(i.id_tridy, i.pocet_mist_k_prodeji, i.cena));
 
-        // Spustíme ručně událost 'input', aby se přepočítal status "Už existuje" -> "Aktuální"
-        els.inpCislo.dispatchEvent(new Event('input'));
-
-        // --- NOVÝ ŘÁDEK: OKAMŽITĚ ZAVŘÍT NAŠEPTVÁČ ---
-        // Protože ten dispatchEvent o řádek výše ho omylem znovu otevřel
+        // Přepočítáme status "Už existuje" -> "Aktuální" (bez otevření našeptávače)
+        els.inpCislo.dispatchEvent(new CustomEvent('input', {detail: {bezNabidky: true}}));
         els.sugBoxLet.style.display = 'none';
     }
 
@@ -283,32 +320,41 @@ document.addEventListener("DOMContentLoaded", function() {
 
     // --- POMOCNÉ FUNKCE (Autocomplete, DualList, Inventar) ---
 
-    // Autocomplete (vylepšeno o zemi)
+    // Autocomplete (letiště hledá server, viz /api/airports/)
     function setupAC(inp, box, hid) {
+        let casovac = null;
+        let posledniDotaz = 0;
+
         inp.addEventListener('input', function() {
-            const val = this.value.toLowerCase();
-            box.innerHTML = '';
-            if(val.length < 2) { box.style.display='none'; return; }
-            const matches = DATA.letiste.filter(l =>
-                l.nazev_letiste.toLowerCase().includes(val) ||
-                l.mesto.toLowerCase().includes(val) ||
-                l.kod_iata.toLowerCase().includes(val) ||
-                l.zeme.toLowerCase().includes(val)
-            );
-            if(matches.length>0) {
-                box.style.display = 'block';
-                matches.forEach(l => {
-                    const d = document.createElement('div');
-                    d.className = 'suggestion-item';
-                    d.innerText = `${l.nazev_letiste} (${l.kod_iata}), ${l.mesto}, ${l.zeme}`;
-                    d.addEventListener('click', () => {
-                        inp.value = `${l.mesto} (${l.kod_iata})`;
-                        hid.value = l.id;
-                        box.style.display = 'none';
-                    });
-                    box.appendChild(d);
-                });
-            } else box.style.display='none';
+            const val = this.value.trim();
+            clearTimeout(casovac);
+            if(val.length < 2) { box.innerHTML = ''; box.style.display='none'; return; }
+
+            casovac = setTimeout(async () => {
+                const cislo = ++posledniDotaz;
+                try {
+                    const res = await fetch(`/api/airports/?q=${encodeURIComponent(val)}`);
+                    const data = await res.json();
+                    if(cislo !== posledniDotaz) return; // Odpověď na starší dotaz
+                    const matches = data.letiste || [];
+
+                    box.innerHTML = '';
+                    if(matches.length>0) {
+                        box.style.display = 'block';
+                        matches.forEach(l => {
+                            const d = document.createElement('div');
+                            d.className = 'suggestion-item';
+                            d.innerText = `${l.nazev_letiste} (${l.kod_iata}), ${l.mesto}, ${l.zeme}`;
+                            d.addEventListener('click', () => {
+                                inp.value = `${l.mesto} (${l.kod_iata})`;
+                                hid.value = l.id;
+                                box.style.display = 'none';
+                            });
+                            box.appendChild(d);
+                        });
+                    } else box.style.display='none';
+                } catch(e) { box.style.display='none'; }
+            }, 150);
         });
         document.addEventListener('click', e => { if(e.target!==inp) box.style.display='none'; });
     }
@@ -0,0 +1,63 @@
+/**
+ * Mapa sedadel letu - vykreslení do <select>.
+ *
+ * Data posílá server (main/mapa_sedadel.py, MapaSedadel.payload):
+ *   pismena  - sedadla v řadě ("ABCDEF")
+ *   kabiny   - [{inventar, trida, prefix, pocet, od}] seřazené podle prefixu
+ *   obsazeno - bitová mapa obsazených sedadel celého letu (base64)
+ * Sedadlo s indexem i (od začátku kabiny) má kód prefix + řada + písmeno,
+ * obsazenost je bit (kabina.od + i). Obsazenost se tak zjistí v O(1)
+ * a celá kabina se vykreslí v lineárním čase.
+ */
+
+function nactiMapuSedadel(json) {
+    const data = JSON.parse(json);
+    // base64 dekódujeme jen jednou
+    const binarni = atob(data.obsazeno);
+    data.bity = new Uint8Array(binarni.length);
+    for (let i = 0; i < binarni.length; i++) {
+        data.bity[i] = binarni.charCodeAt(i);
+    }
+    return data;
+}
+
+function jeSedadloObsazene(mapa, index) {
+    return (mapa.bity[index >> 3] & (1 << (index & 7))) !== 0;
+}
+
+function najdiKabinu(mapa, pole, hodnota) {
+    return mapa.kabiny.find(k => String(k[pole]) === String(hodnota));
+}
+
+/**
+ * Naplní selectBox sedadly kabiny. Sedadlo 'aktualniSedadlo' (moje vlastní)
+ * se nabídne jako vybrané, i když je v mapě obsazené.
+ */
+function vykresliSedadla(selectBox, mapa, kabina, aktualniSedadlo) {
+    selectBox.innerHTML = '<option value="">-- Vyberte sedadlo --</option>';
+    selectBox.disabled = false;
+    if (!kabina) {
+        return;
+    }
+
+    const pismena = mapa.pismena;
+    const fragment = document.createDocumentFragment();
+
+    for (let i = 0; i < kabina.pocet; i++) {
+        const seatCode = kabina.prefix + (Math.floor(i / pismena.length) + 1) + pismena[i % pismena.length];
+        const option = document.createElement('option');
+        option.value = seatCode;
+
+        if (seatCode === aktualniSedadlo) {
+            option.text = "🔵 " + seatCode + " (Vaše aktuální)";
+            option.selected = true;
+        } else if (jeSedadloObsazene(mapa, kabina.od + i)) {
+            option.text = "❌ " + seatCode + " (Obsazeno)";
+            option.disabled = true;
+        } else {
+            option.text = "✅ " + seatCode + " (Volné)";
+        }
+        fragment.appendChild(option);
+    }
+    selectBox.appendChild(fragment);
+}
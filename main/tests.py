@@ -1,3 +1,1558 @@
-from django.test import TestCase
+import base64
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Aerolinky, Letadla, Letiste, Lety, TridySedadel, InventarLetu, Letenky, Rezervace, Role, RoleUzivatel,
+    Uzivatele, VerzeDat,
+)
+from . import (
+    rezervovani, obsazenost, index_letu, cache_vyhledavani, index_letist, opravneni, mapa_sedadel, metriky,
+    pomale_dotazy, profilovani, sprava_letu,
+)
+from . import kolize as kolize_modul
+from .dostupnost import nacti_dostupnost
+from .pomale_dotazy import otisk
+from .views import Cesta
+from .vyhledavani import (
+    MAX_CAS_PRESTUPU, MIN_CAS_PRESTUPU, RAZENI, HranaLetu, LineSerazeneVysledky, SitLetu, StrankyVysledku,
+    najdi_prestupy, najdi_trasy,
+)
+
+
+# Testovací SQLite v paměti při souběhu zápisů nečeká (hned hlásí zamčenou
+# tabulku), proto víc pokusů než v provozu
+@override_settings(REZERVACE_OPAKOVANI=50)
+class SoubezneRezervaceTest(TransactionTestCase):
+    """
+    Zátěžový test rezervací (rezervovani.py): mnoho vláken najednou kupuje
+    místa na stejném letu. Žádné sedadlo nesmí být prodané dvakrát
+    a počítadla InventarLetu musí sedět s letenkami.
+    """
+    VLAKEN = 12
+    POKUSU = 4
+
+    def setUp(self):
+        cache.clear()
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        odkud = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        kam = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=10, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        odlet = timezone.now() + timedelta(days=1)
+        self.let = Lety.objects.create(cislo_letu="TA1", cas_odletu=odlet, cas_priletu=odlet + timedelta(hours=1),
+                                       id_letiste_odletu=odkud, id_letiste_priletu=kam,
+                                       id_letadla=letadlo, id_aerolinky=aerolinka)
+        self.ekonomy = InventarLetu.objects.create(
+            id_letu=self.let, id_tridy=TridySedadel.objects.create(nazev_tridy="Economy"),
+            pocet_mist_k_prodeji=8, cena=100)
+        self.business = InventarLetu.objects.create(
+            id_letu=self.let, id_tridy=TridySedadel.objects.create(nazev_tridy="Business"),
+            pocet_mist_k_prodeji=2, cena=500)
+        self.uzivatele = [Uzivatele.objects.create_user(email=f"u{i}@x.cz")
+                          for i in range(self.VLAKEN)]
+
+    def _spust_vlakna(self, prace):
+        vysledky = Counter()
+        chyby = []
+        start = threading.Barrier(self.VLAKEN)
+
+        def vlakno(i):
+            try:
+                start.wait()
+                for pokus in range(self.POKUSU):
+                    try:
+                        prace(i, pokus)
+                        vysledky['ok'] += 1
+                    except rezervovani.RezervaceError as e:
+                        vysledky[type(e).__name__] += 1
+            except Exception as e:  # cokoli jiného je chyba testu
+                chyby.append(e)
+            finally:
+                connections.close_all()
+
+        vlakna = [threading.Thread(target=vlakno, args=(i,)) for i in range(self.VLAKEN)]
+        for v in vlakna:
+            v.start()
+        for v in vlakna:
+            v.join()
+        self.assertEqual(chyby, [])
+        return vysledky
+
+    def _over_konzistenci(self):
+        sedadla = list(Letenky.objects.filter(id_letu=self.let).values_list('cislo_sedadla', flat=True))
+        self.assertEqual(len(sedadla), len(set(sedadla)), "sedadlo prodané dvakrát")
+        for inventar in (self.ekonomy, self.business):
+            inventar.refresh_from_db()
+            pocet = Letenky.objects.filter(id_letu=self.let, id_tridy=inventar.id_tridy).count()
+            self.assertLessEqual(pocet, inventar.pocet_mist_k_prodeji)
+            self.assertEqual(inventar.prodano + inventar.drzeno, pocet)
+        self.assertEqual(obsazenost.prepocitej_obsazenost(), 0)
+        return sedadla
+
+    def test_stejna_sedadla_z_mnoha_vlaken(self):
+        # Všechna vlákna chtějí stejná tři sedadla - každé smí vyhrát jen jedno
+        sedadla = ['A1A', 'A1B', 'B1A']
+
+        def prace(i, pokus):
+            kod = sedadla[(i + pokus) % len(sedadla)]
+            inventar = self.business if kod.startswith('B') else self.ekonomy
+            rezervovani.rezervuj(self.uzivatele[i], [(self.let.id, inventar.id, kod)])
+
+        vysledky = self._spust_vlakna(prace)
+        self.assertEqual(vysledky['ok'], len(sedadla))
+        self.assertEqual(vysledky['SedadloObsazenoError'], self.VLAKEN * self.POKUSU - len(sedadla))
+        self.assertCountEqual(self._over_konzistenci(), sedadla)
+
+    def test_vyprodani_tridy(self):
+        # Každé vlákno chce jiné sedadlo v Business (2 místa, 6 sedadel v mapě)
+        def prace(i, pokus):
+            kod = f"B1{'ABCDEF'[(i * self.POKUSU + pokus) % 6]}"
+            rezervovani.rezervuj(self.uzivatele[i], [(self.let.id, self.business.id, kod)])
+
+        vysledky = self._spust_vlakna(prace)
+        self.assertEqual(vysledky['ok'], self.business.pocet_mist_k_prodeji)
+        self._over_konzistenci()
+
+    def test_zmena_sedadla_souperi_s_rezervaci(self):
+        # Polovina vláken rezervuje, druhá polovina si přesedá na stejná sedadla
+        letenky = [rezervovani.rezervuj(u, [(self.let.id, self.ekonomy.id, kod)]).letenky_set.get()
+                   for u, kod in zip(self.uzivatele, ['A1D', 'A1E', 'A1F', 'A2A', 'A2B'])]
+        cilova = ['A1A', 'A1B', 'A1C']
+
+        def prace(i, pokus):
+            kod = cilova[(i + pokus) % len(cilova)]
+            if i < len(letenky):
+                rezervovani.zmen_letenku(letenky[i], kod)
+            else:
+                rezervovani.rezervuj(self.uzivatele[i], [(self.let.id, self.ekonomy.id, kod)])
+
+        self._spust_vlakna(prace)
+        sedadla = self._over_konzistenci()
+        self.assertTrue(set(cilova) <= set(sedadla))
+
+    def test_propadle_sedadlo_lze_znovu_koupit(self):
+        prvni = rezervovani.rezervuj(self.uzivatele[0], [(self.let.id, self.ekonomy.id, 'A1A')])
+        Rezervace.objects.filter(id=prvni.id).update(expirace=timezone.now() - timedelta(minutes=1))
+
+        druha = rezervovani.rezervuj(self.uzivatele[1], [(self.let.id, self.ekonomy.id, 'A1A')])
+        self.assertFalse(Rezervace.objects.filter(id=prvni.id).exists())
+        self.assertEqual(druha.letenky_set.get().cislo_sedadla, 'A1A')
+        self._over_konzistenci()
+
+    def test_zmena_tridy_zaplacene_letenky(self):
+        rezervace = rezervovani.rezervuj(self.uzivatele[0], [(self.let.id, self.ekonomy.id, 'A1A')])
+        obsazenost.zmen_stav_rezervace(rezervace, 'ZAPLACENO')
+        Rezervace.objects.filter(id=rezervace.id).update(status_platby='ZAPLACENO')
+
+        rezervovani.zmen_letenku(rezervace.letenky_set.get(), 'B1A', inventar_id=self.business.id)
+        for inventar, prodano in ((self.ekonomy, 0), (self.business, 1)):
+            inventar.refresh_from_db()
+            self.assertEqual((inventar.prodano, inventar.drzeno), (prodano, 0))
+        self._over_konzistenci()
+
+    def test_zmena_tridy_se_stejnym_sedadlem(self):
+        letenka = rezervovani.rezervuj(self.uzivatele[0], [(self.let.id, self.ekonomy.id, 'A1A')]).letenky_set.get()
+        with self.assertRaises(rezervovani.RezervaceError):
+            rezervovani.zmen_letenku(letenka, 'A1A', inventar_id=self.business.id)
+        letenka.refresh_from_db()
+        self.assertEqual(letenka.id_tridy_id, self.ekonomy.id_tridy_id)
+        self._over_konzistenci()
+
+    def test_sedadlo_mimo_kabinu_tridy(self):
+        with self.assertRaises(rezervovani.RezervaceError):
+            rezervovani.rezervuj(self.uzivatele[0], [(self.let.id, self.ekonomy.id, 'B1A')])
+        self.assertFalse(Letenky.objects.exists())
+
+
+# --- DOSTUPNOST LETŮ ---
+
+class DostupnostTest(TestCase):
+    """Hromadná dostupnost letů (dostupnost.nacti_dostupnost) a cena cesty (views.Cesta)."""
+
+    def setUp(self):
+        cache.clear()
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        odkud = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        kam = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=10, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        self.ekonomy = TridySedadel.objects.create(nazev_tridy="Economy")
+        self.business = TridySedadel.objects.create(nazev_tridy="Business")
+        self.uzivatel = Uzivatele.objects.create_user(email="u@x.cz")
+        self.lety, self.inventare = [], {}
+        odlet = timezone.now() + timedelta(days=1)
+        for i in range(4):
+            let = Lety.objects.create(cislo_letu=f"TA{i}", cas_odletu=odlet + timedelta(hours=3 * i),
+                                      cas_priletu=odlet + timedelta(hours=3 * i + 1), id_letiste_odletu=odkud,
+                                      id_letiste_priletu=kam, id_letadla=letadlo, id_aerolinky=aerolinka)
+            for trida, pocet, cena in ((self.ekonomy, 2, 100 + i), (self.business, 1, 500)):
+                self.inventare[(let.id, trida.id)] = InventarLetu.objects.create(
+                    id_letu=let, id_tridy=trida, pocet_mist_k_prodeji=pocet, cena=cena)
+            self.lety.append(let)
+
+    def _kup(self, let, trida, sedadlo):
+        inventar = self.inventare[(let.id, trida.id)]
+        return rezervovani.rezervuj(self.uzivatel, [(let.id, inventar.id, f"{inventar.kabina}{sedadlo}")])
+
+    def test_jako_pocitani_letenek(self):
+        # Let 0: Economy vyprodaná, let 1: vše vyprodané, let 2: Economy drží propadlá rezervace
+        self._kup(self.lety[0], self.ekonomy, '1A')
+        self._kup(self.lety[0], self.ekonomy, '1B')
+        for trida, sedadla in ((self.ekonomy, ('1A', '1B')), (self.business, ('1A',))):
+            for sedadlo in sedadla:
+                self._kup(self.lety[1], trida, sedadlo)
+        for sedadlo in ('1A', '1B'):
+            propadla = self._kup(self.lety[2], self.ekonomy, sedadlo)
+            Rezervace.objects.filter(pk=propadla.pk).update(expirace=timezone.now() - timedelta(minutes=1))
+
+        with self.assertNumQueries(2):
+            dostupnost = nacti_dostupnost([let.id for let in self.lety])
+        self.assertEqual([dostupnost[let.id].nejnizsi_cena for let in self.lety], [500, None, 102, 103])
+        self.assertEqual([dostupnost[let.id].zbyva_mist() for let in self.lety], [1, 0, 3, 3])
+        self.assertEqual(dostupnost[self.lety[0].id].zbyva_mist(self.ekonomy.id), 0)
+
+        # Stejně jako dřívější počítání letenek pro každou třídu (bez propadlých)
+        for (let_id, trida_id), inventar in self.inventare.items():
+            prodano = (Letenky.objects.filter(id_letu_id=let_id, id_tridy_id=trida_id)
+                       .exclude(obsazenost.je_propadla('id_rezervace__')).count())
+            with self.subTest(let=let_id, trida=trida_id):
+                self.assertEqual(dostupnost[let_id].zbyva_mist(trida_id), inventar.pocet_mist_k_prodeji - prodano)
+
+    def test_cena_cesty(self):
+        for trida, sedadla in ((self.ekonomy, ('1A', '1B')), (self.business, ('1A',))):
+            for sedadlo in sedadla:
+                self._kup(self.lety[1], trida, sedadlo)
+        dostupnost = nacti_dostupnost([let.id for let in self.lety])
+        cesta = Cesta([self.lety[0], self.lety[2]], dostupnost)
+        self.assertEqual((cesta.celkova_cena, cesta.je_vyprodano, cesta.url_ids),
+                         (202, False, f"{self.lety[0].id}-{self.lety[2].id}"))
+        self.assertTrue(Cesta([self.lety[0], self.lety[1]], dostupnost).je_vyprodano)
+
+
+# --- REZERVACE LETŮ ---
+
+class RezervaceDetailTest(TestCase):
+    """rezervace_detail: výběr tříd a sedadel pro všechny lety cesty a nákup najednou."""
+
+    def setUp(self):
+        cache.clear()
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        prg, brq, osr = (Letiste.objects.create(nazev_letiste=kod, kod_iata=kod, mesto=kod, zeme="CZ")
+                         for kod in ("PRG", "BRQ", "OSR"))
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=10, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        ekonomy = TridySedadel.objects.create(nazev_tridy="Economy")
+        business = TridySedadel.objects.create(nazev_tridy="Business")
+        odlet = timezone.now() + timedelta(days=1)
+        self.lety, self.ekonomy = [], []
+        for i, (odkud, kam) in enumerate(((prg, osr), (osr, brq))):
+            let = Lety.objects.create(cislo_letu=f"TA{i}", cas_odletu=odlet + timedelta(hours=3 * i),
+                                      cas_priletu=odlet + timedelta(hours=3 * i + 1), id_letiste_odletu=odkud,
+                                      id_letiste_priletu=kam, id_letadla=letadlo, id_aerolinky=aerolinka)
+            InventarLetu.objects.create(id_letu=let, id_tridy=business, pocet_mist_k_prodeji=2, cena=500)
+            self.ekonomy.append(InventarLetu.objects.create(id_letu=let, id_tridy=ekonomy,
+                                                            pocet_mist_k_prodeji=6, cena=100))
+            # Třída bez míst se nenabízí
+            InventarLetu.objects.create(id_letu=let, id_tridy=TridySedadel.objects.create(nazev_tridy=f"First{i}"),
+                                        pocet_mist_k_prodeji=0, cena=900)
+            self.lety.append(let)
+        self.url = f'/rezervace/{self.lety[0].id}-{self.lety[1].id}/'
+        self.zakaznik = Uzivatele.objects.create_user(email="zakaznik@test.cz")
+        self.client.force_login(self.zakaznik)
+
+    def _objednavka(self, *sedadla):
+        data = {}
+        for let, inventar, sedadlo in zip(self.lety, self.ekonomy, sedadla):
+            data[f'inventar_{let.id}'] = inventar.id
+            data[f'sedadlo_{let.id}'] = f"{inventar.kabina}{sedadlo}"
+        return self.client.post(self.url, data)
+
+    def test_zobrazeni(self):
+        odpoved = self.client.get(self.url)
+        segmenty = odpoved.context['segmenty']
+        self.assertEqual([s['let'] for s in segmenty], self.lety)
+        # Třídy od nejlevnější, jen s místy
+        self.assertEqual([[i.cena for i in s['inventar_list']] for s in segmenty], [[100, 500], [100, 500]])
+        # Kabiny podle prefixu (Business vznikla první), třída bez míst v mapě není
+        self.assertEqual([k['pocet'] for k in json.loads(segmenty[0]['mapa_sedadel'])['kabiny']], [2, 6])
+
+    def test_nakup_vsech_letu(self):
+        odpoved = self._objednavka('1A', '1B')
+        rezervace = Rezervace.objects.get(id_uzivatele=self.zakaznik)
+        self.assertRedirects(odpoved, f'/platba/{rezervace.id}/', fetch_redirect_response=False)
+        self.assertEqual(sorted(rezervace.letenky_set.values_list('id_letu_id', flat=True)),
+                         sorted(let.id for let in self.lety))
+
+    def test_obsazene_sedadlo_nic_nekoupi(self):
+        self._objednavka('1A', '1A')
+        odpoved = self._objednavka('1B', '1A')
+        self.assertEqual(odpoved.status_code, 200)
+        self.assertTrue(odpoved.context['error'])
+        self.assertEqual(Rezervace.objects.count(), 1)
+        self.assertEqual(Letenky.objects.filter(id_letu=self.lety[0], cislo_sedadla__endswith='1B').count(), 0)
+
+    def test_neexistujici_let(self):
+        self.assertEqual(self.client.get(f'/rezervace/{self.lety[0].id}-999999/').status_code, 404)
+        self.assertEqual(self.client.get('/rezervace/abc/').status_code, 404)
+
+
+# --- ÚKLID PROPADLÝCH REZERVACÍ ---
+
+class UklidRezervaciTest(TestCase):
+    """manage.py expire_reservations a uvolnění propadlých míst (obsazenost.uvolni_propadle)."""
+
+    def setUp(self):
+        cache.clear()
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        odkud = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        kam = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=10, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        odlet = timezone.now() + timedelta(days=1)
+        self.let = Lety.objects.create(cislo_letu="TA1", cas_odletu=odlet, cas_priletu=odlet + timedelta(hours=1),
+                                       id_letiste_odletu=odkud, id_letiste_priletu=kam,
+                                       id_letadla=letadlo, id_aerolinky=aerolinka)
+        self.inventar = InventarLetu.objects.create(
+            id_letu=self.let, id_tridy=TridySedadel.objects.create(nazev_tridy="Economy"),
+            pocet_mist_k_prodeji=4, cena=100)
+        self.uzivatel = Uzivatele.objects.create_user(email="u@x.cz")
+
+    def _rezervuj(self, sedadlo, propadla=False, zaplacena=False):
+        rezervace = rezervovani.rezervuj(self.uzivatel, [(self.let.id, self.inventar.id, sedadlo)])
+        if zaplacena:
+            obsazenost.zmen_stav_rezervace(rezervace, 'ZAPLACENO')
+            Rezervace.objects.filter(pk=rezervace.pk).update(status_platby='ZAPLACENO', expirace=None)
+        if propadla:
+            Rezervace.objects.filter(pk=rezervace.pk).update(expirace=timezone.now() - timedelta(minutes=1))
+        return rezervace
+
+    def _pocitadla(self):
+        self.inventar.refresh_from_db()
+        return self.inventar.prodano, self.inventar.drzeno
+
+    def test_uklid_po_davkach(self):
+        propadle = [self._rezervuj(sedadlo, propadla=True) for sedadlo in ('A1A', 'A1B', 'A1C')]
+        platna = self._rezervuj('A1D')
+        self.assertEqual(self._pocitadla(), (0, 4))
+
+        vystup = StringIO()
+        call_command('expire_reservations', batch=2, stdout=vystup)
+        self.assertIn("Smazáno propadlých rezervací: 3", vystup.getvalue())
+        self.assertFalse(Rezervace.objects.filter(pk__in=[r.pk for r in propadle]).exists())
+        self.assertTrue(Rezervace.objects.filter(pk=platna.pk).exists())
+        self.assertEqual(self._pocitadla(), (0, 1))
+        self.assertEqual(obsazenost.prepocitej_obsazenost(), 0)
+
+    def test_zaplacena_nepropada(self):
+        zaplacena = self._rezervuj('A1A', zaplacena=True)
+        Rezervace.objects.filter(pk=zaplacena.pk).update(expirace=timezone.now() - timedelta(days=1))
+        self.assertEqual(obsazenost.uvolni_propadle(), 0)
+        self.assertEqual(self._pocitadla(), (1, 0))
+
+    def test_rezervace_uvolni_propadle_sama(self):
+        # Třída je plná, ale jedno místo drží propadlá rezervace, kterou úklid ještě nesmazal
+        propadla = self._rezervuj('A1A', propadla=True)
+        for sedadlo in ('A1B', 'A1C', 'A1D'):
+            self._rezervuj(sedadlo)
+        self._rezervuj('A1A')
+        self.assertFalse(Rezervace.objects.filter(pk=propadla.pk).exists())
+        self.assertEqual(self._pocitadla(), (0, 4))
+
+
+# --- MAPA SEDADEL ---
+
+class BitovaMapaSedadelTest(SimpleTestCase):
+    """Kódování sedadel a bitová mapa obsazenosti (mapa_sedadel.MapaSedadel)."""
+
+    def setUp(self):
+        # Kabina A: 4 místa (řady po třech), B: 7 míst - dohromady přes dva bajty bitmapy
+        self.mapa = mapa_sedadel.MapaSedadel('ABC', [(10, 1, 4, 'A'), (11, 2, 7, 'B')])
+
+    def test_kody_a_indexy(self):
+        kody = [self.mapa.kod(i) for i in range(self.mapa.celkem)]
+        self.assertEqual(kody, ['A1A', 'A1B', 'A1C', 'A2A', 'B1A', 'B1B', 'B1C', 'B2A', 'B2B', 'B2C', 'B3A'])
+        self.assertEqual([self.mapa.index(kod) for kod in kody], list(range(self.mapa.celkem)))
+        # Za koncem kabiny, neexistující kabina, písmeno nebo řada
+        for kod in ('A2B', 'C1A', 'B1D', 'B0A', 'BXA', 'B', ''):
+            with self.subTest(kod=kod):
+                self.assertIsNone(self.mapa.index(kod))
+        with self.assertRaises(IndexError):
+            self.mapa.kod(self.mapa.celkem)
+
+    def test_bitova_mapa(self):
+        for kod in ('A1A', 'A2A', 'B3A'):
+            self.mapa.oznac(kod)
+        self.mapa.oznac('C1A')  # neexistující sedadlo se ignoruje
+        self.assertEqual(bytes(self.mapa.obsazeno), bytes([0b00001001, 0b00000100]))
+        self.assertTrue(self.mapa.je_obsazeno('B3A'))
+        self.assertFalse(self.mapa.je_obsazeno('B2C'))
+
+        self.assertTrue(self.mapa.je_volne('B2C', trida_id=2))
+        self.assertFalse(self.mapa.je_volne('B2C', trida_id=1))
+        self.assertFalse(self.mapa.je_volne('A1A'))
+
+        data = json.loads(self.mapa.payload())
+        self.assertEqual(base64.b64decode(data['obsazeno']), bytes(self.mapa.obsazeno))
+        self.assertEqual([(k['prefix'], k['od'], k['pocet']) for k in data['kabiny']], [('A', 0, 4), ('B', 4, 7)])
+
+
+class MapaSedadelTest(TestCase):
+    """Kódy sedadel (mapa_sedadel.py) a jejich kabiny."""
+
+    def setUp(self):
+        cache.clear()
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        odkud = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        kam = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=20, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        odlet = timezone.now() + timedelta(days=1)
+        self.let = Lety.objects.create(cislo_letu="TA1", cas_odletu=odlet, cas_priletu=odlet + timedelta(hours=1),
+                                       id_letiste_odletu=odkud, id_letiste_priletu=kam,
+                                       id_letadla=letadlo, id_aerolinky=aerolinka)
+        self.ekonomy = InventarLetu.objects.create(
+            id_letu=self.let, id_tridy=TridySedadel.objects.create(nazev_tridy="Economy"),
+            pocet_mist_k_prodeji=12, cena=100)
+        self.business = InventarLetu.objects.create(
+            id_letu=self.let, id_tridy=TridySedadel.objects.create(nazev_tridy="Business"),
+            pocet_mist_k_prodeji=6, cena=500)
+        self.zakaznik = Uzivatele.objects.create_user(email="zakaznik@test.cz")
+
+    def test_zmena_ceny_a_odebrani_tridy_neprecisluje_sedadla(self):
+        letenka = rezervovani.rezervuj(self.zakaznik, [(self.let.id, self.business.id, 'B1A')]).letenky_set.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            # Economy zdraží nad Business a pak se úplně odebere
+            self.ekonomy.cena = 900
+            self.ekonomy.save()
+            self.ekonomy.delete()
+
+        mapa = mapa_sedadel.mapa_letu(self.let.id)
+        self.assertEqual(mapa.kabina('B1A')['trida'], self.business.id_tridy_id)
+        self.assertIsNone(mapa.kabina('A1A'))
+        self.assertTrue(mapa.je_obsazeno('B1A'))
+        # Přesednutí v rámci kabiny stále projde kontrolou kabiny
+        self.assertEqual(rezervovani.zmen_letenku(letenka, 'B1B').cislo_sedadla, 'B1B')
+
+        # Nová třída dostane první volné písmeno
+        nova = InventarLetu.objects.create(id_letu=self.let, id_tridy=TridySedadel.objects.create(
+            nazev_tridy="Premium"), pocet_mist_k_prodeji=6, cena=50)
+        self.assertEqual(nova.kabina, 'A')
+
+    def test_obsazenost_z_letenek(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rezervovani.rezervuj(self.zakaznik, [(self.let.id, self.business.id, 'B1A')])
+            propadla = rezervovani.rezervuj(self.zakaznik, [(self.let.id, self.ekonomy.id, 'A2C')])
+        Rezervace.objects.filter(pk=propadla.pk).update(expirace=timezone.now() - timedelta(minutes=1))
+        cache.clear()
+
+        mapa = mapa_sedadel.mapa_letu(self.let.id)
+        self.assertEqual([k['prefix'] for k in mapa.kabiny], ['A', 'B'])
+        self.assertTrue(mapa.je_obsazeno('B1A'))
+        # Místo propadlé rezervace je volné, i když ji úklid ještě nesmazal
+        self.assertFalse(mapa.je_obsazeno('A2C'))
+
+        # Mapa je v cache, nová letenka ji po commitu zneplatní
+        with self.assertNumQueries(0):
+            mapa_sedadel.mapa_letu(self.let.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            rezervovani.rezervuj(self.zakaznik, [(self.let.id, self.ekonomy.id, 'A1B')])
+        self.assertTrue(mapa_sedadel.mapa_letu(self.let.id).je_obsazeno('A1B'))
+
+
+# --- MOJE REZERVACE ---
+
+class MojeRezervaceTest(TestCase):
+    """moje_rezervace: filtry, řazení podle prvního odletu a stránkování v databázi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        cls.prg, cls.brq, cls.osr = (Letiste.objects.create(nazev_letiste=kod, kod_iata=kod, mesto=kod, zeme="CZ")
+                                     for kod in ("PRG", "BRQ", "OSR"))
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        trida = TridySedadel.objects.create(nazev_tridy="Economy")
+        cls.zakaznik = Uzivatele.objects.create_user(email="zakaznik@test.cz")
+        jiny = Uzivatele.objects.create_user(email="jiny@test.cz")
+        ted = timezone.now()
+
+        def rezervace(uzivatel, *lety, **udaje):
+            rezervace = Rezervace.objects.create(id_uzivatele=uzivatel, celkova_cena=100, **udaje)
+            for i, (odkud, kam, odlet) in enumerate(lety):
+                let = Lety.objects.create(cislo_letu=f"TA{Lety.objects.count()}", cas_odletu=odlet,
+                                          cas_priletu=odlet + timedelta(hours=1), id_letiste_odletu=odkud,
+                                          id_letiste_priletu=kam, id_letadla=letadlo, id_aerolinky=aerolinka)
+                Letenky.objects.create(id_rezervace=rezervace, id_letu=let, id_tridy=trida,
+                                       cislo_sedadla=f"A{i + 1}A", cena_letenky=50)
+            return rezervace
+
+        # 12 budoucích rezervací vytvořených v opačném pořadí, než letí
+        cls.budouci = [rezervace(cls.zakaznik, (cls.prg, cls.brq, ted + timedelta(days=20 - i)))
+                       for i in range(12)][::-1]
+        # S přestupem (letenky uložené obráceně): odkud z prvního letu, kam z posledního
+        cls.s_prestupem = rezervace(cls.zakaznik, (cls.brq, cls.osr, ted + timedelta(days=30, hours=3)),
+                                    (cls.prg, cls.brq, ted + timedelta(days=30)))
+        cls.minula = rezervace(cls.zakaznik, (cls.prg, cls.brq, ted - timedelta(days=3)))
+        cls.propadla = rezervace(cls.zakaznik, (cls.prg, cls.brq, ted + timedelta(days=40)),
+                                 expirace=ted - timedelta(minutes=1))
+        rezervace(jiny, (cls.prg, cls.brq, ted + timedelta(days=1)))
+
+    def _stranka(self, **parametry):
+        self.client.force_login(self.zakaznik)
+        odpoved = self.client.get('/moje-rezervace/', parametry)
+        self.assertEqual(odpoved.status_code, 200)
+        return odpoved.context['rezervace_list']
+
+    def test_razeni_a_strankovani(self):
+        prvni, druha = self._stranka(), self._stranka(page=2)
+        self.assertEqual(prvni.paginator.count, 13)
+        self.assertEqual([r.id for r in prvni], [r.id for r in self.budouci[:10]])
+        self.assertEqual([r.id for r in druha], [r.id for r in self.budouci[10:]] + [self.s_prestupem.id])
+
+    def test_souhrn_trasy(self):
+        rezervace = self._stranka(page=2)[-1]
+        self.assertEqual((rezervace.odkud, rezervace.kam, rezervace.pocet_letu), (self.prg, self.osr, 2))
+
+    def test_filtry(self):
+        self.assertEqual(self._stranka(zobrazit_vse='on')[0].id, self.minula.id)
+        den = timezone.localdate(timezone.now() + timedelta(days=30)).isoformat()
+        self.assertEqual([r.id for r in self._stranka(datum_od=den, datum_do=den)], [self.s_prestupem.id])
+        # Propadlá nezaplacená rezervace se nezobrazí nikdy
+        self.assertNotIn(self.propadla.id, [r.id for r in self._stranka(zobrazit_vse='on', page=2)])
+
+
+# --- VYHLEDÁVÁNÍ TRAS ---
+
+def _nahodna_sit(seed, letist=8, letu=300):
+    """Náhodná síť letů v paměti (HranaLetu) a náhodná dvojice letišť."""
+    nahoda = random.Random(seed)
+    zacatek = datetime(2030, 1, 1)
+    lety = []
+    for i in range(letu):
+        odkud, kam = nahoda.sample(range(letist), 2)
+        odlet = zacatek + timedelta(minutes=nahoda.randrange(4 * 24 * 60))
+        lety.append(HranaLetu(i, odkud, kam, odlet, odlet + timedelta(minutes=nahoda.randint(30, 600))))
+    return lety, *nahoda.sample(range(letist), 2)
+
+
+def _hrubou_silou(lety, odkud, kam, max_useku):
+    """Všechny trasy prohledáním všech posloupností letů (bez indexu a ořezávání)."""
+    trasy = set()
+
+    def rozsir(cesta, navstivena):
+        posledni = cesta[-1]
+        if posledni.id_letiste_priletu_id == kam:
+            trasy.add(tuple(let.id for let in cesta))
+            return
+        if len(cesta) == max_useku:
+            return
+        for dalsi in lety:
+            if (dalsi.id_letiste_odletu_id == posledni.id_letiste_priletu_id
+                    and dalsi.id_letiste_priletu_id not in navstivena
+                    and MIN_CAS_PRESTUPU <= dalsi.cas_odletu - posledni.cas_priletu <= MAX_CAS_PRESTUPU):
+                rozsir(cesta + [dalsi], navstivena | {dalsi.id_letiste_priletu_id})
+
+    for let in lety:
+        if let.id_letiste_odletu_id == odkud:
+            rozsir([let], {odkud, let.id_letiste_priletu_id})
+    return trasy
+
+
+class VyhledavaniTrasTest(SimpleTestCase):
+    """najdi_trasy (vyhledavani.py) proti prohledání hrubou silou na náhodných sítích."""
+    SITI = 40
+
+    @staticmethod
+    def _ids(trasy):
+        return {tuple(let.id for let in trasa) for trasa in trasy}
+
+    def test_bez_omezeni_jako_hruba_sila(self):
+        for seed in range(self.SITI):
+            lety, odkud, kam = _nahodna_sit(seed)
+            with self.subTest(seed=seed):
+                self.assertEqual(self._ids(najdi_trasy(SitLetu(lety), odkud, kam, max_prestupu=2)),
+                                 _hrubou_silou(lety, odkud, kam, 3))
+
+    def test_omezeni_neubere_prime_lety_ani_jeden_prestup(self):
+        for seed in range(self.SITI):
+            lety, odkud, kam = _nahodna_sit(seed)
+            vse = _hrubou_silou(lety, odkud, kam, 3)
+            nalezeno = self._ids(najdi_trasy(SitLetu(lety), odkud, kam, max_prestupu=2, tras_na_odlet=2))
+            with self.subTest(seed=seed):
+                self.assertEqual({t for t in nalezeno if len(t) <= 2}, {t for t in vse if len(t) <= 2})
+                # Jeden přestup stejně jako původní hash join (najdi_prestupy)
+                prestupy = najdi_prestupy([l for l in lety if l.id_letiste_odletu_id == odkud],
+                                          [l for l in lety if l.id_letiste_priletu_id == kam])
+                self.assertEqual({t for t in nalezeno if len(t) == 2}, self._ids(prestupy))
+
+    def test_omezeni_necha_nejdrivejsi_prilety(self):
+        k = 2
+        for seed in range(self.SITI):
+            lety, odkud, kam = _nahodna_sit(seed)
+            prilet = {let.id: let.cas_priletu for let in lety}
+            vse = [t for t in _hrubou_silou(lety, odkud, kam, 3) if len(t) == 3]
+            nalezeno = [t for t in self._ids(najdi_trasy(SitLetu(lety), odkud, kam, max_prestupu=2,
+                                                         tras_na_odlet=k)) if len(t) == 3]
+            for prvni in {t[0] for t in vse}:
+                with self.subTest(seed=seed, prvni=prvni):
+                    ocekavane = sorted(prilet[t[-1]] for t in vse if t[0] == prvni)[:k]
+                    self.assertEqual(sorted(prilet[t[-1]] for t in nalezeno if t[0] == prvni), ocekavane)
+
+
+# --- INDEX LETŮ ---
+
+class IndexLetuTest(TestCase):
+    """Paměťový index letů (index_letu.py) se po commitu mění po jednotlivých letech."""
+
+    def setUp(self):
+        self.aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        self.prg = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        self.brq = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        self.letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                              id_aerolinky=self.aerolinka)
+        self.odlet = timezone.now() + timedelta(days=1)
+        index_letu.zahod_index()
+        self.addCleanup(index_letu.zahod_index)
+
+    def _let(self, cislo, odlet):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Lety.objects.create(cislo_letu=cislo, cas_odletu=odlet, cas_priletu=odlet + timedelta(hours=1),
+                                       id_letiste_odletu=self.prg, id_letiste_priletu=self.brq,
+                                       id_letadla=self.letadlo, id_aerolinky=self.aerolinka)
+
+    def _odlety(self, sit):
+        casy, lety = sit.podle_odletu.get(self.prg.id, ((), ()))
+        self.assertEqual(list(casy), [let.cas_odletu for let in lety])
+        return [let.id for let in lety]
+
+    def test_zmeny_bez_noveho_nacteni(self):
+        pozdejsi = self._let("TA2", self.odlet + timedelta(hours=5))
+        sit = index_letu.ziskej_sit()
+        skupina = sit.podle_odletu[self.prg.id]
+
+        with self.assertNumQueries(4):  # INSERT, verze (zvýšení + čtení) a jen nový let
+            drivejsi = self._let("TA1", self.odlet)
+        with self.assertNumQueries(1):
+            self.assertIs(index_letu.ziskej_sit(), sit)
+        self.assertEqual(self._odlety(sit), [drivejsi.id, pozdejsi.id])
+        # Čtenář, který si skupinu vzal dřív, má dál starou verzi (copy-on-write)
+        self.assertEqual([let.id for let in skupina[1]], [pozdejsi.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            drivejsi.cas_odletu = self.odlet + timedelta(hours=8)
+            drivejsi.cas_priletu = drivejsi.cas_odletu + timedelta(hours=1)
+            drivejsi.save()
+        self.assertEqual(self._odlety(sit), [pozdejsi.id, drivejsi.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pozdejsi.delete()
+        self.assertEqual(self._odlety(sit), [drivejsi.id])
+        self.assertEqual(set(sit.podle_priletu[self.brq.id]), {drivejsi.id})
+
+    def test_zmena_v_jinem_procesu(self):
+        sit = index_letu.ziskej_sit()
+        let = self._let("TA1", self.odlet)
+        # Jiný proces mezitím zvýšil verzi - index se načte celý znovu
+        VerzeDat.zvys(index_letu.KLIC_VERZE)
+        nova = index_letu.ziskej_sit()
+        self.assertIsNot(nova, sit)
+        self.assertEqual(self._odlety(nova), [let.id])
+
+    def test_minule_lety_se_nedrzi(self):
+        self._let("TA0", index_letu.hranice_indexu() - timedelta(hours=2))
+        self.assertEqual(len(index_letu.ziskej_sit()), 0)
+
+
+# --- CACHE VYHLEDÁVÁNÍ ---
+
+class CacheVyhledavaniTest(TestCase):
+    """Zneplatnění výsledků vyhledávání po letištích (cache_vyhledavani.py)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _uloz(self, odkud, kam, zavislosti):
+        cache_vyhledavani.uloz_vysledek(odkud, kam, '', ['kandidati'], zavislosti,
+                                        cache_vyhledavani.globalni_razitko())
+
+    def test_zneplatni_jen_zavisle(self):
+        self._uloz(1, 2, {1, 2})
+        self._uloz(3, 4, {3, 4})
+        cache_vyhledavani.zneplatni_letiste({2})
+        self.assertIsNone(cache_vyhledavani.nacti_vysledek(1, 2, ''))
+        self.assertEqual(cache_vyhledavani.nacti_vysledek(3, 4, ''), ['kandidati'])
+
+    def test_bez_letiste_zavisi_na_vsem(self):
+        self._uloz(None, None, set())
+        cache_vyhledavani.zneplatni_letiste({7})
+        self.assertIsNone(cache_vyhledavani.nacti_vysledek(None, None, ''))
+
+    def test_zmena_behem_vypoctu_se_neulozi(self):
+        razitko_pred = cache_vyhledavani.globalni_razitko()
+        cache_vyhledavani.zneplatni_letiste({9})
+        cache_vyhledavani.uloz_vysledek(1, 2, '', ['kandidati'], {1, 2}, razitko_pred)
+        self.assertIsNone(cache_vyhledavani.nacti_vysledek(1, 2, ''))
+
+    def test_presun_letu_zneplatni_stare_i_nove_letiste(self):
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        prg, brq, ost = (Letiste.objects.create(nazev_letiste=kod, kod_iata=kod, mesto=kod, zeme="CZ")
+                         for kod in ("PRG", "BRQ", "OSR"))
+        letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                         id_aerolinky=aerolinka)
+        odlet = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            let = Lety.objects.create(cislo_letu="TA1", cas_odletu=odlet, cas_priletu=odlet + timedelta(hours=1),
+                                      id_letiste_odletu=prg, id_letiste_priletu=brq,
+                                      id_letadla=letadlo, id_aerolinky=aerolinka)
+        self._uloz(prg.id, None, {prg.id})
+        self._uloz(ost.id, None, {ost.id})
+        self._uloz(brq.id, None, {brq.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            let.id_letiste_odletu = ost
+            let.save()
+        self.assertIsNone(cache_vyhledavani.nacti_vysledek(prg.id, None, ''))
+        self.assertIsNone(cache_vyhledavani.nacti_vysledek(ost.id, None, ''))
+        self.assertIsNone(cache_vyhledavani.nacti_vysledek(brq.id, None, ''))
+
+        # Let mimo tato letiště je neovlivní
+        self._uloz(prg.id, None, {prg.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            let.cas_priletu += timedelta(minutes=5)
+            let.save()
+        self.assertEqual(cache_vyhledavani.nacti_vysledek(prg.id, None, ''), ['kandidati'])
+
+
+# --- CENOVÝ KALENDÁŘ ---
+
+class KalendarCenTest(TestCase):
+    """api_fare_calendar a kalendar_cen.py: nejlevnější volná cena dne, přímo i s přestupem."""
+
+    def setUp(self):
+        cache.clear()
+        self.aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        self.prg, self.brq, self.osr = (Letiste.objects.create(nazev_letiste=kod, kod_iata=kod, mesto=kod, zeme="CZ")
+                                        for kod in ("PRG", "BRQ", "OSR"))
+        self.letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                              id_aerolinky=self.aerolinka)
+        self.ekonomy = TridySedadel.objects.create(nazev_tridy="Economy")
+        self.business = TridySedadel.objects.create(nazev_tridy="Business")
+        self.cislo = 0
+
+    def _let(self, odkud, kam, odlet, **ceny):
+        self.cislo += 1
+        odlet = timezone.make_aware(odlet)
+        let = Lety.objects.create(cislo_letu=f"TA{self.cislo}", cas_odletu=odlet,
+                                  cas_priletu=odlet + timedelta(hours=1), id_letiste_odletu=odkud,
+                                  id_letiste_priletu=kam, id_letadla=self.letadlo, id_aerolinky=self.aerolinka)
+        for trida, cena in ceny.items():
+            InventarLetu.objects.create(id_letu=let, id_tridy=getattr(self, trida), pocet_mist_k_prodeji=5,
+                                        cena=cena)
+        return let
+
+    def _vyprodej(self, let, trida):
+        InventarLetu.objects.filter(id_letu=let, id_tridy=getattr(self, trida)).update(prodano=5)
+
+    def _kalendar(self):
+        odpoved = self.client.get('/api/fare-calendar/', {'odkud': self.prg.id, 'kam': self.brq.id,
+                                                          'datum': '2030-03-11', 'dni': 1})
+        self.assertEqual(odpoved.status_code, 200)
+        return {den['datum']: (den['cena'], den['volno'], den['prestup'], den['lety'])
+                for den in odpoved.json()['dny']}
+
+    def test_dny(self):
+        # 10. 3.: nejlevnější třída vyprodaná - platí dražší
+        levny = self._let(self.prg, self.brq, datetime(2030, 3, 10, 8), ekonomy=100, business=400)
+        self._vyprodej(levny, 'ekonomy')
+        # 11. 3.: přestup přes OSR je levnější než přímý let
+        self._let(self.prg, self.brq, datetime(2030, 3, 11, 8), ekonomy=300)
+        self._let(self.prg, self.osr, datetime(2030, 3, 11, 9), ekonomy=80)
+        self._let(self.osr, self.brq, datetime(2030, 3, 11, 12), ekonomy=90)
+        # 12. 3.: přímý let úplně vyprodaný
+        self._vyprodej(self._let(self.prg, self.brq, datetime(2030, 3, 12, 8), ekonomy=100), 'ekonomy')
+
+        self.assertEqual(self._kalendar(), {
+            '2030-03-10': ('400.00', True, False, True),
+            '2030-03-11': ('170.00', True, True, True),
+            '2030-03-12': (None, False, False, True),
+        })
+
+    def test_mesic_z_cache(self):
+        self._let(self.prg, self.brq, datetime(2030, 3, 10, 8), ekonomy=100)
+        prvni = self._kalendar()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._kalendar(), prvni)
+
+    def test_neplatny_rozsah(self):
+        odpoved = self.client.get('/api/fare-calendar/', {'odkud': self.prg.id, 'kam': self.brq.id,
+                                                          'datum': '2030-03-11', 'dni': 99})
+        self.assertEqual(odpoved.status_code, 400)
+
+
+# --- NAŠEPTÁVAČ LETIŠŤ ---
+
+class IndexLetistTest(SimpleTestCase):
+    """Prefixové hledání letišť bez ohledu na diakritiku (index_letist.IndexLetist)."""
+
+    def setUp(self):
+        self.index = index_letist.IndexLetist([
+            (1, "PRG", "Praha", "Letiště Václava Havla", "Česko"),
+            (2, "BRQ", "Brno", "Tuřany", "Česko"),
+            (3, "PED", "Pardubice", "Letiště Pardubice", "Česko"),
+            (4, "BER", "Berlín", "Brandenburg", "Německo"),
+            (5, "PLZ", "Plzeň", "Líně", "Česko"),
+        ])
+
+    def _kody(self, dotaz, limit=10):
+        return [letiste['kod_iata'] for letiste in self.index.hledej(dotaz, limit)]
+
+    def test_bez_diakritiky_a_velikosti_pismen(self):
+        self.assertEqual(self._kody("plzen"), ["PLZ"])
+        self.assertEqual(self._kody("TUŘ"), ["BRQ"])
+        self.assertEqual(self._kody("vaclav"), ["PRG"])
+
+    def test_poradi_podle_pole_shody(self):
+        # Kód IATA před městem, město před názvem, přesná shoda před prefixem; dál podle města
+        self.assertEqual(self._kody("br"), ["BRQ", "BER"])
+        self.assertEqual(self._kody("p"), ["PED", "PLZ", "PRG"])
+        self.assertEqual(self._kody("pardubice"), ["PED"])
+
+    def test_vice_slov(self):
+        self.assertEqual(self._kody("letiste pard"), ["PED"])
+        self.assertEqual(self._kody("cesko b"), ["BRQ"])
+        self.assertEqual(self._kody("nemecko praha"), [])
+
+    def test_limit_a_prazdny_dotaz(self):
+        self.assertEqual(len(self._kody("cesko", limit=2)), 2)
+        self.assertEqual(self._kody("  "), [])
+
+
+class NaseptavacLetistTest(TestCase):
+    """api_airports - nové letiště se v našeptávači objeví hned po uložení."""
+
+    def test_zmena_letiste(self):
+        Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        self.assertEqual(len(self.client.get('/api/airports/', {'q': 'ostr'}).json()['letiste']), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Letiste.objects.create(nazev_letiste="Leoše Janáčka", kod_iata="OSR", mesto="Ostrava", zeme="CZ")
+        self.assertEqual([l['kod_iata'] for l in self.client.get('/api/airports/', {'q': 'ostr'}).json()['letiste']],
+                         ["OSR"])
+
+
+# --- ŘAZENÍ VÝSLEDKŮ ---
+
+class LineSerazeneVysledkyTest(SimpleTestCase):
+    """LineSerazeneVysledky a StrankyVysledku (vyhledavani.py) proti úplnému seřazení."""
+
+    def setUp(self):
+        nahoda = random.Random(7)
+        zacatek = datetime(2030, 1, 1)
+        self.kandidati, self.ceny = [], {}
+        for i in range(200):
+            odlet = zacatek + timedelta(minutes=nahoda.randrange(24 * 60))
+            ids = tuple(range(i * 3, i * 3 + nahoda.randint(1, 3)))
+            self.kandidati.append((ids, odlet, odlet + timedelta(minutes=nahoda.randint(60, 900))))
+            # Zhruba polovina přestupů je vyprodaná - vyřadí se
+            self.ceny[ids] = None if len(ids) > 1 and nahoda.random() < 0.5 else nahoda.randint(50, 500)
+        self.vyhodnoceno = []
+
+    def _vysledky(self, razeni, odhad=None):
+        def vyhodnot(davka):
+            self.vyhodnoceno.extend(davka)
+            return [self.ceny[ids] for ids, _, _ in davka]
+        return LineSerazeneVysledky(self.kandidati, RAZENI[razeni], vyhodnot, odhad)
+
+    def _ocekavane(self, razeni):
+        klic = RAZENI[razeni]
+        return sorted((k for k in self.kandidati if self.ceny[k[0]] is not None),
+                      key=lambda k: (klic(k, self.ceny[k[0]]), self.kandidati.index(k)))
+
+    def test_razeni(self):
+        for razeni in RAZENI:
+            with self.subTest(razeni=razeni):
+                # Pro řazení podle ceny je odhad dolní mez (jako nejnizsi_ceny ve views)
+                odhad = (lambda k: self.ceny[k[0]] or 0) if razeni == 'cena' else None
+                self.assertEqual(self._vysledky(razeni, odhad)[:], self._ocekavane(razeni))
+
+    def test_prvni_stranka_vyhodnoti_jen_zacatek(self):
+        vysledky = self._vysledky('cas')
+        self.assertEqual(vysledky[:10], self._ocekavane('cas')[:10])
+        self.assertLess(len(self.vyhodnoceno), len(self.kandidati) // 2)
+        self.assertFalse(vysledky.dopocitano)
+
+    def test_pocet_stranek_bez_prazdnych(self):
+        pocet = len(self._ocekavane('cas'))
+        posledni = (pocet + 9) // 10
+        stranky = StrankyVysledku(self._vysledky('cas'), 10)
+        # Horní odhad by vedl až na stránku 20, ty za koncem by byly prázdné
+        stranka = stranky.get_page(20)
+        self.assertEqual((stranka.number, stranky.num_pages, stranky.count), (posledni, posledni, pocet))
+        self.assertFalse(stranka.has_next())
+        self.assertEqual(list(stranka), self._ocekavane('cas')[(posledni - 1) * 10:])
+
+    def test_posledni_plna_stranka(self):
+        # Na poslední stránce je přesně per_page výsledků - další už se nenabízí
+        stranky = StrankyVysledku(self._vysledky('cas'), len(self._ocekavane('cas')))
+        stranka = stranky.get_page(1)
+        self.assertEqual(stranky.num_pages, 1)
+        self.assertFalse(stranka.has_next())
+
+
+# --- KOLIZE V ROZVRHU ---
+
+class RozvrhLetuTest(SimpleTestCase):
+    """Intervalové indexy kolize.RozvrhLetu proti porovnání všech dvojic letů."""
+    ROZVRHU = 30
+    OBRATKA = timedelta(minutes=30)
+
+    def _rozvrh(self, seed, letu=80):
+        nahoda = random.Random(seed)
+        zacatek = datetime(2030, 1, 1)
+        lety, posadka = [], []
+        for let_id in range(letu):
+            odlet = zacatek + timedelta(minutes=5 * nahoda.randrange(600))
+            lety.append((let_id, f"TA{let_id}", nahoda.randint(1, 6), odlet,
+                         odlet + timedelta(minutes=5 * nahoda.randint(6, 60))))
+            posadka.extend((let_id, clen) for clen in nahoda.sample(range(10), 2))
+        return lety, posadka
+
+    def _vsechny_dvojice(self, lety, posadka):
+        podle_id = {let[0]: let for let in lety}
+        kolize = set()
+        for a, b in itertools.combinations(lety, 2):
+            if a[3] > b[3] or (a[3] == b[3] and a[4] > b[4]):
+                a, b = b, a
+            if a[2] == b[2] and b[3] < a[4] + self.OBRATKA:
+                kolize.add((kolize_modul.LETADLO if b[3] < a[4] else kolize_modul.OBRATKA, a[0], b[0], a[2]))
+        clenove = defaultdict(list)
+        for let_id, clen in posadka:
+            clenove[clen].append(podle_id[let_id])
+        for clen, jeho_lety in clenove.items():
+            for a, b in itertools.combinations(jeho_lety, 2):
+                if a[3] < b[4] and b[3] < a[4]:
+                    a, b = sorted((a, b), key=lambda let: (let[3], let[4]))
+                    kolize.add((kolize_modul.POSADKA, a[0], b[0], clen))
+        return kolize
+
+    def test_report_jako_vsechny_dvojice(self):
+        for seed in range(self.ROZVRHU):
+            lety, posadka = self._rozvrh(seed)
+            report = kolize_modul.RozvrhLetu(lety, posadka, self.OBRATKA).report()
+            with self.subTest(seed=seed):
+                self.assertEqual(len(report), len(set(report)))
+                self.assertEqual(set(report), self._vsechny_dvojice(lety, posadka))
+
+    def test_kontrola_letu(self):
+        for seed in range(self.ROZVRHU):
+            lety, posadka = self._rozvrh(seed)
+            rozvrh = kolize_modul.RozvrhLetu(lety, posadka, self.OBRATKA)
+            ocekavane = self._vsechny_dvojice(lety, posadka)
+            for let_id, _, letadlo_id, odlet, prilet in lety[:10]:
+                clenove = [clen for l, clen in posadka if l == let_id]
+                nalezeno = rozvrh.zkontroluj_let(odlet, prilet, letadlo_id, clenove, bez_letu=let_id)
+                with self.subTest(seed=seed, let=let_id):
+                    self.assertEqual(sorted(nalezeno), sorted(
+                        (typ, b if a == let_id else a, None if typ != kolize_modul.POSADKA else kdo)
+                        for typ, a, b, kdo in ocekavane if let_id in (a, b)))
+
+
+class ReportRozvrhuTest(TestCase):
+    """api_check_collisions s {"rozvrh": true}: okno od-do a jen rozvrh vlastní aerolinky."""
+
+    @classmethod
+    def setUpTestData(cls):
+        prg = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        brq = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        cls.aerolinky = []
+        zacatek = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+        for kod in ("TA", "TB"):
+            aerolinka = Aerolinky.objects.create(nazev=f"Air {kod}", kod_iata=kod)
+            letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                             id_aerolinky=aerolinka)
+            # Dvě kolize letadla: za 10 a za 20 dní
+            for den, cisla in ((10, (1, 2)), (20, (3, 4))):
+                for cislo in cisla:
+                    odlet = zacatek + timedelta(days=den, hours=8 + cislo % 2)
+                    Lety.objects.create(cislo_letu=f"{kod}{cislo}", cas_odletu=odlet,
+                                        cas_priletu=odlet + timedelta(hours=2), id_letiste_odletu=prg,
+                                        id_letiste_priletu=brq, id_letadla=letadlo, id_aerolinky=aerolinka)
+            cls.aerolinky.append(aerolinka)
+
+        role = Role.objects.create(nazev_role="Správce letů")
+        cls.spravce = Uzivatele.objects.create_user(email="spravce@test.cz", id_aerolinky=cls.aerolinky[0])
+        cls.bez_aerolinky = Uzivatele.objects.create_user(email="nikdo@test.cz")
+        for uzivatel in (cls.spravce, cls.bez_aerolinky):
+            RoleUzivatel.objects.create(id_uzivatele=uzivatel, id_role=role)
+        cls.superuser = Uzivatele.objects.create_superuser(email="root@test.cz", password="x")
+
+    def setUp(self):
+        cache.clear()
+
+    def _report(self, uzivatel, **data):
+        self.client.force_login(uzivatel)
+        return self.client.post('/api/check-collisions/', json.dumps({'rozvrh': True, **data}),
+                                content_type='application/json')
+
+    def _dvojice(self, odpoved):
+        self.assertEqual(odpoved.status_code, 200)
+        # Dvojice letů bez ohledu na pořadí: 'TA1-TA2'
+        return {'-'.join(sorted((k['let_a'], k['let_b']))) for k in odpoved.json()['kolize']}
+
+    def test_jen_vlastni_aerolinka(self):
+        self.assertEqual(self._dvojice(self._report(self.spravce)), {"TA1-TA2", "TA3-TA4"})
+
+    def test_okno_od_do(self):
+        den = timezone.localdate()
+        odpoved = self._report(self.spravce, od=(den + timedelta(days=5)).isoformat(),
+                               do=(den + timedelta(days=10)).isoformat())
+        self.assertEqual(self._dvojice(odpoved), {"TA1-TA2"})
+        odpoved = self._report(self.spravce, od=(den + timedelta(days=11)).isoformat())
+        self.assertEqual(self._dvojice(odpoved), {"TA3-TA4"})
+        self.assertEqual(self._report(self.spravce, od="zítra").status_code, 400)
+
+    def test_spravce_bez_aerolinky(self):
+        self.assertEqual(self._report(self.bez_aerolinky).status_code, 403)
+
+    def test_superuser(self):
+        self.assertEqual(len(self._dvojice(self._report(self.superuser))), 4)
+        odpoved = self._report(self.superuser, id_aerolinky=self.aerolinky[1].id)
+        self.assertEqual(self._dvojice(odpoved), {"TB1-TB2", "TB3-TB4"})
+        self.assertEqual(self._report(self.superuser, id_aerolinky="TB").status_code, 400)
+
+
+# --- DATA AEROLINKY ---
+
+class DataAerolinkyTest(TestCase):
+    """Zdroje správy letů s ETagem a ?since= (data_aerolinky.py, api_airline_data)."""
+
+    def setUp(self):
+        cache.clear()
+        self.aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        self.cizi = Aerolinky.objects.create(nazev="Other Air", kod_iata="TB")
+        self.spravce = Uzivatele.objects.create_user(email="spravce@test.cz", id_aerolinky=self.aerolinka)
+        self.client.force_login(self.spravce)
+
+    def _letadla(self, aerolinka=None, **hlavicky):
+        return self.client.get('/api/airline-data/aircraft/',
+                               {'airline_id': (aerolinka or self.aerolinka).id}, **hlavicky)
+
+    def _pridej_letadlo(self, aerolinka):
+        with self.captureOnCommitCallbacks(execute=True):
+            Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                   id_aerolinky=aerolinka)
+
+    def test_etag_a_304(self):
+        self._pridej_letadlo(self.aerolinka)
+        odpoved = self._letadla()
+        self.assertEqual(len(odpoved.json()['letadla']), 1)
+        etag = odpoved['ETag']
+        self.assertEqual(self._letadla(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Letadlo jiné aerolinky verzi nemění, vlastní ano
+        self._pridej_letadlo(self.cizi)
+        self.assertEqual(self._letadla(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self._pridej_letadlo(self.aerolinka)
+        odpoved = self._letadla(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(odpoved.status_code, 200)
+        self.assertNotEqual(odpoved['ETag'], etag)
+        self.assertEqual(len(odpoved.json()['letadla']), 2)
+
+    def test_since(self):
+        verze = self._letadla().json()['verze']
+        self.assertEqual(self.client.get('/api/airline-data/aircraft/', {'airline_id': self.aerolinka.id,
+                                                                         'since': verze}).json(),
+                         {'verze': verze, 'zmeneno': False})
+
+    def test_cizi_aerolinka(self):
+        self.assertEqual(self._letadla(self.cizi).status_code, 403)
+
+
+class HledaniLetuTest(TestCase):
+    """api_flight_search - našeptávač čísla letu ve správě letů (data_aerolinky.hledej_lety)."""
+
+    def setUp(self):
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        self.cizi = Aerolinky.objects.create(nazev="Other Air", kod_iata="TB")
+        odkud = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        kam = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        self.ted = timezone.now()
+        self.lety = {}
+        for cislo, dni, vlastnik in (("TA100", 5, aerolinka), ("TA101", 2, aerolinka), ("TA100", -30, aerolinka),
+                                     ("TA200", 1, aerolinka), ("TA105", 1, self.cizi)):
+            letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                             id_aerolinky=vlastnik)
+            odlet = self.ted + timedelta(days=dni)
+            self.lety[(cislo, dni)] = Lety.objects.create(
+                cislo_letu=cislo, cas_odletu=odlet, cas_priletu=odlet + timedelta(hours=1), id_letiste_odletu=odkud,
+                id_letiste_priletu=kam, id_letadla=letadlo, id_aerolinky=vlastnik)
+        self.aerolinka = aerolinka
+        self.client.force_login(Uzivatele.objects.create_user(email="spravce@test.cz", id_aerolinky=aerolinka))
+
+    def _hledej(self, **parametry):
+        odpoved = self.client.get('/api/flights/search/', {'airline_id': self.aerolinka.id, **parametry})
+        self.assertEqual(odpoved.status_code, 200)
+        data = odpoved.json()
+        return [l['id'] for l in data['lety']], data['existuje']
+
+    def test_prefix_cisla(self):
+        # Podle čísla, pak odletu; jen vlastní aerolinka, bez ohledu na velikost písmen
+        self.assertEqual(self._hledej(q='ta1'), ([self.lety[("TA100", -30)].id, self.lety[("TA100", 5)].id,
+                                                 self.lety[("TA101", 2)].id], False))
+        self.assertEqual(self._hledej(q='TA1', limit=1)[0], [self.lety[("TA100", -30)].id])
+        self.assertEqual(self._hledej(q=''), ([], False))
+
+    def test_okno_a_existujici_cislo(self):
+        od = timezone.localdate(self.ted).isoformat()
+        # Starý TA100 je mimo okno, číslo ale i tak koliduje
+        self.assertEqual(self._hledej(q='TA100', od=od), ([self.lety[("TA100", 5)].id], True))
+        # Upravovaný let s vlastním číslem nekoliduje - jen s tím druhým
+        self.assertTrue(self._hledej(q='TA100', bez=self.lety[("TA100", 5)].id)[1])
+        self.assertFalse(self._hledej(q='TA200', bez=self.lety[("TA200", 1)].id)[1])
+
+    def test_cizi_aerolinka_a_chybne_parametry(self):
+        self.assertEqual(self.client.get('/api/flights/search/', {'airline_id': self.cizi.id, 'q': 'TA'}).status_code,
+                         403)
+        self.assertEqual(self.client.get('/api/flights/search/', {'airline_id': self.aerolinka.id, 'q': 'TA',
+                                                                  'od': 'zitra'}).status_code, 400)
+
+
+# --- SPRÁVA LETŮ ---
+
+class SpravaLetuTest(TestCase):
+    """Uložení inventáře letu rozdílem (sprava_letu._uloz_inventar)."""
+
+    def setUp(self):
+        aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        odkud = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        kam = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        self.letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=20, datum_vyroby="2010-01-01",
+                                              id_aerolinky=aerolinka)
+        odlet = timezone.now() + timedelta(days=1)
+        self.udaje = {'cislo_letu': "TA1", 'cas_odletu': odlet, 'cas_priletu': odlet + timedelta(hours=1),
+                      'id_letiste_odletu': odkud, 'id_letiste_priletu': kam,
+                      'id_letadla_id': self.letadlo.id, 'id_aerolinky': aerolinka}
+        self.ekonomy, self.business, self.prvni = (TridySedadel.objects.create(nazev_tridy=nazev)
+                                                  for nazev in ("Economy", "Business", "First"))
+        self.let = sprava_letu.uloz_let(None, self.udaje, [], {self.ekonomy.id: (10, 100),
+                                                               self.business.id: (4, 500)})
+
+    def _inventar(self):
+        return {inv.id_tridy_id: inv for inv in InventarLetu.objects.filter(id_letu=self.let)}
+
+    def test_zmena_zapise_jen_rozdil(self):
+        puvodni = self._inventar()
+        sprava_letu.uloz_let(self.let, self.udaje, [], {self.ekonomy.id: (12, 90), self.prvni.id: (2, 900)})
+        inventar = self._inventar()
+        self.assertCountEqual(inventar, [self.ekonomy.id, self.prvni.id])
+        ekonomy = inventar[self.ekonomy.id]
+        # Stejný řádek (id i kabina) s novými hodnotami, nová třída dostane volné písmeno
+        self.assertEqual((ekonomy.id, ekonomy.kabina), (puvodni[self.ekonomy.id].id, puvodni[self.ekonomy.id].kabina))
+        self.assertEqual((ekonomy.pocet_mist_k_prodeji, ekonomy.cena), (12, 90))
+        self.assertNotIn(inventar[self.prvni.id].kabina, {ekonomy.kabina, ''})
+
+    def test_trida_s_letenkami_nejde_odebrat(self):
+        business = self._inventar()[self.business.id]
+        uzivatel = Uzivatele.objects.create_user(email="u@x.cz")
+        rezervovani.rezervuj(uzivatel, [(self.let.id, business.id, f"{business.kabina}1A")])
+        with self.assertRaisesMessage(sprava_letu.SpravaLetuError, "Business (1)"):
+            sprava_letu.uloz_let(self.let, self.udaje, [], {self.ekonomy.id: (8, 80)})
+        # Nic se neuložilo - ani změna ekonomické třídy
+        inventar = self._inventar()
+        self.assertCountEqual(inventar, [self.ekonomy.id, self.business.id])
+        self.assertEqual(inventar[self.ekonomy.id].pocet_mist_k_prodeji, 10)
+
+    def test_kapacita_letadla(self):
+        with self.assertRaises(sprava_letu.SpravaLetuError):
+            sprava_letu.uloz_let(self.let, self.udaje, [], {self.ekonomy.id: (15, 100),
+                                                           self.business.id: (6, 500)})
+
+
+# --- METRIKY ---
+
+class MetrikyTest(TestCase):
+    """MetrikyMiddleware, export /metrics a součet metrik více procesů (metriky.py)."""
+
+    def setUp(self):
+        cache.clear()
+        adresar = tempfile.TemporaryDirectory()
+        self.addCleanup(adresar.cleanup)
+        nastaveni = override_settings(METRIKY_ADRESAR=adresar.name, METRIKY_TOKEN='tajne')
+        nastaveni.enable()
+        self.addCleanup(nastaveni.disable)
+        self.adresar = Path(adresar.name)
+        metriky.vynuluj()
+        self.addCleanup(metriky.vynuluj)
+
+    def _export(self):
+        odpoved = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer tajne')
+        self.assertEqual(odpoved.status_code, 200)
+        return odpoved.content.decode()
+
+    def test_pozadavek_v_exportu(self):
+        self.client.get('/api/airports/', {'q': 'pra'})
+        export = self._export()
+        self.assertIn('caelus_http_requests_total{view="api_airports",method="GET",status="200"} 1', export)
+        self.assertIn('caelus_http_request_duration_seconds_count{view="api_airports",method="GET"} 1', export)
+        self.assertIn('caelus_db_queries_per_request_bucket{view="api_airports",le="+Inf"} 1', export)
+        self.assertIn('# TYPE caelus_template_render_duration_seconds histogram', export)
+
+    def test_soucet_procesu(self):
+        self.client.get('/api/airports/', {'q': 'pra'})
+        metriky.zapis()
+        # Soubor jiného (i už skončeného) workeru se stejnými čísly
+        (self.adresar / '999999.json').write_text((self.adresar / f'{os.getpid()}.json').read_text())
+        export = self._export()
+        self.assertIn('caelus_http_requests_total{view="api_airports",method="GET",status="200"} 2', export)
+        self.assertIn('caelus_db_queries_per_request_count{view="api_airports"} 2', export)
+
+    def test_pristup(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer spatne').status_code, 403)
+
+    def test_server_timing_jen_pro_zamestnance(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/airports/', {'q': 'pra'}))
+        zamestnanec = Uzivatele.objects.create_user(email="staff@test.cz", is_staff=True)
+        RoleUzivatel.objects.create(id_uzivatele=zamestnanec, id_role=Role.objects.create(nazev_role="Správce letů"))
+        self.client.force_login(zamestnanec)
+        self.assertIn('sql;dur=', self.client.get('/api/airports/', {'q': 'pra'})['Server-Timing'])
+
+
+# --- PROFILOVÁNÍ ---
+
+class ProfilovaniTest(TestCase):
+    """?_profil pro zaměstnance a prohlížení profilů v adminu (profilovani.py)."""
+
+    def setUp(self):
+        cache.clear()
+        adresar = tempfile.TemporaryDirectory()
+        self.addCleanup(adresar.cleanup)
+        nastaveni = override_settings(PROFILOVANI_ADRESAR=adresar.name, PROFILOVANI_MAX_PROFILU=2)
+        nastaveni.enable()
+        self.addCleanup(nastaveni.disable)
+        self.adresar = Path(adresar.name)
+        role = Role.objects.create(nazev_role="Správce letů")
+        self.zamestnanci = []
+        for email in ("staff@test.cz", "kolega@test.cz"):
+            zamestnanec = Uzivatele.objects.create_user(email=email, is_staff=True)
+            RoleUzivatel.objects.create(id_uzivatele=zamestnanec, id_role=role)
+            self.zamestnanci.append(zamestnanec)
+        self.client.force_login(self.zamestnanci[0])
+
+    def _profiluj(self, rezim='1'):
+        odpoved = self.client.get('/api/airports/', {'q': 'pra', '_profil': rezim})
+        self.assertEqual(odpoved.status_code, 200)
+        return odpoved['X-Profil-Id']
+
+    def test_profil_s_sql(self):
+        odpoved = self.client.get('/moje-rezervace/', {'_profil': 'sql'})
+        udaje = profilovani.nacti(odpoved['X-Profil-Id'])
+        self.assertEqual((udaje['pohled'], udaje['status'], udaje['uzivatel_id']),
+                         ('moje_rezervace', 200, self.zamestnanci[0].id))
+        self.assertTrue(any('main_rezervace' in dotaz['sql'] for dotaz in udaje['sql']))
+        self.assertIsNone(profilovani.nacti(self._profiluj())['sql'])
+
+    def test_jen_pro_zamestnance(self):
+        self.client.force_login(Uzivatele.objects.create_user(email="zakaznik@test.cz"))
+        self.assertNotIn('X-Profil-Id', self.client.get('/api/airports/', {'q': 'pra', '_profil': '1'}))
+        self.assertEqual(list(self.adresar.iterdir()), [])
+
+    def test_kruhovy_buffer(self):
+        ids = [self._profiluj() for _ in range(3)]
+        self.assertEqual([p['id'] for p in profilovani.seznam()], sorted(ids[1:], reverse=True))
+        self.assertEqual(len(list(self.adresar.glob('*.prof'))), 2)
+
+    def test_admin(self):
+        profil_id = self._profiluj()
+        self.assertContains(self.client.get('/admin/profily/'), profil_id)
+        self.assertContains(self.client.get(f'/admin/profily/{profil_id}/'), 'function calls')
+        stazeni = self.client.get(f'/admin/profily/{profil_id}/stahnout/')
+        self.assertEqual(stazeni['Content-Disposition'], f'attachment; filename="{profil_id}.prof"')
+        stazeni.close()
+
+        # Cizí profil jen superuživatel
+        self.client.force_login(self.zamestnanci[1])
+        self.assertNotContains(self.client.get('/admin/profily/'), profil_id)
+        self.assertEqual(self.client.get(f'/admin/profily/{profil_id}/').status_code, 403)
+
+        # Smazaný .prof i neplatné id - 404
+        self.client.force_login(self.zamestnanci[0])
+        profilovani.cesta_prof(profil_id).unlink()
+        self.assertEqual(self.client.get(f'/admin/profily/{profil_id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/admin/profily/{profil_id}/stahnout/').status_code, 404)
+        self.assertEqual(self.client.get('/admin/profily/..%2Fsettings/').status_code, 404)
+
+
+# --- POMALÉ DOTAZY ---
+
+class PomaleDotazyTest(TestCase):
+    """Vzorkování pomalých dotazů s plánem a report všech procesů (pomale_dotazy.py)."""
+
+    def setUp(self):
+        adresar = tempfile.TemporaryDirectory()
+        self.addCleanup(adresar.cleanup)
+        # Práh 0 - zaznamená se každý dotaz
+        nastaveni = override_settings(POMALE_DOTAZY_ADRESAR=adresar.name, POMALE_DOTAZY_PRAH_MS=0)
+        nastaveni.enable()
+        self.addCleanup(nastaveni.disable)
+        self.adresar = Path(adresar.name)
+        pomale_dotazy.vynuluj()
+        self.addCleanup(pomale_dotazy.vynuluj)
+
+    def _dotaz_letiste(self):
+        """Tři dotazy lišící se jen hodnotami, vrátí jejich společný otisk."""
+        with CaptureQueriesContext(connection) as dotazy:
+            for kod, ids in (("PRG", [1]), ("BRQ", [1, 2]), ("OSR", [3, 4, 5])):
+                list(Letiste.objects.filter(kod_iata=kod, id__in=ids))
+        # (EXPLAIN prvního z nich běží v savepointu)
+        return otisk(next(d['sql'] for d in dotazy if d['sql'].startswith('SELECT')))
+
+    def _zaznam(self, klic):
+        return next(z for z in pomale_dotazy.report(top=1000) if z['otisk'] == klic)
+
+    def test_otisk(self):
+        self.assertEqual(otisk("SELECT a FROM t WHERE id IN (1, 2,3) AND x = 'O''Brien'  AND y = %s"),
+                         "SELECT a FROM t WHERE id IN (...) AND x = ? AND y = ?")
+        self.assertEqual(otisk("SELECT a FROM t WHERE id IN (%s)"), otisk("SELECT a FROM t WHERE id IN (7, 8)"))
+
+    def test_stejne_dotazy_pod_jednim_otiskem(self):
+        zaznam = self._zaznam(self._dotaz_letiste())
+        self.assertEqual(zaznam['pocet'], 3)
+        self.assertLessEqual(zaznam['p95_ms'], zaznam['max_ms'])
+        self.assertIn('main_letiste', zaznam['plan'])
+
+    def test_soucet_procesu_a_zastarale_soubory(self):
+        klic = self._dotaz_letiste()
+        pomale_dotazy.zapis()
+        vlastni = self.adresar / f'{os.getpid()}.json'
+        # Živý jiný proces se sčítá, soubor skončeného procesu (dlouho nepřepsaný) se smaže
+        (self.adresar / '999998.json').write_text(vlastni.read_text())
+        skonceny = self.adresar / '999999.json'
+        skonceny.write_text(vlastni.read_text())
+        os.utime(skonceny, (0, 0))
+        self.assertEqual(self._zaznam(klic)['pocet'], 6)
+        self.assertFalse(skonceny.exists())
+
+    def test_vynulovani_prikazem(self):
+        klic = self._dotaz_letiste()
+        pomale_dotazy.zapis()
+        pred_vynulovanim = (self.adresar / f'{os.getpid()}.json').read_text()
+
+        vystup = StringIO()
+        call_command('slow_queries', vynulovat=True, stdout=vystup)
+        self.assertIn("3x", vystup.getvalue())
+        self.assertIn(klic, vystup.getvalue())
+        self.assertIn("plán:", vystup.getvalue())
+        self.assertIn("Statistiky smazány.", vystup.getvalue())
+
+        # Jiný proces zapsal ještě starou generaci - do reportu se nezapočítá
+        (self.adresar / '999998.json').write_text(pred_vynulovanim)
+        with override_settings(POMALE_DOTAZY_PRAH_MS=None):
+            self.assertEqual(pomale_dotazy.report(), [])
+
+
+# --- PLATNÉ ROLE ---
+
+class PlatneRoleTest(TestCase):
+    """Odebraná role nesmí přežít v cache jiného procesu (opravneni.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.uzivatel = Uzivatele.objects.create_user(email="pilot@test.cz")
+        self.role = RoleUzivatel.objects.create(id_uzivatele=self.uzivatel,
+                                                id_role=Role.objects.create(nazev_role="Pilot"))
+
+    def test_odebrani_role_v_jinem_procesu(self):
+        self.assertTrue(opravneni.ma_platnou_roli(Uzivatele.objects.get(pk=self.uzivatel.pk), "Pilot"))
+        v_cache = cache.get(opravneni._klic(self.uzivatel.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.delete()
+        # Jiný proces má v cache pořád starou množinu rolí
+        cache.set(opravneni._klic(self.uzivatel.pk), v_cache)
+        self.assertFalse(opravneni.ma_platnou_roli(Uzivatele.objects.get(pk=self.uzivatel.pk), "Pilot"))
+
+
+# --- ROZPOČTY SQL DOTAZŮ ---
+
+# Rozpočty dotazů: název -> (uživatel, metoda, URL, parametry, max. dotazů).
+# URL a parametry jsou šablony doplněné z RozpoctyDotazuTest.hodnoty().
+# Počty zahrnují načtení session a uživatele; měří se se studenou cache
+# (žádné výsledky vyhledávání, mapy sedadel ani role v cache, indexy letů
+# a letišť zahozené), tedy nejhorší případ. Pohledy s kontrolou rolí
+# zaplatí i čtení verzí rolí (VerzeDat, viz opravneni.py).
+ROZPOCTY = {
+    'home': (None, 'get', '/', {}, 0),
+    'hledani_prime': (None, 'get', '/', {'odkud': '{prg}', 'kam': '{vie}', 'datum': '{datum}'}, 9),
+    'hledani_prestupy': (None, 'get', '/', {'odkud': '{prg}', 'kam': '{brq}', 'datum': '{datum}'}, 9),
+    'hledani_prestupy_cena': (None, 'get', '/',
+                              {'odkud': '{prg}', 'kam': '{brq}', 'datum': '{datum}', 'razeni': 'cena'}, 10),
+    'api_airports': (None, 'get', '/api/airports/', {'q': 'pra'}, 2),
+    'api_fare_calendar': (None, 'get', '/api/fare-calendar/',
+                          {'odkud': '{prg}', 'kam': '{vie}', 'datum': '{datum}', 'dni': '3'}, 2),
+    'rezervace_detail': ('zakaznik', 'get', '/rezervace/{prvni}-{druhy}/', {}, 10),
+    'moje_rezervace': ('zakaznik', 'get', '/moje-rezervace/', {}, 8),
+    'moje_rezervace_vse': ('zakaznik', 'get', '/moje-rezervace/', {'zobrazit_vse': 'on'}, 8),
+    'detail_moje_rezervace': ('zakaznik', 'get', '/moje-rezervace/{rezervace}/', {}, 7),
+    'moje_lety': ('pilot', 'get', '/moje-lety/', {}, 7),
+    'detail_moje_lety': ('pilot', 'get', '/moje-lety/{prvni}/', {}, 7),
+    'management_novy_let': ('spravce', 'get', '/management/lety/novy/', {}, 11),
+    'api_airline_aircraft': ('spravce', 'get', '/api/airline-data/aircraft/', {'airline_id': '{aerolinka}'}, 4),
+    'api_airline_crew': ('spravce', 'get', '/api/airline-data/crew/', {'airline_id': '{aerolinka}'}, 6),
+    'api_airline_classes': ('spravce', 'get', '/api/airline-data/classes/', {'airline_id': '{aerolinka}'}, 4),
+    'api_flight_search': ('spravce', 'get', '/api/flights/search/', {'airline_id': '{aerolinka}', 'q': 'TA'}, 4),
+    'api_load_flight_detail': ('spravce', 'get', '/api/load-flight-detail/', {'flight_id': '{prvni}'}, 5),
+    'api_check_collisions': ('spravce', 'post', '/api/check-collisions/', 'kolize', 5),
+    'api_check_collisions_rozvrh': ('spravce', 'post', '/api/check-collisions/', 'rozvrh', 9),
+    'admin_lety': ('spravce', 'get', '/admin/main/lety/', {}, 13),
+    'admin_rezervace': ('spravce', 'get', '/admin/main/rezervace/', {}, 12),
+    'admin_letenky': ('spravce', 'get', '/admin/main/letenky/', {}, 12),
+    'metriky': ('spravce', 'get', '/metrics', {}, 2),
+}
+
+
+# EXPLAIN pomalých dotazů (pomale_dotazy.py) by se započítal do rozpočtu
+@override_settings(POMALE_DOTAZY_PRAH_MS=None)
+class RozpoctyDotazuTest(TestCase):
+    """
+    Každý pohled smí položit nejvýš tolik SQL dotazů, kolik má v ROZPOCTY,
+    a počet nesmí růst s počtem dat (N+1). Měří se dvakrát - s malými daty
+    a po přidání dalších letů a rezervací - a oba počty se musí rovnat.
+    Při překročení test vypíše otisky dotazů, které se opakovaly.
+    """
+    LETU_NA_ZACATKU = 2
+    PRIDANYCH_LETU = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.aerolinka = Aerolinky.objects.create(nazev="Test Air", kod_iata="TA")
+        cls.prg = Letiste.objects.create(nazev_letiste="Ruzyně", kod_iata="PRG", mesto="Praha", zeme="CZ")
+        cls.vie = Letiste.objects.create(nazev_letiste="Schwechat", kod_iata="VIE", mesto="Vídeň", zeme="AT")
+        cls.brq = Letiste.objects.create(nazev_letiste="Tuřany", kod_iata="BRQ", mesto="Brno", zeme="CZ")
+        cls.letadlo = Letadla.objects.create(model="A320", kapacita_sedadel=60, datum_vyroby="2010-01-01",
+                                             id_aerolinky=cls.aerolinka)
+        cls.ekonomy = TridySedadel.objects.create(nazev_tridy="Economy")
+        cls.business = TridySedadel.objects.create(nazev_tridy="Business", id_aerolinky=cls.aerolinka)
+
+        cls.zakaznik = Uzivatele.objects.create_user(email="zakaznik@test.cz")
+        cls.pilot = Uzivatele.objects.create_user(email="pilot@test.cz", id_aerolinky=cls.aerolinka)
+        cls.spravce = Uzivatele.objects.create_user(email="spravce@test.cz", id_aerolinky=cls.aerolinka,
+                                                    is_staff=True)
+        for uzivatel, nazvy in ((cls.zakaznik, ["Zákazník"]), (cls.pilot, ["Pilot"]),
+                                (cls.spravce, ["Admin aerolinky", "Správce letů"])):
+            for nazev in nazvy:
+                RoleUzivatel.objects.create(id_uzivatele=uzivatel,
+                                            id_role=Role.objects.get_or_create(nazev_role=nazev)[0])
+        cls.spravce.user_permissions.set(Permission.objects.filter(
+            content_type__app_label='main', codename__in=['view_lety', 'view_rezervace', 'view_letenky']))
+
+        cls.datum = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        # Id letů se po rollbacku předchozích testů opakují - mapy sedadel z cache by k nim neseděly
+        cache.clear()
+
+    def _pridej_lety(self, pocet):
+        """
+        Přidá pocet dvojic letů PRG -> VIE -> BRQ (navazujících, s inventářem
+        a posádkou) a na každou dvojici jednu rezervaci zákazníka.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            zacatek = Lety.objects.count() // 2
+            for i in range(zacatek, zacatek + pocet):
+                odlet = timezone.make_aware(timezone.datetime.combine(self.datum, timezone.datetime.min.time())
+                                            + timedelta(hours=6, minutes=5 * i))
+                dvojice = []
+                for odkud, kam, posun in ((self.prg, self.vie, 0), (self.vie, self.brq, 3)):
+                    let = Lety.objects.create(
+                        cislo_letu=f"TA{100 + 2 * i + (posun > 0)}", cas_odletu=odlet + timedelta(hours=posun),
+                        cas_priletu=odlet + timedelta(hours=posun + 1), id_letiste_odletu=odkud,
+                        id_letiste_priletu=kam, id_letadla=self.letadlo, id_aerolinky=self.aerolinka)
+                    let.posadka.add(self.pilot)
+                    ekonomy = InventarLetu.objects.create(id_letu=let, id_tridy=self.ekonomy,
+                                                          pocet_mist_k_prodeji=40, cena=100 + i)
+                    InventarLetu.objects.create(id_letu=let, id_tridy=self.business,
+                                                pocet_mist_k_prodeji=10, cena=500)
+                    dvojice.append((let.id, ekonomy.id, 'A1A'))
+                rezervovani.rezervuj(self.zakaznik, dvojice)
+
+    def hodnoty(self):
+        prvni, druhy = Lety.objects.order_by('cas_odletu', 'id').values_list('id', flat=True)[:2]
+        let = Lety.objects.get(pk=prvni)
+        return {
+            'prg': self.prg.id, 'vie': self.vie.id, 'brq': self.brq.id, 'datum': self.datum.isoformat(),
+            'aerolinka': self.aerolinka.id, 'prvni': prvni, 'druhy': druhy,
+            'rezervace': Rezervace.objects.filter(id_uzivatele=self.zakaznik).order_by('id').first().id,
+            'kolize': {
+                'flight_id': let.id,
+                'cas_odletu': timezone.localtime(let.cas_odletu).strftime('%Y-%m-%dT%H:%M'),
+                'cas_priletu': timezone.localtime(let.cas_priletu).strftime('%Y-%m-%dT%H:%M'),
+                'id_letadla': self.letadlo.id,
+                'posadka_ids': [self.pilot.id],
+            },
+            'rozvrh': {'rozvrh': True, 'od': self.datum.isoformat(),
+                       'do': (self.datum + timedelta(days=1)).isoformat()},
+        }
+
+    def _vychladni(self):
+        cache.clear()
+        index_letu.zahod_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            index_letist.letiste_zmeneno()
+
+    def _zmer(self, nazev, hodnoty):
+        uzivatel, metoda, url, parametry, _ = ROZPOCTY[nazev]
+        url = url.format(**hodnoty)
+        self.client.logout()
+        if uzivatel:
+            self.client.force_login(getattr(self, uzivatel))
+        self._vychladni()
+        with CaptureQueriesContext(connection) as dotazy:
+            if isinstance(parametry, str):
+                odpoved = self.client.post(url, json.dumps(hodnoty[parametry]), content_type='application/json')
+            else:
+                odpoved = getattr(self.client, metoda)(url, {k: v.format(**hodnoty) for k, v in parametry.items()})
+        self.assertEqual(odpoved.status_code, 200, f"{nazev}: HTTP {odpoved.status_code}")
+        return [d['sql'] for d in dotazy.captured_queries]
+
+    def _zmer_vse(self):
+        hodnoty = self.hodnoty()
+        return {nazev: self._zmer(nazev, hodnoty) for nazev in ROZPOCTY}
+
+    @staticmethod
+    def _opakovane(dotazy):
+        pocty = Counter(otisk(sql) for sql in dotazy)
+        radky = [f"  {pocet}x {otisk}" for otisk, pocet in pocty.most_common() if pocet > 1]
+        return "\n".join(radky) or "  (žádný dotaz se neopakoval)"
+
+    def test_rozpocty_dotazu(self):
+        self._pridej_lety(self.LETU_NA_ZACATKU)
+        pred = self._zmer_vse()
+        self._pridej_lety(self.PRIDANYCH_LETU)
+        po = self._zmer_vse()
+
+        for nazev, (*_, rozpocet) in ROZPOCTY.items():
+            with self.subTest(nazev):
+                self.assertLessEqual(
+                    len(po[nazev]), rozpocet,
+                    f"{nazev}: {len(po[nazev])} dotazů, rozpočet {rozpocet}. "
+                    f"Opakované dotazy:\n{self._opakovane(po[nazev])}")
+                self.assertEqual(
+                    len(pred[nazev]), len(po[nazev]),
+                    f"{nazev}: počet dotazů roste s daty ({len(pred[nazev])} -> {len(po[nazev])}). "
+                    f"Opakované dotazy:\n{self._opakovane(po[nazev])}")
@@ -19,8 +19,10 @@ from django.contrib.auth import login
 from django.contrib.auth.models import Group
 
 from django.contrib.auth.decorators import login_required  # Pro @login_required
+from django.contrib import admin
 from .forms import PublicRegistrationForm, UserProfileForm  # Pro UserProfileForm
-from django.db.models import Min
+from django.db.models import Count, Exists, Min, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import render
 import json
 from django.utils import timezone
@@ -37,7 +39,7 @@ from django.core.exceptions import PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import json
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, get_user_model
@@ -48,72 +50,55 @@ from django.core.exceptions import PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.paginator import Paginator
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, datetime, date, time
 import json
 from decimal import Decimal
 from django.http import JsonResponse  # <--- TOTO ČASTO CHYBÍ
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.crypto import constant_time_compare
+from django.db import transaction
 
 # Import modelů
 from .models import (
     Lety, Letiste, InventarLetu, RoleUzivatel,
     Aerolinky, Letadla, TridySedadel, Uzivatele
 )
+from .dostupnost import nacti_dostupnost, nejnizsi_ceny
+from .vyhledavani import HranaLetu, SitLetu, najdi_trasy, LineSerazeneVysledky, StrankyVysledku, RAZENI
+from . import index_letu, index_letist, cache_vyhledavani, obsazenost, kalendar_cen, mapa_sedadel, rezervovani, opravneni, kolize, data_aerolinky, sprava_letu, metriky, profilovani
 
 # Získání modelu uživatele (pokud nepoužíváte ten importovaný z models)
 User = get_user_model()
 
 
-# --- POMOCNÁ FUNKCE PRO MAZÁNÍ ---
-def vycistit_stare_rezervace():
-    """
-    Smaže nezaplacené rezervace starší než 30 minut.
-    """
-    limit_casu = timezone.now() - timedelta(minutes=30)
-    Rezervace.objects.filter(
-        status_platby='NEZAPLACENO',
-        datum_rezervace__lt=limit_casu
-    ).delete()
-
-
 # Pomocná třída pro zobrazení výsledku (jednotný formát pro přímé i přestupní lety)
 class Cesta:
-    def __init__(self, lety_list):
+    def __init__(self, lety_list, dostupnost=None):
         self.segmenty = lety_list
         self.pocet_prestupu = len(lety_list) - 1
         self.celkova_cena = 0
         self.je_vyprodano = False
 
+        # Dostupnost se normálně počítá předem pro všechny kandidáty najednou
+        # (viz nacti_dostupnost). Pokud ji nikdo nepředal, spočítáme si ji sami.
+        if dostupnost is None:
+            dostupnost = nacti_dostupnost([l.id for l in lety_list])
+
         # Procházíme každý let v cestě (segment)
         for let in self.segmenty:
-            # Najdeme všechny inventáře (třídy) pro tento let
-            inventare = InventarLetu.objects.filter(id_letu=let)
-
-            nejnizsi_cena_letu = None
-            ma_volne_misto = False
-
-            # Projdeme každou třídu a zjistíme, jestli je v ní místo
-            for inv in inventare:
-                # Kolik je kapacita
-                kapacita = inv.pocet_mist_k_prodeji
-
-                # Kolik už je prodáno letenek pro tento let a tuto třídu
-                prodano = Letenky.objects.filter(id_letu=let, id_tridy=inv.id_tridy).count()
+            info = dostupnost.get(let.id)
 
-                # Je volno?
-                if prodano < kapacita:
-                    ma_volne_misto = True
-                    # Hledáme nejnižší cenu z dostupných tříd
-                    if nejnizsi_cena_letu is None or inv.cena < nejnizsi_cena_letu:
-                        nejnizsi_cena_letu = inv.cena
-
-            # Pokud jsme pro tento let nenašli žádnou třídu s volným místem
-            if not ma_volne_misto:
+            # Pokud pro tento let není žádná třída s volným místem
+            if info is None or not info.je_volno:
                 self.je_vyprodano = True
                 self.celkova_cena = 0  # Nebo jiná hodnota, ale důležité je je_vyprodano
                 break  # Stačí aby byl jeden segment vyprodán a celá cesta je k ničemu
 
             # Pokud místo je, přičteme nejnižší nalezenou cenu k celkové
-            self.celkova_cena += nejnizsi_cena_letu
+            self.celkova_cena += info.nejnizsi_cena
 
         self.prvni_let = self.segmenty[0]
         self.posledni_let = self.segmenty[-1]
@@ -121,66 +106,149 @@ class Cesta:
         self.cas_priletu = self.posledni_let.cas_priletu
         self.url_ids = "-".join([str(l.id) for l in self.segmenty])
 
+        # Dvojice (přílet, navazující odlet) pro zobrazení přestupů v šabloně
+        self.prestupy = list(zip(self.segmenty, self.segmenty[1:]))
 
-def verejny_seznam_letu(request):
-    vycistit_stare_rezervace()
 
-    letiste_list = Letiste.objects.all().order_by('mesto')
+def vyhledej_kandidaty(odkud_id, kam_id, datum):
+    """
+    Najde všechny cesty pro vyhledávání jako "kandidáty" (ids, cas_odletu, cas_priletu)
+    spolu s množinou letišť, na kterých výsledek závisí.
+    Jde jen o topologii sítě - dostupnost a ceny se počítají až při řazení
+    a jen pro kandidáty, kteří se dostanou na zobrazenou stránku.
+    """
+    zavislosti = set()
+    kandidati = []
+
+    # --- 1. PŘÍMÉ LETY ---
+    prime_lety = Lety.objects.all()
+    if odkud_id:
+        prime_lety = prime_lety.filter(id_letiste_odletu_id=odkud_id)
+        zavislosti.add(odkud_id)
+    if kam_id:
+        prime_lety = prime_lety.filter(id_letiste_priletu_id=kam_id)
+        zavislosti.add(kam_id)
+    if datum: prime_lety = prime_lety.filter(cas_odletu__date__gte=datum)
+
+    for let_id, cas_odletu, cas_priletu in prime_lety.order_by('cas_odletu').values_list(
+            'id', 'cas_odletu', 'cas_priletu'):
+        kandidati.append(((let_id,), cas_odletu, cas_priletu))
+
+    # --- 2. LETY S PŘESTUPEM ---
+    if odkud_id and kam_id:
+        # Trasy hledáme v paměťovém indexu nadcházejících letů (viz index_letu.py)
+        sit = index_letu.ziskej_sit()
+        od_casu = None
+        if datum:
+            od_casu = timezone.make_aware(datetime.combine(date.fromisoformat(datum), time.min))
+            if od_casu < sit.hranice:
+                # Hledání do minulosti index nepokrývá - postavíme síť z databáze
+                sit = SitLetu(HranaLetu(*radek) for radek in Lety.objects.filter(
+                    cas_odletu__gte=od_casu).values_list(*index_letu.SLOUPCE))
+
+        trasy = najdi_trasy(
+            sit, int(odkud_id), int(kam_id),
+            max_prestupu=settings.VYHLEDAVANI_MAX_PRESTUPU,
+            tras_na_odlet=settings.VYHLEDAVANI_TRAS_NA_ODLET,
+            od_casu=od_casu,
+            zavislosti=zavislosti,
+        )
+        for trasa in trasy:
+            # Přímé lety už máme z bodu 1
+            if len(trasa) > 1:
+                kandidati.append((tuple(h.id for h in trasa), trasa[0].cas_odletu, trasa[-1].cas_priletu))
+
+    return kandidati, zavislosti
+
+
+def serad_kandidaty(kandidati, razeni, dostupnost):
+    """
+    Vrátí líně seřazený seznam kandidátů (viz LineSerazeneVysledky).
+    Dostupnost vyhodnocených letů se ukládá do předaného slovníku,
+    aby ji sestav_cesty nemusela načítat znovu.
+    """
+    def vyhodnot(davka):
+        chybi = {let_id for ids, _, _ in davka for let_id in ids if let_id not in dostupnost}
+        dostupnost.update(nacti_dostupnost(chybi))
+
+        ceny = []
+        for ids, _, _ in davka:
+            info = [dostupnost.get(let_id) for let_id in ids]
+            je_vyprodano = any(i is None or not i.je_volno for i in info)
+
+            if je_vyprodano:
+                # Pokud je cesta s přestupem vyprodaná, VŮBEC JI NEUKAZUJEME
+                # (přímý let zůstává VŽDY, aby se zobrazil červeně - vyprodané nakonec)
+                ceny.append(999999 if len(ids) == 1 else None)
+            else:
+                ceny.append(sum(i.nejnizsi_cena for i in info))
+        return ceny
+
+    odhad = None
+    if razeni == 'cena':
+        # Pro řazení podle ceny potřebujeme rozumný dolní odhad, jinak by se
+        # musela vyhodnotit dostupnost všech kandidátů
+        ceny_letu = nejnizsi_ceny({let_id for ids, _, _ in kandidati for let_id in ids})
+        odhad = lambda kandidat: sum(ceny_letu.get(let_id, 0) for let_id in kandidat[0])
+
+    return LineSerazeneVysledky(
+        kandidati, RAZENI[razeni], vyhodnot, odhad,
+        predstih=settings.VYHLEDAVANI_PREDSTIH,
+    )
+
+
+def sestav_cesty(kostry, dostupnost=None):
+    """
+    Z koster (n-tic ID letů) sestaví objekty Cesta - pevný počet dotazů
+    bez ohledu na počet cest (lety se select_related + dostupnost najednou).
+    """
+    vsechny_ids = {let_id for ids in kostry for let_id in ids}
+    # Letiště a aerolinky potřebuje šablona index.html, načteme je rovnou s lety
+    lety_map = Lety.objects.select_related(
+        'id_letiste_odletu', 'id_letiste_priletu', 'id_aerolinky').in_bulk(vsechny_ids)
+    if dostupnost is None:
+        dostupnost = {}
+    chybi = vsechny_ids - dostupnost.keys()
+    if chybi:
+        dostupnost.update(nacti_dostupnost(chybi))
+
+    cesty = []
+    for ids in kostry:
+        # Let mohl být mezitím smazán (kostry můžou být z cache)
+        if all(let_id in lety_map for let_id in ids):
+            cesty.append(Cesta([lety_map[let_id] for let_id in ids], dostupnost))
+    return cesty
+
+
+def verejny_seznam_letu(request):
     odkud_id = request.GET.get('odkud')
     kam_id = request.GET.get('kam')
     datum = request.GET.get('datum')
     je_vyhledavani = odkud_id or kam_id or datum
 
-    vysledne_cesty = []
+    razeni = request.GET.get('razeni')
+    if razeni not in RAZENI:
+        razeni = 'cas'
+
+    kandidati = []
 
     if je_vyhledavani:
-        # --- 1. PŘÍMÉ LETY ---
-        prime_lety = Lety.objects.all().order_by('cas_odletu')
-        if odkud_id: prime_lety = prime_lety.filter(id_letiste_odletu_id=odkud_id)
-        if kam_id: prime_lety = prime_lety.filter(id_letiste_priletu_id=kam_id)
-        if datum: prime_lety = prime_lety.filter(cas_odletu__date__gte=datum)
-
-        for let in prime_lety:
-            # Přímý let přidáme VŽDY, i když je vyprodán (aby se zobrazil červeně)
-            vysledne_cesty.append(Cesta([let]))
-
-        # --- 2. LETY S PŘESTUPEM ---
-        if odkud_id and kam_id:
-            lety_start = Lety.objects.filter(id_letiste_odletu_id=odkud_id)
-            if datum: lety_start = lety_start.filter(cas_odletu__date__gte=datum)
-
-            lety_cil = Lety.objects.filter(id_letiste_priletu_id=kam_id)
-            if datum: lety_cil = lety_cil.filter(cas_odletu__date__gte=datum)
-
-            min_cas = timedelta(hours=1)
-            max_cas = timedelta(hours=24)
-
-            for let1 in lety_start:
-                for let2 in lety_cil:
-                    if let1.id_letiste_priletu == let2.id_letiste_odletu:
-                        cas_cekani = let2.cas_odletu - let1.cas_priletu
-                        if min_cas <= cas_cekani <= max_cas:
-                            cesta = Cesta([let1, let2])
-
-                            # ZMĚNA (Vaše V1):
-                            # Pokud je cesta s přestupem vyprodaná, VŮBEC JI NEUKAZUJEME
-                            if not cesta.je_vyprodano:
-                                vysledne_cesty.append(cesta)
-
-    # Řazení: primárně čas, sekundárně cena (vyprodané nakonec)
-    vysledne_cesty.sort(key=lambda x: (
-        x.cas_odletu,
-        x.celkova_cena if not x.je_vyprodano else 999999
-    ))
-
-    # Stránkování
-    paginator = Paginator(vysledne_cesty, 10)
+        # Kandidáty hledání si pamatujeme, další stránky se pak jen načtou z cache
+        kandidati = cache_vyhledavani.nacti_vysledek(odkud_id, kam_id, datum)
+        if kandidati is None:
+            razitko_pred = cache_vyhledavani.globalni_razitko()
+            kandidati, zavislosti = vyhledej_kandidaty(odkud_id, kam_id, datum)
+            cache_vyhledavani.uloz_vysledek(odkud_id, kam_id, datum, kandidati, zavislosti, razitko_pred)
+
+    # Stránkování - řadí se líně, dostupnost se počítá jen pro aktuální stránku (+ předstih)
+    dostupnost = {}
+    paginator = StrankyVysledku(serad_kandidaty(kandidati, razeni, dostupnost), 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = sestav_cesty([ids for ids, _, _ in page_obj.object_list], dostupnost)
 
     context = {
         'cesty': page_obj,
-        'letiste_list': letiste_list,
         'je_vyhledavani': je_vyhledavani,
     }
 
@@ -198,11 +266,11 @@ def verejny_seznam_letu(request):
 
     context = {
         'cesty': page_obj,
-        'letiste_list': letiste_list,
         'je_vyhledavani': je_vyhledavani,
         # Přidat nové proměnné:
         'nazev_odkud': nazev_odkud,
         'nazev_kam': nazev_kam,
+        'razeni': razeni,
     }
 
     return render(request, 'main/index.html', context)
@@ -210,68 +278,51 @@ def verejny_seznam_letu(request):
 
 def rezervace_detail(request, flight_ids):
 
-    vycistit_stare_rezervace()
-
-    ids = flight_ids.split('-')
-    segmenty = []
-
-    # Načtení dat pro zobrazení (GET) - zůstává stejné
-    for let_id in ids:
-        let = get_object_or_404(Lety, pk=let_id)
-        inventar = InventarLetu.objects.filter(id_letu=let, pocet_mist_k_prodeji__gt=0).order_by('cena')
-        obsazena_sedadla = list(Letenky.objects.filter(id_letu=let).values_list('cislo_sedadla', flat=True))
-
-        segmenty.append({
-            'let': let,
-            'inventar_list': inventar,
-            'obsazena_sedadla_json': json.dumps(obsazena_sedadla),
-            'kapacita': let.id_letadla.kapacita_sedadel
-        })
+    try:
+        ids = [int(let_id) for let_id in flight_ids.split('-')]
+    except ValueError:
+        raise Http404("Neplatné lety.")
 
     # --- ZPRACOVÁNÍ FORMULÁŘE (POST) ---
+    error = None
     if request.method == 'POST':
-        # 1. Vytvoříme prázdnou rezervaci
-        # Celkovou cenu zatím dáme 0, dopočítáme ji z letenek
-        rezervace = Rezervace.objects.create(
-            celkova_cena=0,
-            status_platby='NEZAPLACENO',
-            id_uzivatele=request.user
-        )
-
-        celkova_cena = 0
-
-        # 2. Projdeme všechny lety a vytvoříme letenky
-        for let_id in ids:
-            # Získáme ID vybraného inventáře (z radio buttonu)
-            inventar_id = request.POST.get(f'inventar_{let_id}')
-            # Získáme vybrané sedadlo (z roletky)
-            sedadlo = request.POST.get(f'sedadlo_{let_id}')
-
-            # Načteme objekt inventáře (kvůli ceně a třídě)
-            vybrany_inventar = get_object_or_404(InventarLetu, pk=inventar_id)
-
-            # Vytvoříme letenku
-            Letenky.objects.create(
-                cislo_sedadla=sedadlo,
-                cena_letenky=vybrany_inventar.cena,
-                id_rezervace=rezervace,
-                id_letu_id=let_id,  # Přímé přiřazení ID
-                id_tridy=vybrany_inventar.id_tridy
-            )
-
-            # Přičteme cenu
-            celkova_cena += vybrany_inventar.cena
-
-        # 3. Aktualizujeme celkovou cenu rezervace
-        rezervace.celkova_cena = celkova_cena
-        rezervace.save()
-
-        # 4. Přesměrujeme na platbu
-        return redirect('platba', rezervace_id=rezervace.id)
+        # Pro každý let: ID vybraného inventáře (radio button) a sedadlo (roletka)
+        polozky = [(let_id, request.POST.get(f'inventar_{let_id}'), request.POST.get(f'sedadlo_{let_id}'))
+                   for let_id in ids]
+        try:
+            # Rezervace i letenky se uloží jen celé (viz rezervovani.py)
+            rezervace = rezervovani.rezervuj(request.user, polozky)
+            # Přesměrujeme na platbu
+            return redirect('platba', rezervace_id=rezervace.id)
+        except rezervovani.RezervaceError as e:
+            error = str(e)
+
+    # --- DATA PRO ZOBRAZENÍ (hromadně, počet dotazů nezávisí na počtu letů) ---
+    lety = (Lety.objects
+            .select_related('id_letiste_odletu', 'id_letiste_priletu', 'id_aerolinky', 'id_letadla')
+            .in_bulk(ids))
+    if len(lety) != len(set(ids)):
+        raise Http404("Let neexistuje.")
+
+    inventare = {let_id: [] for let_id in ids}
+    for inventar in (InventarLetu.objects
+                     .filter(id_letu_id__in=ids, pocet_mist_k_prodeji__gt=0)
+                     .select_related('id_tridy')
+                     .order_by('cena', 'id')):
+        inventare[inventar.id_letu_id].append(inventar)
+
+    mapy = mapa_sedadel.mapy_letu(ids)
+    segmenty = [{
+        'let': lety[let_id],
+        'inventar_list': inventare[let_id],
+        # Rozložení sedadel + bitmapa obsazenosti (viz mapa_sedadel.py)
+        'mapa_sedadel': mapy[let_id].payload(),
+    } for let_id in ids]
 
     return render(request, 'main/rezervace_detail.html', {
         'segmenty': segmenty,
-        'flight_ids_raw': flight_ids
+        'flight_ids_raw': flight_ids,
+        'error': error,
     })
 
 
@@ -334,9 +385,22 @@ def platba(request, rezervace_id):
 
     if request.method == 'POST':
         # Simulace platby
-        rezervace.status_platby = 'ZAPLACENO'
-        # Zde bychom v reálu volali platební bránu
-        rezervace.save()
+        with transaction.atomic():
+            # Zamkneme rezervaci, aby ji úklid nesmazal uprostřed platby
+            rezervace = get_object_or_404(Rezervace.objects.select_for_update(), pk=rezervace.pk)
+            if rezervace.status_platby == 'NEZAPLACENO' and rezervace.expirace and rezervace.expirace < timezone.now():
+                # Rezervace propadla - místa už mohl koupit někdo jiný
+                return render(request, 'main/platba.html', {
+                    'rezervace': rezervace,
+                    'error': 'Rezervace vypršela, vytvořte prosím novou.',
+                })
+
+            # Držená místa se teď počítají jako prodaná
+            obsazenost.zmen_stav_rezervace(rezervace, 'ZAPLACENO')
+            rezervace.status_platby = 'ZAPLACENO'
+            rezervace.expirace = None  # Zaplacená rezervace už nepropadá
+            # Zde bychom v reálu volali platební bránu
+            rezervace.save()
 
         # ZMĚNA: Přesměrování na děkovnou stránku
         return redirect('potvrzeni_platby', rezervace_id=rezervace.id)
@@ -359,60 +423,61 @@ def potvrzeni_platby(request, rezervace_id):
 
 @login_required
 def moje_rezervace(request):
-    # 1. Úklid
-    vycistit_stare_rezervace()
-
-    # 2. Základní queryset (bez distinct, zatím)
-    rezervace_qs = Rezervace.objects.filter(id_uzivatele=request.user)
+    # Základní queryset - propadlé nezaplacené rezervace
+    # už nezobrazujeme, i když je úklid (expire_reservations) ještě nesmazal
+    rezervace_qs = Rezervace.objects.filter(id_uzivatele=request.user).exclude(obsazenost.je_propadla())
 
     datum_od = request.GET.get('datum_od')
     datum_do = request.GET.get('datum_do')
     zobrazit_vse = request.GET.get('zobrazit_vse') == 'on'
 
+    # Filtry podle letů přes EXISTS (ne JOIN) - rezervace se neduplikují
+    # a souhrny níže (Min, Count) počítají se všemi lety rezervace
+    def ma_let(**podminka):
+        return Exists(Letenky.objects.filter(id_rezervace=OuterRef('pk'), **podminka))
+
     # 1. ZÁKLADNÍ BEZPEČNOSTNÍ FILTR (Historie vs Budoucnost)
     if not zobrazit_vse:
         # Pokud není zaškrtnuto "zobrazit vše", VŽDY aplikujeme filtr na budoucnost.
         # To je naše "tvrdé dno". I když si uživatel do 'datum_od' dá rok 1990,
         # tento filtr ho nepustí dál než k dnešku.
-        rezervace_qs = rezervace_qs.filter(letenky__id_letu__cas_odletu__gte=timezone.now())
+        rezervace_qs = rezervace_qs.filter(ma_let(id_letu__cas_odletu__gte=timezone.now()))
 
     # 2. UŽIVATELSKÉ FILTRY (Aplikují se VŽDY, nad rámec základního filtru)
-    # (Přesunuto ven z else bloku)
     if datum_od:
-        rezervace_qs = rezervace_qs.filter(letenky__id_letu__cas_odletu__date__gte=datum_od)
+        rezervace_qs = rezervace_qs.filter(ma_let(id_letu__cas_odletu__date__gte=datum_od))
 
     if datum_do:
-        rezervace_qs = rezervace_qs.filter(letenky__id_letu__cas_odletu__date__lte=datum_do)
-
-    # --- OPRAVA DUPLICIT ---
-    # Použijeme .distinct() na úrovni SQL. V SQLite to funguje, ale nesmíme řadit podle pole z jiné tabulky.
-    # Proto řadíme podle ID rezervace (což zhruba odpovídá času vytvoření).
-    # Pokud chceme řadit podle času odletu, musíme použít Python (viz níže)
-
-    rezervace_qs = rezervace_qs.distinct()
-
-    # Převedeme na list a seřadíme v Pythonu (bezpečné proti duplicitám)
-    rezervace_list = list(rezervace_qs)
-
-    # Řadíme podle n-tice: (Čas odletu, ID rezervace)
-    rezervace_list.sort(
-        key=lambda r: (
-            # 1. Kritérium: Čas odletu prvního letu (pokud letenka existuje)
-            r.letenky_set.first().id_letu.cas_odletu if r.letenky_set.exists() else r.datum_rezervace,
-
-            # 2. Kritérium: ID rezervace (menší ID = starší rezervace)
-            r.id
-        ),
-        reverse=False  # Vzestupně (nejbližší čas / nejmenší ID nahoře)
+        rezervace_qs = rezervace_qs.filter(ma_let(id_letu__cas_odletu__date__lte=datum_do))
+
+    # 3. SOUHRN TRASY V SQL (dřív se pro každou rezervaci zvlášť dotazovalo
+    # na letenky v Pythonu i v šabloně)
+    lety_rezervace = Letenky.objects.filter(id_rezervace=OuterRef('pk'))
+    rezervace_qs = rezervace_qs.annotate(
+        prvni_odlet=Min('letenky__id_letu__cas_odletu'),
+        pocet_letu=Count('letenky'),
+        # Odkud = odlet prvního letu, kam = přílet posledního
+        odkud_id=Subquery(lety_rezervace.order_by('id_letu__cas_odletu', 'id')
+                          .values('id_letu__id_letiste_odletu_id')[:1]),
+        kam_id=Subquery(lety_rezervace.order_by('-id_letu__cas_odletu', '-id')
+                        .values('id_letu__id_letiste_priletu_id')[:1]),
+    ).order_by(
+        # Čas odletu prvního letu (rezervace bez letenek podle data vytvoření), pak ID
+        Coalesce('prvni_odlet', 'datum_rezervace'), 'id'
     )
 
-    # --- NOVÉ: STRÁNKOVÁNÍ ---
+    # --- STRÁNKOVÁNÍ (v databázi) ---
     # Zobrazíme 10 rezervací na stránku
-    paginator = Paginator(rezervace_list, 10)
+    paginator = Paginator(rezervace_qs, 10)
 
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    # -------------------------
+
+    # Letiště všech rezervací na stránce jedním dotazem
+    letiste = Letiste.objects.in_bulk({r.odkud_id for r in page_obj} | {r.kam_id for r in page_obj})
+    for r in page_obj:
+        r.odkud = letiste.get(r.odkud_id)
+        r.kam = letiste.get(r.kam_id)
 
     return render(request, 'main/moje_rezervace.html', {
         'rezervace_list': page_obj,  # Teď posíláme objekt stránky, ne celý seznam
@@ -431,8 +496,14 @@ def detail_moje_rezervace(request, rezervace_id):
         'is_late_cancellation': False
     }
 
-    # Najdeme první let (podle času odletu), abychom určili limit
-    prvni_letenka = rezervace.letenky_set.select_related('id_letu').order_by('id_letu__cas_odletu').first()
+    # Letenky i s lety, letišti, letadlem a třídou jedním dotazem (šablona je vypisuje u každé letenky)
+    letenky = list(rezervace.letenky_set.select_related(
+        'id_letu__id_letiste_odletu', 'id_letu__id_letiste_priletu', 'id_letu__id_letadla',
+        'id_letu__id_aerolinky', 'id_tridy',
+    ).order_by('id_letu__cas_odletu', 'id'))
+
+    # První let (podle času odletu) určuje limit
+    prvni_letenka = letenky[0] if letenky else None
 
     if prvni_letenka:
         cas_odletu = prvni_letenka.id_letu.cas_odletu
@@ -452,6 +523,7 @@ def detail_moje_rezervace(request, rezervace_id):
 
     return render(request, 'main/detail_moje_rezervace.html', {
         'rezervace': rezervace,
+        'letenky': letenky,
         'refund_info': refund_info  # Posíláme data o vratce do šablony
     })
 
@@ -464,7 +536,9 @@ def smazat_rezervaci(request, rezervace_id):
         # ZMĚNA: Povolíme smazání KDYKOLIV (nejen když je NEZAPLACENO)
         # V reálném systému bychom zde volali bankovní API pro vrácení peněz ('refund')
 
-        rezervace.delete()
+        with transaction.atomic():
+            obsazenost.uvolni_mista(rezervace.letenky_set.all())
+            rezervace.delete()
         return redirect('moje_rezervace')
 
     return redirect('detail_moje_rezervace', rezervace_id=rezervace.id)
@@ -480,36 +554,25 @@ def upravit_letenku(request, letenka_id):
 
     # Načteme data pro formulář (stejně jako v rezervace_detail)
     let = letenka.id_letu
-    inventar = InventarLetu.objects.filter(id_letu=let, pocet_mist_k_prodeji__gt=0).order_by('cena')
-    obsazena_sedadla = list(
-        Letenky.objects.filter(id_letu=let).exclude(id=letenka.id).values_list('cislo_sedadla', flat=True))
+    inventar = InventarLetu.objects.filter(id_letu=let, pocet_mist_k_prodeji__gt=0).order_by('cena', 'id')
 
+    error = None
     if request.method == 'POST':
-        # Zpracování změny
-        inventar_id = request.POST.get(f'inventar_{let.id}')
-        sedadlo = request.POST.get(f'sedadlo_{let.id}')
-
-        vybrany_inventar = get_object_or_404(InventarLetu, pk=inventar_id)
-
-        # Aktualizace letenky
-        letenka.cislo_sedadla = sedadlo
-        letenka.cena_letenky = vybrany_inventar.cena
-        letenka.id_tridy = vybrany_inventar.id_tridy
-        letenka.save()
-
-        # Přepočet ceny rezervace
-        celkova_cena = sum(l.cena_letenky for l in letenka.id_rezervace.letenky_set.all())
-        letenka.id_rezervace.celkova_cena = celkova_cena
-        letenka.id_rezervace.save()
-
-        return redirect('detail_moje_rezervace', rezervace_id=letenka.id_rezervace.id)
+        # Změna třídy i sedadla pod zámkem (viz rezervovani.py); přepočítá i cenu rezervace
+        try:
+            rezervovani.zmen_letenku(letenka, request.POST.get(f'sedadlo_{let.id}'),
+                                     inventar_id=request.POST.get(f'inventar_{let.id}'))
+            return redirect('detail_moje_rezervace', rezervace_id=letenka.id_rezervace.id)
+        except rezervovani.RezervaceError as e:
+            error = str(e)
 
     return render(request, 'main/upravit_letenku.html', {
         'letenka': letenka,
         'let': let,
         'inventar_list': inventar,
-        'obsazena_sedadla_json': json.dumps(obsazena_sedadla),
-        'kapacita': let.id_letadla.kapacita_sedadel
+        # Vlastní sedadlo je v mapě obsazené, šablona ho ale nabídne jako aktuální
+        'mapa_sedadel': mapa_sedadel.mapa_letu(let.id).payload(),
+        'error': error,
     })
 
 
@@ -519,38 +582,23 @@ def zmenit_sedadlo(request, letenka_id):
     letenka = get_object_or_404(Letenky, pk=letenka_id, id_rezervace__id_uzivatele=request.user)
     let = letenka.id_letu
 
-    # 1. Najdeme obsazená sedadla pro tento let
-    # (Vynecháme ale MOJE současné sedadlo, abych si ho mohl vybrat znovu)
-    obsazena_sedadla = list(
-        Letenky.objects.filter(id_letu=let).exclude(id=letenka.id).values_list('cislo_sedadla', flat=True))
-
-    # 2. Zjistíme kapacitu a index třídy pro generování písmen
-    # Musíme najít, kolikátý inventář v pořadí cen to je (Economy=A, Business=B...)
-    vsechny_inventare = InventarLetu.objects.filter(id_letu=let, pocet_mist_k_prodeji__gt=0).order_by('cena')
-
-    class_index = 1
-    moje_kapacita = 0
-
-    for inv in vsechny_inventare:
-        if inv.id_tridy == letenka.id_tridy:
-            moje_kapacita = inv.pocet_mist_k_prodeji
-            break
-        class_index += 1
-
-    # 3. Zpracování formuláře
+    # 1. Zpracování formuláře - sedadlo musí být volné a v kabině mé třídy
+    # (kontrola i zápis pod zámkem, viz rezervovani.py)
+    error = None
     if request.method == 'POST':
-        nove_sedadlo = request.POST.get(f'sedadlo_{let.id}')
-        if nove_sedadlo:
-            letenka.cislo_sedadla = nove_sedadlo
-            letenka.save()
+        try:
+            rezervovani.zmen_letenku(letenka, request.POST.get(f'sedadlo_{let.id}'))
             return redirect('detail_moje_rezervace', rezervace_id=letenka.id_rezervace.id)
+        except rezervovani.RezervaceError as e:
+            error = str(e)
 
+    # 2. Mapa sedadel letu (moje současné sedadlo je v ní obsazené,
+    # šablona ho nabídne jako aktuální, abych si ho mohl vybrat znovu)
     return render(request, 'main/zmenit_sedadlo.html', {
         'letenka': letenka,
         'let': let,
-        'obsazena_sedadla_json': json.dumps(obsazena_sedadla),
-        'kapacita': moje_kapacita,
-        'class_index': class_index
+        'mapa_sedadel': mapa_sedadel.mapa_letu(let.id).payload(),
+        'error': error,
     })
 
 
@@ -574,8 +622,8 @@ def moje_lety(request):
     if datum_do:
         lety_qs = lety_qs.filter(cas_odletu__date__lte=datum_do)
 
-    # 3. Řazení (nejbližší nahoře)
-    lety_qs = lety_qs.order_by('cas_odletu')
+    # 3. Řazení (nejbližší nahoře), letiště a letadlo JOINem - šablona je vypisuje u každého letu
+    lety_qs = lety_qs.select_related('id_letiste_odletu', 'id_letiste_priletu', 'id_letadla').order_by('cas_odletu')
 
     # 4. Stránkování
     paginator = Paginator(lety_qs, 10)
@@ -590,8 +638,10 @@ def moje_lety(request):
 
 @login_required
 def detail_moje_lety(request, let_id):
-    # Načteme let, ale jen pokud je uživatel v posádce (bezpečnost)
-    let = get_object_or_404(Lety, pk=let_id, posadka=request.user)
+    # Načteme let, ale jen pokud je uživatel v posádce (bezpečnost), i s tím, co šablona vypisuje
+    let = get_object_or_404(
+        Lety.objects.select_related('id_letiste_odletu', 'id_letiste_priletu', 'id_letadla', 'id_aerolinky'),
+        pk=let_id, posadka=request.user)
 
     # Získáme role uživatele pro QR kód (např. "Pilot, Vedoucí kabiny")
     # Použijeme related_name 'role' z modelu Uzivatele (resp. M:N RoleUzivatel)
@@ -611,19 +661,8 @@ def detail_moje_lety(request, let_id):
 @login_required
 def management_novy_let(request):
     # 1. Oprávnění
-    if not request.user.is_superuser:
-        role_names = ["Správce letů", "Admin aerolinky"]
-        ma_pravo = RoleUzivatel.objects.filter(
-            id_uzivatele=request.user,
-            id_role__nazev_role__in=role_names,
-            plati_do__gte=timezone.now()
-        ).exists() | RoleUzivatel.objects.filter(
-            id_uzivatele=request.user,
-            id_role__nazev_role__in=role_names,
-            plati_do__isnull=True
-        ).exists()
-        if not ma_pravo:
-            raise PermissionDenied("Nemáte oprávnění pro správu letů.")
+    if not opravneni.ma_platnou_roli(request.user, ["Správce letů", "Admin aerolinky"]):
+        raise PermissionDenied("Nemáte oprávnění pro správu letů.")
 
     context = {}
 
@@ -640,9 +679,7 @@ def management_novy_let(request):
 
     context['aerolinky'] = json.dumps(aerolinky, cls=DjangoJSONEncoder)
 
-    # 3. Letiště (Globální - načteme hned, není jich tolik a potřebujeme je pro našeptávač)
-    letiste = list(Letiste.objects.all().values('id', 'nazev_letiste', 'kod_iata', 'mesto', 'zeme'))
-    context['letiste_json'] = json.dumps(letiste, cls=DjangoJSONEncoder)
+    # 3. Letiště se do stránky nevkládají - našeptávač je hledá přes /api/airports/
 
     # ZPRACOVÁNÍ ULOŽENÍ (POST)
     if request.method == 'POST':
@@ -668,32 +705,17 @@ def management_novy_let(request):
                 # UPDATE
                 let = get_object_or_404(Lety, pk=flight_id)
                 # Kontrola oprávnění pro update
-                if not request.user.is_superuser and let.id_aerolinky != request.user.id_aerolinky:
+                if not request.user.is_superuser and let.id_aerolinky_id != request.user.id_aerolinky_id:
                     raise PermissionDenied
-
-                for key, value in defaults.items():
-                    setattr(let, key, value)
-                let.save()
-                let.inventarletu_set.all().delete()  # Reset inventáře
             else:
                 # CREATE
-                let = Lety.objects.create(**defaults)
+                let = None
 
-            # Posádka
+            # Let, posádka a inventář najednou (jen rozdíl proti uloženému stavu), viz sprava_letu.py
             piloti_ids = request.POST.getlist('piloti_ids')
             pruvodci_ids = request.POST.getlist('pruvodci_ids')
-            let.posadka.set(piloti_ids + pruvodci_ids)
-
-            # Inventář
-            for key in request.POST:
-                if key.startswith('inv_trida_'):
-                    index = key.split('_')[-1]
-                    InventarLetu.objects.create(
-                        id_letu=let,
-                        id_tridy_id=request.POST.get(f'inv_trida_{index}'),
-                        pocet_mist_k_prodeji=request.POST.get(f'inv_pocet_{index}'),
-                        cena=request.POST.get(f'inv_cena_{index}')
-                    )
+            sprava_letu.uloz_let(let, defaults, piloti_ids + pruvodci_ids,
+                                 sprava_letu.inventar_z_formulare(request.POST))
 
             # Reload stránky (pokud byl vybrán airline_id, držíme ho v URL pro superadmina)
             redirect_url = request.path
@@ -709,40 +731,96 @@ def management_novy_let(request):
 
 # --- API FUNKCE ---
 
-@login_required
-def api_load_airline_data(request):
+def _aerolinka_z_pozadavku(request):
+    """airline_id z GET, pokud na ni má uživatel právo: (id, None) nebo (None, chybová odpověď)."""
     airline_id = request.GET.get('airline_id')
-    if not airline_id: return JsonResponse({'error': 'Chybí ID aerolinky'}, status=400)
+    if not airline_id or not airline_id.isdigit():
+        return None, JsonResponse({'error': 'Chybí ID aerolinky'}, status=400)
+    if not request.user.is_superuser and str(request.user.id_aerolinky_id) != airline_id:
+        return None, JsonResponse({'error': 'Nemáte oprávnění'}, status=403)
+    return int(airline_id), None
 
-    if not request.user.is_superuser and str(request.user.id_aerolinky.id) != str(airline_id):
-        return JsonResponse({'error': 'Nemáte oprávnění'}, status=403)
 
-    # 1. Letadla
-    letadla = list(Letadla.objects.filter(id_aerolinky_id=airline_id).values('id', 'model', 'kapacita_sedadel'))
-    # 2. Posádka
-    piloti = list(Uzivatele.objects.filter(id_aerolinky_id=airline_id, role__nazev_role="Pilot").values('id', 'first_name',
-                                                                                                   'last_name',
-                                                                                                   'email'))
-    pruvodci = list(
-        Uzivatele.objects.filter(id_aerolinky_id=airline_id, role__nazev_role="Palubní průvodčí").values('id', 'first_name',
-                                                                                                    'last_name',
-                                                                                                    'email'))
-    # 3. Seznam letů (jen pro našeptávač)
-    existujici_lety = list(Lety.objects.filter(id_aerolinky_id=airline_id).values('id', 'cislo_letu', 'cas_odletu'))
-    # 4. Třídy
-    tridy = list(TridySedadel.objects.filter(Q(id_aerolinky_id=airline_id) | Q(id_aerolinky__isnull=True)).values('id',
-                                                                                                                  'nazev_tridy'))
-
-    return JsonResponse({'letadla': letadla, 'piloti': piloti, 'pruvodci': pruvodci, 'existujici_lety': existujici_lety,
-                         'tridy': tridy})
+def _podmineny_json(request, verze, zmeneno, data):
+    """
+    JSON s ETag/Last-Modified podle verze dat; když je klient má, 304 bez těla.
+    data je funkce - volá se, jen když se odpověď opravdu posílá.
+    """
+    etag = f'"{verze}"'
+    posledni_zmena = int(zmeneno.timestamp()) if zmeneno else None
+    odpoved = get_conditional_response(request, etag=etag, last_modified=posledni_zmena)
+    if odpoved is None:
+        odpoved = JsonResponse(data(), encoder=DjangoJSONEncoder)
+        odpoved['ETag'] = etag
+        if posledni_zmena:
+            odpoved['Last-Modified'] = http_date(posledni_zmena)
+    # Prohlížeč si odpověď nechá, ale před použitím se vždy zeptá (If-None-Match)
+    patch_cache_control(odpoved, private=True, no_cache=True)
+    return odpoved
+
+
+@login_required
+def api_airline_data(request, zdroj):
+    """
+    Jeden zdroj dat aerolinky pro správu letů: letadla, posádka nebo třídy
+    (viz data_aerolinky.py). ?since=<verze> - při shodě jen {"zmeneno": false}.
+    """
+    airline_id, chyba = _aerolinka_z_pozadavku(request)
+    if chyba:
+        return chyba
+
+    verze, zmeneno = data_aerolinky.verze(zdroj, airline_id)
+    if request.GET.get('since') == verze:
+        return JsonResponse({'verze': verze, 'zmeneno': False})
+    nacti = data_aerolinky.NACITANI[zdroj]
+    return _podmineny_json(request, verze, zmeneno,
+                           lambda: {'verze': verze, 'zmeneno': True, zdroj: nacti(airline_id)})
+
+
+@login_required
+def api_flight_search(request):
+    """
+    Našeptávač čísla letu ve správě letů: ?airline_id=&q=začátek čísla
+    (&od=&do= YYYY-MM-DD, &bez=id upravovaného letu, &limit=N).
+    """
+    airline_id, chyba = _aerolinka_z_pozadavku(request)
+    if chyba:
+        return chyba
+    q = request.GET.get('q', '').strip()
+    if not q:
+        return JsonResponse({'lety': [], 'existuje': False})
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+        od = request.GET.get('od')
+        od = timezone.make_aware(datetime.combine(date.fromisoformat(od), time.min)) if od else None
+        do = request.GET.get('do')
+        do = timezone.make_aware(datetime.combine(date.fromisoformat(do) + timedelta(days=1), time.min)) if do else None
+        bez = int(request.GET['bez']) if request.GET.get('bez') else None
+    except ValueError:
+        return JsonResponse({'error': 'Neplatné parametry'}, status=400)
+
+    lety, existuje = data_aerolinky.hledej_lety(airline_id, q, od, do, bez, limit)
+    return JsonResponse({'lety': lety, 'existuje': existuje})
 
 
 @login_required
 def api_load_flight_detail(request):
+    """Detail letu pro formulář správy letů - vždy 3 dotazy (let s letišti, posádka, inventář)."""
     flight_id = request.GET.get('flight_id')
-    let = get_object_or_404(Lety, pk=flight_id)
+    if not flight_id or not flight_id.isdigit():
+        raise Http404
+    let = get_object_or_404(
+        Lety.objects
+        .select_related('id_letiste_odletu', 'id_letiste_priletu')
+        .prefetch_related(
+            Prefetch('posadka', queryset=Uzivatele.objects.only('id')),
+            Prefetch('inventarletu_set', queryset=InventarLetu.objects.order_by('id')),
+        ),
+        pk=flight_id,
+    )
 
-    if not request.user.is_superuser and let.id_aerolinky != request.user.id_aerolinky:
+    if not request.user.is_superuser and let.id_aerolinky_id != request.user.id_aerolinky_id:
         return JsonResponse({'error': 'Nemáte oprávnění'}, status=403)
 
     data = {
@@ -755,49 +833,111 @@ def api_load_flight_detail(request):
         'id_letiste_priletu': let.id_letiste_priletu_id,
         'nazev_priletu': f"{let.id_letiste_priletu.mesto} ({let.id_letiste_priletu.kod_iata})",
         'id_letadla': let.id_letadla_id,
-        'posadka_ids': list(let.posadka.values_list('id', flat=True)),
-        'inventar': list(let.inventarletu_set.values('id_tridy', 'pocet_mist_k_prodeji', 'cena'))
+        'posadka_ids': [clen.id for clen in let.posadka.all()],
+        'inventar': [
+            {'id_tridy': inv.id_tridy_id, 'pocet_mist_k_prodeji': inv.pocet_mist_k_prodeji, 'cena': inv.cena}
+            for inv in let.inventarletu_set.all()
+        ],
     }
     return JsonResponse(data)
 
 
+def _cas_z_formulare(hodnota):
+    """Čas z <input type="datetime-local"> (bez zóny = místní čas)."""
+    cas = parse_datetime(hodnota or '')
+    if cas is not None and timezone.is_naive(cas):
+        cas = timezone.make_aware(cas)
+    return cas
+
+
+def _jmeno(uzivatel):
+    return f"{uzivatel.first_name} {uzivatel.last_name}".strip() or uzivatel.email
+
+
 @login_required
 def api_check_collisions(request):
+    """
+    Kolize letadla a posádky navrhovaného letu (viz kolize.py):
+    {flight_id, cas_odletu, cas_priletu, id_letadla, posadka_ids}.
+    S {"rozvrh": true, od, do} (YYYY-MM-DD, výchozí od dneška bez konce)
+    vrátí report celého rozvrhu aerolinky.
+    """
     if request.method != 'POST': return JsonResponse({'error': 'Only POST'}, status=405)
     data = json.loads(request.body)
-    flight_id = data.get('flight_id')
-    start = data.get('cas_odletu')
-    end = data.get('cas_priletu')
-    id_letadla = data.get('id_letadla')
-    posadka_ids = data.get('posadka_ids', [])
-    warnings = []
+    if data.get('rozvrh'):
+        return _report_rozvrhu(request, data)
 
+    start = _cas_z_formulare(data.get('cas_odletu'))
+    end = _cas_z_formulare(data.get('cas_priletu'))
     if not start or not end: return JsonResponse({'warnings': []})
 
-    # Kolize Letadla
-    if id_letadla:
-        kolize = Lety.objects.filter(id_letadla_id=id_letadla, cas_odletu__lt=end, cas_priletu__gt=start)
-        if flight_id: kolize = kolize.exclude(id=flight_id)
-        if kolize.exists(): warnings.append(f"⚠️ Letadlo má jiný let: {kolize.first().cislo_letu}")
-
-    # Kolize Posádky
-    if posadka_ids:
-        kolize_p = Lety.objects.filter(cas_odletu__lt=end, cas_priletu__gt=start, posadka__in=posadka_ids).distinct()
-        if flight_id: kolize_p = kolize_p.exclude(id=flight_id)
-        for k in kolize_p:
-            kolidujici = k.posadka.filter(id__in=posadka_ids)
-            jmena_list = []
-            for u in kolidujici:
-                jmeno = f"{u.first_name} {u.last_name}".strip()
-                if not jmeno:
-                    jmeno = u.email
-                jmena_list.append(jmeno)
-            jmena = ", ".join(jmena_list)
-            warnings.append(f"⚠️ Kolize posádky ({jmena}) s letem {k.cislo_letu}")
+    try:
+        flight_id = int(data['flight_id']) if data.get('flight_id') else None
+        id_letadla = int(data['id_letadla']) if data.get('id_letadla') else None
+        posadka_ids = [int(i) for i in data.get('posadka_ids') or []]
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Neplatná data'}, status=400)
+
+    rozvrh = kolize.RozvrhLetu.nacti(start, end, letadlo_id=id_letadla, posadka_ids=posadka_ids)
+    nalezene = rozvrh.zkontroluj_let(start, end, id_letadla, posadka_ids, bez_letu=flight_id)
+    clenove = Uzivatele.objects.in_bulk({u for _, _, u in nalezene if u is not None})
+
+    warnings = []
+    posadka_podle_letu = {}
+    for typ, let_id, uzivatel_id in nalezene:
+        cislo_letu = rozvrh.lety[let_id][1]
+        if typ == kolize.LETADLO:
+            warnings.append(f"⚠️ Letadlo má jiný let: {cislo_letu}")
+        elif typ == kolize.OBRATKA:
+            warnings.append(f"⚠️ Letadlo nestihne obrátku ({settings.KOLIZE_MIN_OBRATKA} min) s letem {cislo_letu}")
+        else:
+            posadka_podle_letu.setdefault(cislo_letu, []).append(_jmeno(clenove[uzivatel_id]))
+    for cislo_letu, jmena in posadka_podle_letu.items():
+        warnings.append(f"⚠️ Kolize posádky ({', '.join(jmena)}) s letem {cislo_letu}")
 
     return JsonResponse({'warnings': warnings})
 
 
+def _report_rozvrhu(request, data):
+    """
+    Všechny kolize v rozvrhu aerolinky uživatele v okně od-do (stejně jako
+    manage.py check_schedule). Superuser: id_aerolinky, nebo všech aerolinek.
+    """
+    if request.user.is_superuser:
+        try:
+            aerolinka_id = int(data['id_aerolinky']) if data.get('id_aerolinky') else None
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Neplatná aerolinka'}, status=400)
+    elif request.user.id_aerolinky_id is None or not opravneni.ma_platnou_roli(
+            request.user, ["Správce letů", "Admin aerolinky"]):
+        # Bez aerolinky by se načetl rozvrh všech aerolinek
+        return JsonResponse({'error': 'Nemáte oprávnění'}, status=403)
+    else:
+        aerolinka_id = request.user.id_aerolinky_id
+
+    try:
+        od = date.fromisoformat(data['od']) if data.get('od') else timezone.localdate()
+        do = date.fromisoformat(data['do']) + timedelta(days=1) if data.get('do') else None
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Neplatné datum'}, status=400)
+    od = timezone.make_aware(datetime.combine(od, time.min))
+    do = timezone.make_aware(datetime.combine(do, time.min)) if do else None
+
+    rozvrh = kolize.RozvrhLetu.nacti(od, do, aerolinka_id=aerolinka_id)
+    nalezene = rozvrh.report()
+    clenove = Uzivatele.objects.in_bulk({r for typ, _, _, r in nalezene if typ == kolize.POSADKA})
+    return JsonResponse({'kolize': [
+        {
+            'typ': typ,
+            'let_a': rozvrh.lety[a][1],
+            'let_b': rozvrh.lety[b][1],
+            'letadlo_id': zdroj if typ != kolize.POSADKA else None,
+            'clen_posadky': _jmeno(clenove[zdroj]) if typ == kolize.POSADKA else None,
+        }
+        for typ, a, b, zdroj in nalezene
+    ]})
+
+
 @login_required
 def api_delete_flight(request):
     if request.method != 'POST': return JsonResponse({'error': 'Only POST'}, status=405)
@@ -810,3 +950,110 @@ def api_delete_flight(request):
 
     let.delete()
     return JsonResponse({'success': True})
+
+
+# --- VEŘEJNÉ API ---
+
+def api_fare_calendar(request):
+    """
+    Cenový kalendář trasy: ?odkud=&kam=&mesic=YYYY-MM nebo ?odkud=&kam=&datum=YYYY-MM-DD&dni=N
+    """
+    odkud_id = request.GET.get('odkud')
+    kam_id = request.GET.get('kam')
+    if not (odkud_id and odkud_id.isdigit() and kam_id and kam_id.isdigit()):
+        return JsonResponse({'error': 'Chybí odkud nebo kam'}, status=400)
+
+    try:
+        od, do = kalendar_cen.rozsah_z_parametru(
+            mesic=request.GET.get('mesic'),
+            datum=request.GET.get('datum'),
+            dni=request.GET.get('dni', 3),
+            max_dni=settings.KALENDAR_CEN_MAX_DNI,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': f'Neplatný rozsah: {e}'}, status=400)
+
+    dny = kalendar_cen.kalendar(int(odkud_id), int(kam_id), od, do)
+    return JsonResponse({'dny': dny}, encoder=DjangoJSONEncoder)
+
+
+def api_airports(request):
+    """
+    Našeptávač letišť: ?q=text (&limit=N). Hledá v paměťovém indexu (index_letist.py).
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'error': 'Neplatný limit'}, status=400)
+
+    letiste = index_letist.ziskej_index().hledej(request.GET.get('q', ''), limit)
+    return JsonResponse({'letiste': letiste})
+
+
+# --- METRIKY ---
+
+def metriky_prometheus(request):
+    """
+    Metriky požadavků tohoto procesu v textovém formátu Prometheus (viz metriky.py).
+    Pro zaměstnance, nebo s hlavičkou Authorization: Bearer <settings.METRIKY_TOKEN>.
+    """
+    token = settings.METRIKY_TOKEN
+    autorizace = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and constant_time_compare(autorizace, f'Bearer {token}'))):
+        raise PermissionDenied
+    return HttpResponse(metriky.export(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# --- PROFILY POŽADAVKŮ (ADMIN) ---
+# Zaměstnanec vidí své profily, superuser všechny (SQL v profilu může obsahovat osobní údaje)
+
+PROFIL_NEEXISTUJE = "Profil neexistuje (mohl být nahrazen novějším)."
+
+
+def _profil_nebo_404(request, profil_id):
+    try:
+        udaje = profilovani.nacti(profil_id)
+    except FileNotFoundError:
+        raise Http404(PROFIL_NEEXISTUJE)
+    if not request.user.is_superuser and udaje['uzivatel_id'] != request.user.id:
+        raise PermissionDenied
+    return udaje
+
+
+def admin_profily(request):
+    profily = profilovani.seznam(None if request.user.is_superuser else request.user.id)
+    return render(request, 'admin/profily.html', {
+        **admin.site.each_context(request),
+        'title': 'Profily požadavků',
+        'profily': profily,
+        'max_profilu': settings.PROFILOVANI_MAX_PROFILU,
+    })
+
+
+def admin_profil(request, profil_id):
+    udaje = _profil_nebo_404(request, profil_id)
+    razeni = request.GET.get('razeni', profilovani.RAZENI[0])
+    try:
+        # .json může přežít .prof, který mezitím smazal jiný proces
+        statistiky = profilovani.statistiky(profil_id, razeni)
+    except FileNotFoundError:
+        raise Http404(PROFIL_NEEXISTUJE)
+    return render(request, 'admin/profil_detail.html', {
+        **admin.site.each_context(request),
+        'title': f"Profil {udaje['metoda']} {udaje['cesta']}",
+        'profil': udaje,
+        'razeni': razeni,
+        'moznosti_razeni': profilovani.RAZENI,
+        'statistiky': statistiky,
+        'sql_celkem_ms': sum(d['ms'] for d in udaje['sql']) if udaje['sql'] else None,
+    })
+
+
+def admin_profil_stahnout(request, profil_id):
+    _profil_nebo_404(request, profil_id)
+    try:
+        soubor = open(profilovani.cesta_prof(profil_id), 'rb')
+    except FileNotFoundError:
+        raise Http404(PROFIL_NEEXISTUJE)
+    return FileResponse(soubor, as_attachment=True, filename=f'{profil_id}.prof',
+                        content_type='application/octet-stream')
@@ -0,0 +1,402 @@
+"""
+Vyhledávání spojení s přestupem.
+
+Původně se přestupy hledaly dvojitou smyčkou přes všechny lety z výchozího
+letiště a všechny lety do cílového letiště (O(n·m)). Tady lety druhého
+úseku rozdělíme podle letiště odletu (hash join), každou skupinu seřadíme
+podle času odletu a pro každý první úsek najdeme navazující lety
+binárním vyhledáváním v okně <přílet + min, přílet + max>.
+"""
+import heapq
+import itertools
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.paginator import Paginator
+
+# Povolená doba na přestup
+MIN_CAS_PRESTUPU = timedelta(hours=1)
+MAX_CAS_PRESTUPU = timedelta(hours=24)
+
+# Trasy s nejvýše tolika lety (přímé a s jedním přestupem) najdi_trasy
+# nikdy neořezává omezením tras_na_odlet
+NEORESAVANYCH_USEKU = 2
+
+
+def rozdel_podle_letiste(lety):
+    """
+    Rozdělí lety podle letiště odletu a každou skupinu seřadí podle času odletu.
+    Vrací {id_letiste: (casy_odletu, lety)} - dva souběžné seznamy kvůli bisect.
+    """
+    skupiny = defaultdict(list)
+    for let in lety:
+        skupiny[let.id_letiste_odletu_id].append(let)
+
+    index = {}
+    for letiste_id, seznam in skupiny.items():
+        seznam.sort(key=lambda l: l.cas_odletu)
+        index[letiste_id] = ([l.cas_odletu for l in seznam], seznam)
+    return index
+
+
+def navazujici_lety(index, let, min_cas=MIN_CAS_PRESTUPU, max_cas=MAX_CAS_PRESTUPU):
+    """
+    Vrátí lety z indexu, které odlétají z letiště příletu 'let'
+    a stihneme je v povoleném okně pro přestup (seřazené podle odletu).
+    """
+    skupina = index.get(let.id_letiste_priletu_id)
+    if skupina is None:
+        return []
+    casy, seznam = skupina
+    od = bisect_left(casy, let.cas_priletu + min_cas)
+    do = bisect_right(casy, let.cas_priletu + max_cas)
+    return seznam[od:do]
+
+
+def najdi_prestupy(lety_start, lety_cil, min_cas=MIN_CAS_PRESTUPU, max_cas=MAX_CAS_PRESTUPU):
+    """
+    Najde všechny dvojice (let1, let2), kde let2 navazuje na let1
+    (stejné letiště přestupu, čekání v rozmezí min_cas..max_cas).
+
+    Lety musí mít atributy id_letiste_odletu_id, id_letiste_priletu_id,
+    cas_odletu a cas_priletu (model Lety nebo cokoliv se stejnými atributy).
+    Porovnáváme jen *_id, takže se nesahá do databáze pro cizí klíče.
+    """
+    index = rozdel_podle_letiste(lety_cil)
+    vysledek = []
+    for let1 in lety_start:
+        for let2 in navazujici_lety(index, let1, min_cas, max_cas):
+            vysledek.append((let1, let2))
+    return vysledek
+
+
+# --- VÍCENÁSOBNÉ PŘESTUPY (časově rozvinutý graf) ---
+#
+# Graf: uzly jsou události (letiště, čas). Každý let je hrana z odletu na přílet,
+# odlety ze stejného letiště jsou seřazené podle času a propojené hranami
+# "čekání na zemi". Z příletu se tedy dá pokračovat jen na souvislý úsek
+# odletů <přílet + min, přílet + max>, který najdeme pomocí bisect (navazujici_lety).
+
+class HranaLetu:
+    """
+    Odlehčená reprezentace letu pro vyhledávání (bez ORM objektu).
+    Má stejné atributy jako model Lety, takže funguje se všemi funkcemi výše.
+    """
+    __slots__ = ('id', 'id_letiste_odletu_id', 'id_letiste_priletu_id', 'cas_odletu', 'cas_priletu')
+
+    def __init__(self, id, id_letiste_odletu_id, id_letiste_priletu_id, cas_odletu, cas_priletu):
+        self.id = id
+        self.id_letiste_odletu_id = id_letiste_odletu_id
+        self.id_letiste_priletu_id = id_letiste_priletu_id
+        self.cas_odletu = cas_odletu
+        self.cas_priletu = cas_priletu
+
+
+class SitLetu:
+    """
+    Síť letů připravená pro vyhledávání:
+    - podle_odletu: {id_letiste: (casy_odletu, lety)} seřazené podle odletu (jako rozdel_podle_letiste)
+    - podle_priletu: {id_letiste: {id_letu: let}} pro zpětný průchod
+
+    Lety jde přidávat a odebírat po jednom (pridej / odeber), takže se síť
+    nemusí při každé změně stavět znovu. Zápisy se volají pod zámkem indexu
+    (index_letu.py), vyhledávání ale čte bez zámku - proto se skupina letiště
+    nikdy nemění na místě: zápis postaví nové seznamy (nový slovník) a jedním
+    přiřazením je vymění. Čtenář, který si skupinu už vzal, dočte starou verzi,
+    casy a lety k sobě vždy sedí.
+    """
+
+    def __init__(self, lety=()):
+        self.podle_odletu = {}
+        self.podle_priletu = defaultdict(dict)
+        self.lety = {}
+        for let in lety:
+            self.lety[let.id] = let
+            self.podle_priletu[let.id_letiste_priletu_id][let.id] = let
+        for letiste_id, skupina in rozdel_podle_letiste(self.lety.values()).items():
+            self.podle_odletu[letiste_id] = skupina
+
+    def __len__(self):
+        return len(self.lety)
+
+    def pridej(self, let):
+        self.odeber(let.id)
+        prilety = self.podle_priletu.get(let.id_letiste_priletu_id, {})
+        self.podle_priletu[let.id_letiste_priletu_id] = {**prilety, let.id: let}
+
+        casy, seznam = self.podle_odletu.get(let.id_letiste_odletu_id, ((), ()))
+        i = bisect_right(casy, let.cas_odletu)
+        self.podle_odletu[let.id_letiste_odletu_id] = (
+            [*casy[:i], let.cas_odletu, *casy[i:]],
+            [*seznam[:i], let, *seznam[i:]],
+        )
+        self.lety[let.id] = let
+
+    def odeber(self, let_id):
+        let = self.lety.pop(let_id, None)
+        if let is None:
+            return
+        prilety = self.podle_priletu[let.id_letiste_priletu_id]
+        self.podle_priletu[let.id_letiste_priletu_id] = {k: v for k, v in prilety.items() if k != let_id}
+
+        casy, seznam = self.podle_odletu[let.id_letiste_odletu_id]
+        i = bisect_left(casy, let.cas_odletu)
+        while seznam[i].id != let_id:
+            i += 1
+        self.podle_odletu[let.id_letiste_odletu_id] = (casy[:i] + casy[i + 1:], seznam[:i] + seznam[i + 1:])
+
+
+def posledni_odlety(sit, kam, max_useku, min_cas=MIN_CAS_PRESTUPU):
+    """
+    Zpětný průchod grafem: pro každý počet zbývajících úseků j (1..max_useku)
+    spočítá {id_letiste: nejpozdější čas odletu, ze kterého se ještě dá
+    doletět do 'kam' nejvýše j lety}.
+
+    Je to nutná podmínka (ignoruje max. dobu čekání), takže se podle ní dá
+    bezpečně ořezávat - nikdy nezahodí platnou trasu.
+    V každém kole procházíme jen přílety do letišť, jejichž limit se
+    v předchozím kole změnil.
+    """
+    vysledek = [{kam: None}]  # 0 úseků: jsme v cíli
+    predchozi = {}
+    zmenena = [kam]
+    for _ in range(max_useku):
+        aktualni = dict(predchozi)
+        for cil in zmenena:
+            limit = predchozi.get(cil)
+            for let in sit.podle_priletu.get(cil, {}).values():
+                if cil != kam and let.cas_priletu + min_cas > limit:
+                    continue
+                odkud = let.id_letiste_odletu_id
+                if odkud not in aktualni or let.cas_odletu > aktualni[odkud]:
+                    aktualni[odkud] = let.cas_odletu
+        zmenena = [a for a, cas in aktualni.items() if a != kam and predchozi.get(a) != cas]
+        vysledek.append(aktualni)
+        predchozi = aktualni
+    return vysledek
+
+
+def najdi_trasy(sit, odkud, kam, max_prestupu=1, min_cas=MIN_CAS_PRESTUPU, max_cas=MAX_CAS_PRESTUPU,
+                tras_na_odlet=None, od_casu=None, zavislosti=None):
+    """
+    Najde trasy v síti letů (SitLetu) z 'odkud' do 'kam' s nejvýše max_prestupu přestupy.
+    Vrací seznam n-tic letů (včetně přímých letů, kde je n-tice délky 1).
+    Pokud je zadáno od_casu, první let trasy neodlétá dřív.
+    Do množiny 'zavislosti' (pokud je zadána) doplní letiště, na jejichž
+    letech výsledek závisí - změna letu jinde výsledek ovlivnit nemůže.
+
+    Prohledávání je omezené:
+    - pokračujeme jen do letišť, ze kterých se do cíle ještě stihne doletět
+      se zbývajícím počtem úseků (viz posledni_odlety),
+    - žádné letiště v trase se neopakuje,
+    - pokud je zadáno tras_na_odlet, necháme si pro každý první let jen
+      k tras se 2+ přestupy s nejdřívějším příletem a větve, které přiletí
+      později než k-tá nejlepší nalezená trasa, rovnou zahodíme (branch and
+      bound). Přímé lety a trasy s jedním přestupem se neořezávají nikdy -
+      výsledek je pro ně stejný jako bez omezení (najdi_prestupy).
+    """
+    max_useku = max_prestupu + 1
+    index = sit.podle_odletu
+    limity = posledni_odlety(sit, kam, max_useku, min_cas)
+
+    if zavislosti is not None:
+        # Let má vliv jen tehdy, když přilétá do letiště, odkud se dá dostat do cíle
+        zavislosti.update((odkud, kam))
+        for limity_j in limity:
+            zavislosti.update(limity_j.keys())
+
+    vysledky = []
+    poradi = itertools.count()
+
+    def rozsir(cesta, zbyva, navstivena, nejlepsi):
+        let = cesta[-1]
+        cil = let.id_letiste_priletu_id
+
+        if cil == kam:
+            trasa = tuple(cesta)
+            if tras_na_odlet is None or len(trasa) <= NEORESAVANYCH_USEKU:
+                vysledky.append(trasa)
+                return
+            # Halda drží na vrcholu nejhorší trasu (nejpozdější přílet, více přestupů)
+            polozka = (-let.cas_priletu.timestamp(), -len(trasa), next(poradi), trasa)
+            if len(nejlepsi) < tras_na_odlet:
+                heapq.heappush(nejlepsi, polozka)
+            else:
+                heapq.heappushpop(nejlepsi, polozka)
+            return
+
+        if zbyva == 0:
+            return
+
+        limit = limity[zbyva].get(cil)
+        if limit is None:
+            return
+
+        for dalsi in navazujici_lety(index, let, min_cas, max_cas):
+            # Navazující lety jsou seřazené podle odletu, pozdější už cíl nestihnou
+            if dalsi.cas_odletu > limit:
+                break
+            # Horší než k-tá nejlepší trasa (přílet se po cestě už jen zvětšuje);
+            # neořezává se let, který krátkou trasu právě dokončuje
+            if tras_na_odlet is not None and len(nejlepsi) == tras_na_odlet \
+                    and dalsi.cas_priletu.timestamp() > -nejlepsi[0][0] \
+                    and not (len(cesta) < NEORESAVANYCH_USEKU and dalsi.id_letiste_priletu_id == kam):
+                continue
+            if dalsi.id_letiste_priletu_id in navstivena:
+                continue
+
+            cesta.append(dalsi)
+            navstivena.add(dalsi.id_letiste_priletu_id)
+            rozsir(cesta, zbyva - 1, navstivena, nejlepsi)
+            navstivena.discard(dalsi.id_letiste_priletu_id)
+            cesta.pop()
+
+    skupina = index.get(odkud)
+    limit_startu = limity[max_useku].get(odkud)
+    if skupina is None or limit_startu is None:
+        return vysledky
+
+    casy, seznam = skupina
+    prvni = bisect_left(casy, od_casu) if od_casu is not None else 0
+    for let in seznam[prvni:]:
+        if let.cas_odletu > limit_startu:
+            break
+        nejlepsi = []
+        rozsir([let], max_useku - 1, {odkud, let.id_letiste_priletu_id}, nejlepsi)
+        # k nejlepších pro tento odlet, seřazených od nejdřívějšího příletu
+        vysledky.extend(polozka[-1] for polozka in sorted(nejlepsi, reverse=True))
+
+    return vysledky
+
+
+# --- LÍNÉ ŘAZENÍ VÝSLEDKŮ PO STRÁNKÁCH ---
+
+# Způsoby řazení: klíč z kandidáta (ids, cas_odletu, cas_priletu) a ceny cesty
+RAZENI = {
+    'cas': lambda k, cena: (k[1], cena),  # nejdřív odlet, pak cena (výchozí)
+    'cena': lambda k, cena: (cena, k[1]),  # nejlevnější
+    'doba': lambda k, cena: (k[2] - k[1], k[1], cena),  # nejrychlejší
+    'prestupy': lambda k, cena: (len(k[0]), k[1], cena),  # nejméně přestupů
+}
+
+
+class LineSerazeneVysledky:
+    """
+    Seznam kandidátů seřazený podle klíče, ve kterém je cena - a tu zjistíme
+    až drahým dotazem na dostupnost. Chová se jako sekvence (len + slice);
+    stránkuje se přes StrankyVysledku.
+
+    Dostupnost se vyhodnocuje jen pro kandidáty, kteří se dostanou na
+    požadovanou stránku (+ malý předstih):
+    1. heapq.nsmallest vybere k nejlepších kandidátů podle odhadu ceny
+       (dolní mez - skutečná cena nemůže být nižší), paměť O(k),
+    2. z nich se na haldě líně vyhodnocují skutečné ceny po dávkách - kandidát
+       je definitivně na svém místě, až když je na vrcholu s vyhodnocenou cenou,
+    3. když vyhodnocení vyřadí příliš mnoho kandidátů (vyprodané přestupy),
+       k se zdvojnásobí a výběr se zopakuje (už vyhodnocené ceny si pamatujeme).
+
+    vyhodnot(kandidati) vrací pro každého kandidáta skutečnou cenu,
+    nebo None, pokud se kandidát nemá zobrazit.
+    """
+
+    def __init__(self, kandidati, klic, vyhodnot, odhad=None, predstih=10, davka=20):
+        self.kandidati = kandidati
+        self.klic = klic
+        self.vyhodnot = vyhodnot
+        self.odhad = odhad or (lambda kandidat: 0)
+        self.predstih = predstih
+        self.davka = davka
+
+        self._ceny = {}  # index kandidáta -> skutečná cena (None = vyřazen)
+        self._serazene = []  # indexy kandidátů v definitivním pořadí
+        self._hotovo = not kandidati
+
+    def __len__(self):
+        # Dokud nejsou vyhodnoceni všichni, je to horní odhad (vyprodané přestupy ještě odpadnou)
+        return len(self._serazene) if self._hotovo else len(self.kandidati)
+
+    @property
+    def dopocitano(self):
+        """Všichni kandidáti jsou vyhodnoceni - len() je přesný počet."""
+        return self._hotovo
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            konec = index.stop if index.stop is not None else len(self.kandidati)
+            self._dopocitej(konec)
+            return [self.kandidati[i] for i in self._serazene[index]]
+        self._dopocitej(index + 1)
+        return self.kandidati[self._serazene[index]]
+
+    def _dopocitej(self, potreba):
+        k = potreba + self.predstih
+        while len(self._serazene) < potreba and not self._hotovo:
+            self._serad_vyber(potreba, k)
+            k *= 2
+
+    def _klic_kandidata(self, i):
+        if i in self._ceny:
+            return self.klic(self.kandidati[i], self._ceny[i]), i
+        return self.klic(self.kandidati[i], self.odhad(self.kandidati[i])), i
+
+    def _serad_vyber(self, potreba, k):
+        n = len(self.kandidati)
+        # 1. k nejlepších podle (zatím odhadnutého) klíče; index je pojistka proti shodě klíčů
+        # (už vyřazené kandidáty přeskakujeme)
+        vyber = heapq.nsmallest(k, (self._klic_kandidata(i) for i in range(n)
+                                    if self._ceny.get(i, True) is not None))
+        # Kandidáti mimo výběr mají klíč (i s indexem) větší než hranice
+        hranice = vyber[-1] if len(vyber) == k else None
+
+        halda = [(klic, i, i in self._ceny) for klic, i in vyber]
+        heapq.heapify(halda)
+        serazene = []
+
+        while halda and len(serazene) < potreba:
+            klic, i, vyhodnoceno = halda[0]
+            if vyhodnoceno:
+                if hranice is not None and (klic, i) > hranice:
+                    break  # Za hranicí výběru už pořadí není jisté - zvětšíme k
+                heapq.heappop(halda)
+                serazene.append(i)
+                continue
+
+            # 2. Dávka nevyhodnocených kandidátů z vrcholu haldy
+            davka = []
+            while halda and len(davka) < self.davka and not halda[0][2]:
+                davka.append(heapq.heappop(halda)[1])
+            for i, cena in zip(davka, self.vyhodnot([self.kandidati[i] for i in davka])):
+                self._ceny[i] = cena
+                if cena is not None:
+                    heapq.heappush(halda, (self.klic(self.kandidati[i], cena), i, True))
+
+        self._serazene = serazene
+        if hranice is None and len(serazene) < potreba:
+            # Prošli jsme všechny kandidáty - teď známe přesný počet výsledků
+            self._hotovo = True
+
+
+class StrankyVysledku(Paginator):
+    """
+    Paginator nad LineSerazeneVysledky. Jejich len() je, dokud nejsou
+    vyhodnoceni všichni kandidáti, jen horní odhad - Paginator by pak
+    nabízel stránky, které po vyřazení vyprodaných přestupů zůstanou prázdné.
+
+    Stránka se proto načte o jeden výsledek delší: když za ní už nic není
+    (nebo je požadovaná stránka až za koncem), seznam se tím dopočítá
+    a počet stránek se zpřesní. Stránka za koncem se změní na poslední.
+    """
+
+    def page(self, number):
+        number = self.validate_number(number)
+        vysledky = self.object_list
+        if not vysledky.dopocitano:
+            zacatek = (number - 1) * self.per_page
+            vysledky[zacatek:zacatek + self.per_page + self.orphans + 1]
+            if vysledky.dopocitano:
+                # count a num_pages jsou cached_property - spočítají se znovu z přesné délky
+                self.__dict__.pop('count', None)
+                self.__dict__.pop('num_pages', None)
+                number = min(number, self.num_pages)
+        return super().page(number)